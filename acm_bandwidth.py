@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF下载的带宽限制与传输时间窗口
+
+- 带宽限制：按字节计的令牌桶，分全局（所有下载合计）和每个连接两级，
+  写入每个数据块后消耗令牌，不够时等待，长时间平均速率不超过设定值
+- 传输时间窗口：只在指定的时间段（如夜间）传输PDF；窗口之外搜索和详情页照常进行，
+  需要下载的PDF先排队（保存在 .acm_cache/deferred_downloads.json），窗口打开后再下载，
+  这样大批量任务可以全天运行而不在白天占满校园网出口
+"""
+
+import re
+import time
+import threading
+
+RATE_UNITS = {'': 1, 'B': 1, 'K': 1024, 'KB': 1024, 'M': 1024 ** 2, 'MB': 1024 ** 2, 'G': 1024 ** 3, 'GB': 1024 ** 3}
+
+
+def parse_rate(text):
+    """解析速率，如 500K、2M、1.5MB/s，返回每秒字节数"""
+    if text is None:
+        return None
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?|\.\d+)\s*([KMG]?B?)\s*(?:/s)?\s*', str(text), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"无法解析的速率: {text}（示例: 500K、2M、1.5MB/s）")
+    return float(match.group(1)) * RATE_UNITS[match.group(2).upper()]
+
+
+def format_rate(rate):
+    for unit in ('B', 'KB', 'MB'):
+        if rate < 1024 or unit == 'MB':
+            return f"{rate:.1f} {unit}/s"
+        rate /= 1024
+
+
+class ByteBucket:
+    """按字节计的令牌桶，允许最多一秒的突发"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.capacity = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, amount):
+        """消耗amount个字节的令牌；不够时先欠下，按欠下的量等待（不需要拆分数据块）"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            wait_time = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait_time > 0:
+            time.sleep(wait_time)
+        return wait_time
+
+
+class BandwidthLimiter:
+    """全局和每个连接两级的带宽限制"""
+
+    def __init__(self, global_rate=None, connection_rate=None):
+        self.global_bucket = ByteBucket(global_rate) if global_rate else None
+        self.connection_rate = connection_rate
+        self.throttled_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def connection(self):
+        """为一次下载返回限速函数 throttle(字节数)"""
+        bucket = ByteBucket(self.connection_rate) if self.connection_rate else None
+
+        def throttle(amount):
+            waited = 0.0
+            if bucket:
+                waited += bucket.consume(amount)
+            if self.global_bucket:
+                waited += self.global_bucket.consume(amount)
+            if waited:
+                with self.lock:
+                    self.throttled_seconds += waited
+
+        return throttle
+
+    def describe(self):
+        parts = []
+        if self.global_bucket:
+            parts.append(f"全局 {format_rate(self.global_bucket.rate)}")
+        if self.connection_rate:
+            parts.append(f"每个连接 {format_rate(self.connection_rate)}")
+        return '，'.join(parts)
+
+
+class TransferWindow:
+    """每天允许传输PDF的时间段，如 "22:00-07:00,12:00-13:30"（可以跨过午夜，结束时间可以写 24:00）"""
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.ranges = []
+        for part in spec.split(','):
+            match = re.fullmatch(r'\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*', part)
+            if not match:
+                raise ValueError(f"无法解析的时间窗口: {part}（示例: 22:00-07:00）")
+            h1, m1, h2, m2 = map(int, match.groups())
+            if h1 > 23 or m1 > 59 or m2 > 59 or h2 > 24 or h2 == 24 and m2 != 0:
+                raise ValueError(f"无效的时间: {part}")
+            self.ranges.append((h1 * 60 + m1, h2 * 60 + m2))
+
+    @staticmethod
+    def minute_of_day(now=None):
+        local = time.localtime(now)
+        return local.tm_hour * 60 + local.tm_min + local.tm_sec / 60
+
+    def is_open(self, now=None):
+        minute = self.minute_of_day(now)
+        for start, end in self.ranges:
+            if start <= end:
+                if start <= minute < end:
+                    return True
+            elif minute >= start or minute < end:
+                return True
+        return False
+
+    def seconds_until_open(self, now=None):
+        """距离下一个窗口打开还有多少秒（当前已在窗口内时为0）"""
+        if self.is_open(now):
+            return 0
+        minute = self.minute_of_day(now)
+        waits = [(start - minute) % (24 * 60) for start, _ in self.ranges]
+        return min(waits) * 60
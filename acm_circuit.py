@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按接口的熔断器：某个接口（搜索页、doSearch API、详情页、PDF）连续失败达到阈值后熔断，
+熔断期间不再向它发送请求（搜索改用其他接口，没有可用接口时暂停等待），
+冷却时间过后只放行一个探测请求：成功则恢复，失败则冷却时间加倍后继续熔断。
+
+被封IP时，剩余的论文不再逐一走完所有搜索方法、重试和等待才失败，也不会因此被写入失败记录。
+"""
+
+import time
+import threading
+from urllib.parse import urlparse
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """接口已熔断，请求没有发送"""
+
+    def __init__(self, breaker):
+        super().__init__(f"接口 {breaker.name} 已熔断，{breaker.seconds_until_probe():.0f} 秒后探测")
+        self.breaker = breaker
+
+
+class CircuitBreaker:
+    """单个接口的熔断器（线程安全）"""
+
+    def __init__(self, name, threshold=3, cooldown=300, max_cooldown=3600):
+        self.name = name
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.trips = 0
+        self.lock = threading.Lock()
+
+    def seconds_until_probe(self):
+        """距离可以发送探测请求还有多少秒（未熔断时为0）"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.cooldown - time.monotonic())
+
+    def blocked(self):
+        """不消耗探测机会地判断现在是否不能发送请求"""
+        with self.lock:
+            if self.state == CLOSED:
+                return False
+            if self.state == HALF_OPEN:
+                return True
+            return self.seconds_until_probe() > 0
+
+    def allow(self):
+        """发送请求前调用；冷却结束后只有一个调用者得到探测机会"""
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self.seconds_until_probe() <= 0:
+                self.state = HALF_OPEN
+                print(f"接口 {self.name} 冷却结束，发送一个探测请求...")
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            if self.state != CLOSED:
+                print(f"接口 {self.name} 探测成功，恢复正常")
+            self.state = CLOSED
+            self.failures = 0
+            self.cooldown = self.base_cooldown
+
+    def record_failure(self, reason=None):
+        with self.lock:
+            if self.state == HALF_OPEN:
+                # 探测失败：冷却时间加倍后继续熔断
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                print(f"接口 {self.name} 探测失败（{reason}），{self.cooldown:.0f} 秒后再次探测")
+                return
+            self.failures += 1
+            if self.state == CLOSED and self.failures >= self.threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.trips += 1
+                print(f"接口 {self.name} 连续失败 {self.failures} 次（{reason}），熔断 {self.cooldown:.0f} 秒")
+
+
+def endpoint_for(url):
+    """请求地址对应的接口名称，不属于ACM的地址返回None"""
+    parsed = urlparse(url)
+    if not parsed.netloc.endswith('dl.acm.org'):
+        return None
+    path = parsed.path
+    if path.startswith('/action/doSearch'):
+        return 'doSearch'
+    if path.startswith('/search/'):
+        return 'search'
+    if path.startswith(('/doi/pdf/', '/doi/epdf/')) or path.lower().endswith('.pdf'):
+        return 'pdf'
+    if path.startswith('/doi/'):
+        return 'detail'
+    return None
+
+
+class CircuitBreakers:
+    """各接口的熔断器"""
+
+    ENDPOINTS = ('search', 'doSearch', 'detail', 'pdf')
+
+    def __init__(self, threshold=3, cooldown=300, max_cooldown=3600):
+        self.breakers = {name: CircuitBreaker(name, threshold, cooldown, max_cooldown) for name in self.ENDPOINTS}
+
+    def __getitem__(self, name):
+        return self.breakers[name]
+
+    def for_url(self, url):
+        name = endpoint_for(url)
+        return self.breakers.get(name) if name else None
+
+    def before_request(self, url):
+        """发送请求前检查，接口已熔断时抛出CircuitOpenError"""
+        breaker = self.for_url(url)
+        if breaker and not breaker.allow():
+            raise CircuitOpenError(breaker)
+        return breaker
+
+    def after_response(self, breaker, status_code=None, error=None):
+        """记录请求结果：被拒绝(403)、限流(429)、服务器错误和连接错误算作失败
+
+        PDF接口的401/402/403通常只是这一篇需要订阅，不算作接口故障。
+        """
+        if breaker is None:
+            return
+        if error is not None:
+            breaker.record_failure(type(error).__name__)
+        elif status_code in (429,) or status_code >= 500:
+            breaker.record_failure(f"HTTP {status_code}")
+        elif status_code == 403 and breaker.name != 'pdf':
+            breaker.record_failure(f"HTTP {status_code}")
+        else:
+            breaker.record_success()
+
+    def seconds_until_any(self, names):
+        """这些接口中最早可以探测的还要等多少秒"""
+        return min(self.breakers[name].seconds_until_probe() for name in names)
+
+    def all_blocked(self, names):
+        return all(self.breakers[name].blocked() for name in names)
+
+    def summary(self):
+        return {name: {'state': b.state, 'trips': b.trips} for name, b in self.breakers.items()}
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下载器配置：超时、重试次数、各种等待时间范围和额外的页面选择器
+
+requests版、增强版和终极版之间的区别主要是这些写死的常量，这里把它们集中成一份配置，
+并提供几个命名的配置档案（profile），按网络环境在速度和稳健之间取舍，不需要换脚本或改代码。
+
+优先级（后者覆盖前者）: 默认值 < 配置档案 < 配置文件 < --set 覆盖 < 命令行参数
+
+配置文件支持 TOML（Python 3.11+ 自带，更早的版本需要 pip install tomli）、
+YAML（pip install pyyaml）和 JSON，例如:
+
+    profile = "conservative"
+
+    [waits]
+    politeness = [20, 40]
+
+    [timeouts]
+    pdf = 300
+
+    [selectors]
+    pdf_link = ["a.new-pdf-button"]
+
+    [download]
+    workers = 2
+    breaker_cooldown = 900
+"""
+
+import copy
+import json
+import os
+
+try:
+    import tomllib
+    HAS_TOML = True
+except ImportError:
+    try:
+        import tomli as tomllib
+        HAS_TOML = True
+    except ImportError:
+        HAS_TOML = False
+
+try:
+    import yaml
+    HAS_YAML = True
+except ImportError:
+    HAS_YAML = False
+
+DEFAULT_SETTINGS = {
+    # 请求超时（秒）
+    'timeouts': {
+        'search': 45,
+        'detail': 45,
+        'toc': 45,
+        'pdf': 180,
+    },
+    'retries': {
+        # urllib3自动重试的次数和退避系数
+        'http_total': 3,
+        'http_backoff': 3,
+        # 每种搜索方法的尝试次数
+        'search_attempts': 2,
+    },
+    # 各种主动等待的随机范围（秒）
+    'waits': {
+        'search_page_load': [3, 8],
+        'detail_page_load': [2, 5],
+        'next_search_method': [3, 8],
+        'search_retry': [5, 15],
+        'rate_limited_429': [60, 120],
+        'politeness': [15, 30],
+    },
+    # 额外的页面选择器，排在内置选择器之前尝试（ACM改版后不用改代码就能修复）
+    'selectors': {
+        'search_result': [],
+        'pdf_link': [],
+        'reference': [],
+        'toc_item': [],
+    },
+    # 下载命令行参数的默认值（键为参数名，如 workers、low_memory、breaker_threshold）
+    'download': {},
+}
+
+PROFILES = {
+    # 校园网/机构网络，IP受信任：等待短、超时短、并发高
+    'fast-campus': {
+        'timeouts': {'search': 20, 'detail': 20, 'toc': 20, 'pdf': 90},
+        'retries': {'http_total': 2, 'http_backoff': 1, 'search_attempts': 1},
+        'waits': {
+            'search_page_load': [1, 2],
+            'detail_page_load': [1, 2],
+            'next_search_method': [1, 3],
+            'search_retry': [3, 6],
+            'rate_limited_429': [30, 60],
+            'politeness': [3, 8],
+        },
+        'download': {'workers': 4},
+    },
+    # 容易被限流的网络：逐篇处理、等待长、重试多、熔断早
+    'conservative': {
+        'timeouts': {'search': 60, 'detail': 60, 'toc': 60, 'pdf': 300},
+        'retries': {'http_total': 5, 'http_backoff': 5, 'search_attempts': 3},
+        'waits': {
+            'search_page_load': [5, 12],
+            'detail_page_load': [3, 8],
+            'next_search_method': [5, 12],
+            'search_retry': [10, 30],
+            'rate_limited_429': [120, 300],
+            'politeness': [30, 60],
+        },
+        'download': {'workers': 1, 'breaker_threshold': 2, 'breaker_cooldown': 900},
+    },
+    # 无人值守的通宵大批量任务：中等并发、低内存、熔断后长时间等待再探测
+    'bulk-overnight': {
+        'timeouts': {'pdf': 300},
+        'retries': {'http_total': 4},
+        'waits': {
+            'rate_limited_429': [120, 240],
+            'politeness': [20, 40],
+        },
+        'download': {'workers': 2, 'low_memory': True, 'dashboard_interval': 300, 'breaker_cooldown': 1800},
+    },
+}
+
+
+def merge_settings(base, override, path=''):
+    """把override合并到base中（原地修改），未知的配置项报错"""
+    for key, value in override.items():
+        name = f"{path}{key}"
+        if key not in base:
+            raise ValueError(f"未知的配置项: {name}")
+        if isinstance(base[key], dict) and key != 'download':
+            if not isinstance(value, dict):
+                raise ValueError(f"配置项 {name} 应为表/字典")
+            merge_settings(base[key], value, name + '.')
+        elif key == 'download':
+            base[key].update({k.replace('-', '_'): v for k, v in value.items()})
+        else:
+            base[key] = value
+    return base
+
+
+def read_config_file(path):
+    """读取TOML/YAML/JSON配置文件"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.toml':
+        if not HAS_TOML:
+            raise ValueError("读取TOML配置需要 Python 3.11+ 或 pip install tomli")
+        with open(path, 'rb') as f:
+            return tomllib.load(f)
+    if ext in ('.yaml', '.yml'):
+        if not HAS_YAML:
+            raise ValueError("读取YAML配置需要安装 pyyaml: pip install pyyaml")
+        with open(path, 'r', encoding='utf-8') as f:
+            return yaml.safe_load(f) or {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def parse_override(text):
+    """解析 --set 的值：JSON值、逗号分隔的数字范围，或普通字符串"""
+    key, _, value = text.partition('=')
+    if not value:
+        raise ValueError(f"--set 的格式应为 配置项=值: {text}")
+    try:
+        parsed = json.loads(value)
+    except ValueError:
+        parts = value.split(',')
+        try:
+            parsed = [float(p) if '.' in p else int(p) for p in parts] if len(parts) > 1 else value
+        except ValueError:
+            parsed = value
+    override = parsed
+    for part in reversed(key.strip().split('.')):
+        override = {part: override}
+    return override
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_settings(settings):
+    """加载时检查类型，错误的值（如 timeouts.pdf=abc）不要等到发送请求时才报错"""
+    for name, value in settings['timeouts'].items():
+        if not (is_number(value) and value > 0):
+            raise ValueError(f"超时 timeouts.{name} 应为正数（秒）: {value!r}")
+    for name, value in settings['retries'].items():
+        integral = name != 'http_backoff'
+        if not (is_number(value) and value >= 0 and (not integral or float(value).is_integer())):
+            kind = "非负整数" if integral else "非负数"
+            raise ValueError(f"重试设置 retries.{name} 应为{kind}: {value!r}")
+        if integral:
+            settings['retries'][name] = int(value)
+    for name, bounds in settings['waits'].items():
+        if not (isinstance(bounds, list) and len(bounds) == 2 and all(is_number(b) for b in bounds)
+                and 0 <= bounds[0] <= bounds[1]):
+            raise ValueError(f"等待时间 waits.{name} 应为 [最小值, 最大值]: {bounds!r}")
+    for name, selectors in settings['selectors'].items():
+        if isinstance(selectors, str):
+            # --set selectors.pdf_link=a.new-button 只给了一个选择器
+            selectors = settings['selectors'][name] = [selectors]
+        if not (isinstance(selectors, list) and all(isinstance(x, str) for x in selectors)):
+            raise ValueError(f"选择器 selectors.{name} 应为字符串列表: {selectors!r}")
+
+
+def load_settings(config_file=None, profile=None, overrides=None):
+    """按优先级合并默认值、配置档案、配置文件和 --set 覆盖"""
+    settings = copy.deepcopy(DEFAULT_SETTINGS)
+    file_settings = read_config_file(config_file) if config_file else {}
+    profile = profile or file_settings.pop('profile', None)
+    file_settings.pop('profile', None)
+
+    if profile:
+        if profile not in PROFILES:
+            raise ValueError(f"未知的配置档案: {profile}（可选: {', '.join(PROFILES)}）")
+        merge_settings(settings, copy.deepcopy(PROFILES[profile]))
+    merge_settings(settings, file_settings)
+    for text in overrides or []:
+        merge_settings(settings, parse_override(text))
+
+    validate_settings(settings)
+    settings['profile'] = profile
+    return settings
+
+
+def apply_selectors(targets, extra):
+    """把额外的选择器插到对应选择器列表的最前面，targets为 {名称: 选择器列表}"""
+    for name, selectors in (extra or {}).items():
+        target = targets[name]
+        for selector in reversed(selectors):
+            if selector not in target:
+                target.insert(0, selector)
+
+
+def print_settings(settings):
+    """打印生效的配置（--show-config）"""
+    print(f"配置档案: {settings.get('profile') or '默认'}")
+    for section in ('timeouts', 'retries', 'waits', 'selectors', 'download'):
+        values = settings[section]
+        if values:
+            print(f"[{section}]")
+            for key, value in values.items():
+                print(f"  {key} = {value}")
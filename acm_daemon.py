@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+常驻服务模式：保持网络会话、缓存和解析进程池常驻内存，
+通过监视目录或本地HTTP/JSON接口接收新的论文标题，并实时返回每篇论文的处理状态。
+
+HTTP接口（默认只监听127.0.0.1）:
+  POST /jobs                {"titles": ["标题1", "标题2"]}  提交任务，返回任务ID
+  GET  /jobs                所有任务的概要
+  GET  /jobs/<id>           任务中每篇论文的状态
+  GET  /jobs/<id>/stream    以JSON Lines流式返回状态变化，任务完成后结束
+  GET  /status              服务状态
+
+监视目录:
+  把 .xlsx（需要Title列）或 .txt（每行一个标题）文件放入监视目录即可提交任务，
+  处理状态写入同名的 .status.json 文件，原文件移动到 processed/ 子目录。
+"""
+
+import os
+import json
+import time
+import uuid
+import queue
+import shutil
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class DownloadJob:
+    """一次提交的一批论文标题，以及每篇论文的处理状态"""
+
+    def __init__(self, titles, source):
+        self.id = uuid.uuid4().hex[:12]
+        self.source = source
+        self.created = time.strftime('%Y-%m-%d %H:%M:%S')
+        self.items = [{'title': title, 'status': 'queued'} for title in titles]
+        self.events = []
+        self.condition = threading.Condition()
+
+    @property
+    def finished(self):
+        return all(item['status'] not in ('queued', 'processing') for item in self.items)
+
+    def update(self, index, status, error=None):
+        """更新一篇论文的状态（出错时附带错误信息），并通知正在流式读取的客户端"""
+        with self.condition:
+            self.items[index]['status'] = status
+            event = {'job': self.id, 'index': index, 'title': self.items[index]['title'],
+                     'status': status, 'time': time.strftime('%Y-%m-%d %H:%M:%S')}
+            if error is not None:
+                self.items[index]['error'] = error
+                event['error'] = error
+            self.events.append(event)
+            self.condition.notify_all()
+
+    def summary(self):
+        counts = {}
+        for item in self.items:
+            counts[item['status']] = counts.get(item['status'], 0) + 1
+        return {'id': self.id, 'source': self.source, 'created': self.created,
+                'total': len(self.items), 'finished': self.finished, 'counts': counts}
+
+    def to_dict(self):
+        data = self.summary()
+        data['items'] = self.items
+        return data
+
+
+class DownloadService:
+    """常驻下载服务：复用同一个下载器实例（会话、Cookie、缓存）处理所有提交的任务"""
+
+    def __init__(self, downloader, workers=1, max_finished_jobs=500):
+        self.downloader = downloader
+        # 常驻服务一直运行，相同请求的结果只复用一小时，之后重新请求
+        downloader.single_flight.ttl = 3600
+        self.workers = max(1, workers)
+        self.max_finished_jobs = max_finished_jobs
+        self.tasks = queue.Queue()
+        self.jobs = {}
+        self.jobs_lock = threading.Lock()
+        self.started = time.time()
+        self.stopping = threading.Event()
+
+    def warm_up(self):
+        """启动时访问一次ACM主页建立会话，之后的任务都不再需要预热"""
+        try:
+            print("正在访问ACM主页预热会话...")
+            response = self.downloader.http_get('https://dl.acm.org/', timeout=45)
+            print(f"会话预热完成: {response.status_code}")
+        except Exception as e:
+            print(f"会话预热失败（不影响后续处理）: {e}")
+
+    def start(self):
+        """启动处理线程"""
+        self.downloader.create_output_directory()
+        self.downloader.start_parse_pool()
+        self.warm_up()
+        for i in range(self.workers):
+            threading.Thread(target=self.worker_loop, name=f"download-worker-{i + 1}", daemon=True).start()
+        print(f"下载服务已启动: {self.workers} 个处理线程")
+
+    def stop(self):
+        self.stopping.set()
+        self.downloader.stop_parse_pool()
+        self.downloader.save_state(force=True)
+        self.downloader.selector_health.save()
+        self.downloader.close()
+
+    def submit(self, titles, source):
+        """提交一批标题，返回任务"""
+        titles = [str(t).strip() for t in titles if str(t).strip()]
+        job = DownloadJob(titles, source)
+        with self.jobs_lock:
+            self.jobs[job.id] = job
+            self.prune_jobs()
+        for index, title in enumerate(titles):
+            self.tasks.put((job, index, title))
+        print(f"收到新任务 {job.id}（来源: {source}），共 {len(titles)} 篇论文")
+        return job
+
+    def prune_jobs(self):
+        """只保留最近的已完成任务，避免常驻进程内存无限增长"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
+
+    def get_job(self, job_id):
+        with self.jobs_lock:
+            return self.jobs.get(job_id)
+
+    def list_jobs(self):
+        with self.jobs_lock:
+            return [job.summary() for job in self.jobs.values()]
+
+    def status(self):
+        downloader = self.downloader
+        return {
+            'uptime_seconds': int(time.time() - self.started),
+            'queued_titles': self.tasks.qsize(),
+            'jobs': len(self.jobs),
+            'successful_downloads': downloader.successful_downloads,
+            'failed_downloads': downloader.failed_downloads,
+            'progress': downloader.progress.snapshot(),
+        }
+
+    def worker_loop(self):
+        """处理线程：逐篇处理队列中的论文"""
+        processed = 0
+        while not self.stopping.is_set():
+            try:
+                job, index, title = self.tasks.get(timeout=1)
+            except queue.Empty:
+                continue
+
+            processed += 1
+            try:
+                job.update(index, 'processing')
+                # 队列中还有论文时才按网络礼仪等待，零星的请求可以立即返回
+                status = self.downloader.handle_title(processed, processed, title,
+                                                      wait_after=not self.tasks.empty())
+                job.update(index, status)
+            except Exception as e:
+                # 记录结果、登记索引等步骤出错时不能让处理线程退出，否则任务一直停在processing
+                print(f"处理论文时出错: {title}: {e}")
+                job.update(index, 'error', error=str(e))
+            finally:
+                self.tasks.task_done()
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """本地HTTP/JSON接口"""
+
+    service = None
+
+    def log_message(self, format, *args):
+        # 使用服务自己的日志输出，不打印每个HTTP请求
+        pass
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parts = [p for p in self.path.split('?')[0].split('/') if p]
+
+        if parts == ['status']:
+            self.send_json(self.service.status())
+        elif parts == ['jobs']:
+            self.send_json(self.service.list_jobs())
+        elif len(parts) in (2, 3) and parts[0] == 'jobs':
+            job = self.service.get_job(parts[1])
+            if job is None:
+                self.send_json({'error': '任务不存在'}, status=404)
+            elif len(parts) == 3 and parts[2] == 'stream':
+                self.stream_job(job)
+            elif len(parts) == 2:
+                self.send_json(job.to_dict())
+            else:
+                self.send_json({'error': '未知接口'}, status=404)
+        else:
+            self.send_json({'error': '未知接口'}, status=404)
+
+    def do_POST(self):
+        if self.path.split('?')[0].rstrip('/') != '/jobs':
+            self.send_json({'error': '未知接口'}, status=404)
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            titles = payload.get('titles') or []
+            if isinstance(titles, str):
+                titles = [titles]
+        except Exception as e:
+            self.send_json({'error': f'请求格式错误: {e}'}, status=400)
+            return
+
+        if not titles:
+            self.send_json({'error': '请在titles中提供至少一个论文标题'}, status=400)
+            return
+
+        job = self.service.submit(titles, source='http')
+        self.send_json({'id': job.id, 'total': len(job.items),
+                        'status_url': f'/jobs/{job.id}', 'stream_url': f'/jobs/{job.id}/stream'}, status=202)
+
+    def stream_job(self, job):
+        """以JSON Lines格式流式返回状态变化，直到任务完成"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+
+        sent = 0
+        try:
+            while True:
+                with job.condition:
+                    while sent == len(job.events) and not job.finished:
+                        job.condition.wait(timeout=30)
+                    events = job.events[sent:]
+                    finished = job.finished
+                for event in events:
+                    self.wfile.write((json.dumps(event, ensure_ascii=False) + '\n').encode('utf-8'))
+                self.wfile.flush()
+                sent += len(events)
+                if finished:
+                    break
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        self.close_connection = True
+
+
+class WatchFolder:
+    """监视目录：发现新的标题文件就提交任务，并把处理状态写回目录"""
+
+    def __init__(self, service, watch_dir, poll_interval=5):
+        self.service = service
+        self.watch_dir = watch_dir
+        self.processed_dir = os.path.join(watch_dir, 'processed')
+        self.poll_interval = poll_interval
+        self.watched_jobs = {}
+        os.makedirs(self.processed_dir, exist_ok=True)
+
+    def read_titles(self, path):
+        if path.endswith('.txt'):
+            with open(path, 'r', encoding='utf-8') as f:
+                return [line.strip() for line in f if line.strip()]
+        return self.service.downloader.read_excel_file(path)
+
+    def scan(self):
+        for name in sorted(os.listdir(self.watch_dir)):
+            path = os.path.join(self.watch_dir, name)
+            if not os.path.isfile(path) or not name.endswith(('.xlsx', '.txt')) or name.startswith('~$'):
+                continue
+            # 文件可能还在写入中，等修改时间稳定后再处理
+            if time.time() - os.path.getmtime(path) < self.poll_interval:
+                continue
+
+            try:
+                titles = self.read_titles(path)
+            except Exception as e:
+                print(f"读取监视目录中的文件失败 {name}: {e}")
+                titles = []
+
+            shutil.move(path, os.path.join(self.processed_dir, name))
+            if titles:
+                job = self.service.submit(titles, source=name)
+                status_path = os.path.join(self.watch_dir, os.path.splitext(name)[0] + '.status.json')
+                self.watched_jobs[job.id] = (job, status_path)
+
+    def write_status(self):
+        for job_id, (job, status_path) in list(self.watched_jobs.items()):
+            # 先记录是否已完成再写文件，保证最后一次写入的一定是最终状态
+            finished = job.finished
+            try:
+                tmp_path = status_path + '.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(job.to_dict(), f, ensure_ascii=False, indent=1)
+                os.replace(tmp_path, status_path)
+            except Exception as e:
+                print(f"写入状态文件失败 {status_path}: {e}")
+            if finished:
+                del self.watched_jobs[job_id]
+
+    def run(self):
+        print(f"正在监视目录: {os.path.abspath(self.watch_dir)}")
+        while not self.service.stopping.is_set():
+            self.scan()
+            self.write_status()
+            time.sleep(self.poll_interval)
+
+
+def run_service(downloader, host='127.0.0.1', port=8765, watch_dir=None, workers=1, poll_interval=5):
+    """启动常驻服务，直到按Ctrl+C退出"""
+    service = DownloadService(downloader, workers=workers)
+    service.start()
+
+    if watch_dir:
+        os.makedirs(watch_dir, exist_ok=True)
+        watcher = WatchFolder(service, watch_dir, poll_interval=poll_interval)
+        threading.Thread(target=watcher.run, name="watch-folder", daemon=True).start()
+
+    ServiceRequestHandler.service = service
+    server = ThreadingHTTPServer((host, port), ServiceRequestHandler)
+    server.daemon_threads = True
+    print(f"HTTP接口已启动: http://{host}:{port}/ （按Ctrl+C退出）")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n正在停止服务...")
+    finally:
+        server.server_close()
+        service.stop()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+已下载论文的全文提取与本地全文检索
+
+多进程并行从PDF中提取文本，写入SQLite全文索引（FTS5，不支持时退化为LIKE查询）。
+更新是增量的：
+- 文件大小和修改时间都没变的直接跳过，不读取文件
+- 变了的再计算SHA-256，内容没变（例如只是被touch）只更新记录
+- 内容相同的文件（例如索引复用时的硬链接）直接复用已提取的文本
+- 目录中已经不存在的文件从索引中移除
+因此每晚批量下载后的增量更新只需处理新文件，不需要重新扫描所有PDF的内容。
+
+文本提取需要 pypdf（pip install pypdf），未安装时尝试使用 poppler 的 pdftotext 命令。
+"""
+
+import os
+import time
+import shutil
+import sqlite3
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+from acm_library_index import file_sha256
+
+try:
+    from pypdf import PdfReader
+    HAS_PYPDF = True
+except ImportError:
+    HAS_PYPDF = False
+
+# 每处理多少个文件提交一次事务
+COMMIT_EVERY = 50
+
+
+def extract_pdf_text(path):
+    """提取单个PDF的文本（在子进程中运行），返回提取结果"""
+    result = {'path': path, 'text': '', 'pages': None, 'error': None}
+    try:
+        if HAS_PYPDF:
+            reader = PdfReader(path)
+            result['pages'] = len(reader.pages)
+            result['text'] = '\n'.join(page.extract_text() or '' for page in reader.pages)
+        elif shutil.which('pdftotext'):
+            output = subprocess.run(['pdftotext', '-q', '-enc', 'UTF-8', path, '-'],
+                                    capture_output=True, timeout=300)
+            result['text'] = output.stdout.decode('utf-8', errors='replace')
+            result['pages'] = result['text'].count('\f') or None
+        else:
+            result['error'] = '未安装 pypdf 或 pdftotext，无法提取文本'
+    except Exception as e:
+        result['error'] = str(e)
+    return result
+
+
+class FullTextIndex:
+    """PDF全文的SQLite索引"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.has_fts = False
+        self.create_tables()
+
+    def create_tables(self):
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    path TEXT PRIMARY KEY,
+                    sha256 TEXT NOT NULL,
+                    size INTEGER,
+                    mtime_ns INTEGER,
+                    pages INTEGER,
+                    chars INTEGER,
+                    error TEXT,
+                    indexed_at TEXT
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_sha256 ON documents(sha256)")
+
+        try:
+            with self.conn:
+                self.conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS texts USING fts5(path UNINDEXED, title, body)")
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            # 当前SQLite没有编译FTS5，使用普通表和LIKE查询
+            with self.conn:
+                self.conn.execute("CREATE TABLE IF NOT EXISTS texts (path TEXT PRIMARY KEY, title TEXT, body TEXT)")
+
+    def documents(self):
+        """已索引的文件: {路径: (sha256, 大小, 修改时间)}"""
+        rows = self.conn.execute("SELECT path, sha256, size, mtime_ns FROM documents")
+        return {row[0]: (row[1], row[2], row[3]) for row in rows}
+
+    def text_for_hash(self, sha256):
+        """已经提取过的相同内容文件的文本"""
+        row = self.conn.execute("""
+            SELECT documents.pages, texts.body FROM documents JOIN texts ON texts.path = documents.path
+            WHERE documents.sha256 = ? AND documents.error IS NULL LIMIT 1
+        """, (sha256,)).fetchone()
+        return row
+
+    def put(self, path, sha256, stat, text, pages, error=None):
+        """写入（或替换）一个文件的文本，调用方负责提交事务"""
+        self.conn.execute("DELETE FROM texts WHERE path = ?", (path,))
+        self.conn.execute("""
+            INSERT OR REPLACE INTO documents (path, sha256, size, mtime_ns, pages, chars, error, indexed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (path, sha256, stat.st_size, stat.st_mtime_ns, pages, len(text), error,
+              time.strftime('%Y-%m-%d %H:%M:%S')))
+        if not error:
+            title = os.path.splitext(os.path.basename(path))[0]
+            self.conn.execute("INSERT INTO texts (path, title, body) VALUES (?, ?, ?)", (path, title, text))
+
+    def touch(self, path, stat):
+        """内容没变、只是修改时间变了的文件"""
+        self.conn.execute("UPDATE documents SET size = ?, mtime_ns = ? WHERE path = ?",
+                          (stat.st_size, stat.st_mtime_ns, path))
+
+    def remove(self, path):
+        self.conn.execute("DELETE FROM texts WHERE path = ?", (path,))
+        self.conn.execute("DELETE FROM documents WHERE path = ?", (path,))
+
+    def search(self, query, limit=20):
+        """在全文中查询，返回 (路径, 摘要) 列表"""
+        if self.has_fts:
+            # 每个词加引号，避免冒号、连字符等被当作FTS语法
+            match = ' '.join('"' + token.replace('"', '""') + '"' for token in query.split())
+            return self.conn.execute("""
+                SELECT path, snippet(texts, 2, '[', ']', '...', 16) FROM texts
+                WHERE texts MATCH ? ORDER BY rank LIMIT ?
+            """, (match, limit)).fetchall()
+
+        rows = self.conn.execute("SELECT path, body FROM texts WHERE body LIKE ? LIMIT ?",
+                                 (f"%{query}%", limit)).fetchall()
+        results = []
+        for path, body in rows:
+            pos = body.lower().find(query.lower())
+            results.append((path, '...' + body[max(0, pos - 60):pos + len(query) + 60].replace('\n', ' ') + '...'))
+        return results
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+
+def update_fulltext_index(directory, index_path, workers=None):
+    """增量更新目录中PDF的全文索引，只提取新增或内容变化的文件"""
+    if not os.path.isdir(directory):
+        print(f"目录不存在: {directory}")
+        return None
+
+    start_time = time.time()
+    index = FullTextIndex(index_path)
+    known = index.documents()
+    stats = {'added': 0, 'updated': 0, 'unchanged': 0, 'reused': 0, 'removed': 0, 'errors': 0}
+
+    # 第一步：只用stat判断哪些文件可能有变化
+    current = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith('.pdf'):
+                current[os.path.abspath(entry.path)] = entry.stat()
+
+    pending = []
+    # 同一批中内容相同的文件只提取一次
+    pending_hashes = set()
+    duplicates = []
+    with index.conn:
+        for path in set(known) - set(current):
+            index.remove(path)
+            stats['removed'] += 1
+
+        for path, stat in current.items():
+            old = known.get(path)
+            if old and old[1] == stat.st_size and old[2] == stat.st_mtime_ns:
+                stats['unchanged'] += 1
+                continue
+
+            # 第二步：可能有变化的文件再比较内容哈希
+            sha256 = file_sha256(path)
+            if old and old[0] == sha256:
+                index.touch(path, stat)
+                stats['unchanged'] += 1
+                continue
+
+            existing = index.text_for_hash(sha256)
+            if existing:
+                index.put(path, sha256, stat, existing[1], existing[0])
+                stats['reused'] += 1
+                continue
+
+            if sha256 in pending_hashes:
+                duplicates.append((path, sha256, stat))
+                continue
+            pending_hashes.add(sha256)
+            pending.append((path, sha256, stat, old is not None))
+
+    # 第三步：多进程提取需要处理的文件
+    if pending:
+        workers = workers or os.cpu_count() or 1
+        print(f"需要提取文本: {len(pending)} 个文件（{workers} 个进程）...")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(extract_pdf_text, [p[0] for p in pending], chunksize=4)
+            for done, ((path, sha256, stat, existed), result) in enumerate(zip(pending, results), 1):
+                index.put(path, sha256, stat, result['text'], result['pages'], result['error'])
+                if result['error']:
+                    stats['errors'] += 1
+                    print(f"提取失败 {os.path.basename(path)}: {result['error']}")
+                stats['updated' if existed else 'added'] += 1
+                if done % COMMIT_EVERY == 0:
+                    index.conn.commit()
+                    print(f"已提取 {done}/{len(pending)}")
+        index.conn.commit()
+
+    with index.conn:
+        for path, sha256, stat in duplicates:
+            existing = index.text_for_hash(sha256)
+            if existing:
+                index.put(path, sha256, stat, existing[1], existing[0])
+            else:
+                index.put(path, sha256, stat, '', None, error='相同内容的文件提取失败')
+            stats['reused'] += 1
+
+    elapsed = time.time() - start_time
+    print(f"全文索引更新完成: 新增 {stats['added']}, 更新 {stats['updated']}, 复用 {stats['reused']}, "
+          f"未变化 {stats['unchanged']}, 移除 {stats['removed']}, 失败 {stats['errors']}, "
+          f"用时 {elapsed:.1f} 秒（索引共 {index.count()} 个文件: {index_path}）")
+    return stats
+
+
+def print_text_search(index_path, query, limit=20):
+    """textsearch命令：在全文索引中查询并打印匹配片段"""
+    if not os.path.exists(index_path):
+        print(f"全文索引不存在: {index_path}（先运行 extract 命令）")
+        return []
+
+    index = FullTextIndex(index_path)
+    start_time = time.time()
+    rows = index.search(query, limit=limit)
+    elapsed_ms = (time.time() - start_time) * 1000
+
+    for path, snippet in rows:
+        print(f"\n{os.path.basename(path)}")
+        print(f"  {' '.join(snippet.split())}")
+
+    print(f"\n找到 {len(rows)} 个文件（查询用时 {elapsed_ms:.1f} 毫秒）")
+    return rows
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+已下载论文的索引库
+
+用SQLite记录每篇已下载论文的标题、DOI、作者、会议/期刊、文件路径、哈希、大小、下载时间和参考文献DOI，
+并建立FTS5全文索引（SQLite不支持FTS5时退化为LIKE查询）。
+"是否已经下载过论文X"只需要一次索引查询，不再需要列目录和模糊匹配文件名；
+多个项目指向同一个索引文件时可以跨项目去重。
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+
+def normalize_title(title):
+    """标题归一化：小写、去掉标点、合并空白，用于精确匹配"""
+    title = re.sub(r'[^\w\s]', ' ', str(title).lower())
+    return ' '.join(title.split())
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """计算文件的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class LibraryIndex:
+    """已下载论文的SQLite索引"""
+
+    COLUMNS = ('title', 'doi', 'authors', 'venue', 'file', 'sha256', 'size', 'downloaded_at')
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        self.has_fts = False
+        self.create_tables()
+
+    def create_tables(self):
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS papers (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    title TEXT NOT NULL,
+                    title_key TEXT UNIQUE NOT NULL,
+                    doi TEXT,
+                    authors TEXT,
+                    venue TEXT,
+                    file TEXT,
+                    sha256 TEXT,
+                    size INTEGER,
+                    downloaded_at TEXT,
+                    refs TEXT
+                )
+            """)
+            # 旧版本的索引没有参考文献列（JSON格式的DOI列表，NULL表示没有记录）
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(papers)")}
+            if 'refs' not in columns:
+                self.conn.execute("ALTER TABLE papers ADD COLUMN refs TEXT")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_papers_doi ON papers(doi)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_papers_sha256 ON papers(sha256)")
+
+        try:
+            with self.conn:
+                self.conn.execute("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(
+                        title, authors, venue, doi, content='papers', content_rowid='id'
+                    )
+                """)
+                # 外部内容表：由触发器保持全文索引与papers表同步
+                self.conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS papers_ai AFTER INSERT ON papers BEGIN
+                        INSERT INTO papers_fts(rowid, title, authors, venue, doi)
+                        VALUES (new.id, new.title, new.authors, new.venue, new.doi);
+                    END
+                """)
+                self.conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS papers_ad AFTER DELETE ON papers BEGIN
+                        INSERT INTO papers_fts(papers_fts, rowid, title, authors, venue, doi)
+                        VALUES ('delete', old.id, old.title, old.authors, old.venue, old.doi);
+                    END
+                """)
+                self.conn.execute("""
+                    CREATE TRIGGER IF NOT EXISTS papers_au AFTER UPDATE ON papers BEGIN
+                        INSERT INTO papers_fts(papers_fts, rowid, title, authors, venue, doi)
+                        VALUES ('delete', old.id, old.title, old.authors, old.venue, old.doi);
+                        INSERT INTO papers_fts(rowid, title, authors, venue, doi)
+                        VALUES (new.id, new.title, new.authors, new.venue, new.doi);
+                    END
+                """)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            # 当前SQLite没有编译FTS5，lookup退化为LIKE查询
+            self.has_fts = False
+
+    def add(self, title, file_path, doi=None, authors=None, venue=None, references=None):
+        """登记一篇已下载的论文（同一标题再次登记时更新记录），references为参考文献的DOI列表"""
+        file_path = os.path.abspath(file_path)
+        record = {
+            'title': title,
+            'doi': doi.lower() if doi else None,
+            'authors': '; '.join(authors) if isinstance(authors, (list, tuple)) else authors,
+            'venue': venue,
+            'file': file_path,
+            'sha256': file_sha256(file_path),
+            'size': os.path.getsize(file_path),
+            'downloaded_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'refs': json.dumps(references) if references is not None else None,
+        }
+        with self.lock, self.conn:
+            self.conn.execute("""
+                INSERT INTO papers (title, title_key, doi, authors, venue, file, sha256, size, downloaded_at, refs)
+                VALUES (:title, :title_key, :doi, :authors, :venue, :file, :sha256, :size, :downloaded_at, :refs)
+                ON CONFLICT(title_key) DO UPDATE SET
+                    title = excluded.title,
+                    doi = COALESCE(excluded.doi, papers.doi),
+                    authors = COALESCE(excluded.authors, papers.authors),
+                    venue = COALESCE(excluded.venue, papers.venue),
+                    file = excluded.file,
+                    sha256 = excluded.sha256,
+                    size = excluded.size,
+                    downloaded_at = excluded.downloaded_at,
+                    refs = COALESCE(excluded.refs, papers.refs)
+            """, dict(record, title_key=normalize_title(title)))
+        return record
+
+    def remove_file(self, file_path):
+        """文件已被删除或隔离时移除对应记录"""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM papers WHERE file = ?", (os.path.abspath(file_path),))
+
+    def titles_for_file(self, file_path):
+        """登记为同一个文件的所有标题"""
+        with self.lock:
+            rows = self.conn.execute("SELECT title FROM papers WHERE file = ?",
+                                     (os.path.abspath(file_path),)).fetchall()
+        return [row['title'] for row in rows]
+
+    def find_by_title(self, title):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM papers WHERE title_key = ?",
+                                    (normalize_title(title),)).fetchone()
+        return dict(row) if row else None
+
+    def find_by_doi(self, doi):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM papers WHERE doi = ? ORDER BY id LIMIT 1",
+                                    (doi.lower(),)).fetchone()
+        return dict(row) if row else None
+
+    def search(self, query, limit=20):
+        """按标题/作者/会议/DOI查询，DOI形式的查询直接精确匹配"""
+        query = query.strip()
+        if re.match(r'^10\.\d{4,9}/\S+$', query):
+            row = self.find_by_doi(query)
+            return [row] if row else []
+
+        with self.lock:
+            if self.has_fts:
+                # 每个词加引号，避免标题中的冒号、连字符被当作FTS语法
+                match = ' '.join('"' + token.replace('"', '""') + '"' for token in query.split())
+                rows = self.conn.execute("""
+                    SELECT papers.* FROM papers_fts JOIN papers ON papers.id = papers_fts.rowid
+                    WHERE papers_fts MATCH ? ORDER BY rank LIMIT ?
+                """, (match, limit)).fetchall()
+            else:
+                like = f"%{query}%"
+                rows = self.conn.execute("""
+                    SELECT * FROM papers WHERE title LIKE ? OR authors LIKE ? OR venue LIKE ?
+                    ORDER BY id DESC LIMIT ?
+                """, (like, like, like, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+
+    def average_size(self):
+        """已下载PDF的平均大小（字节），索引为空时返回None"""
+        with self.lock:
+            return self.conn.execute("SELECT AVG(size) FROM papers WHERE size > 0").fetchone()[0]
+
+
+def print_lookup(index_path, query, limit=20):
+    """lookup命令：查询索引并打印结果"""
+    if not os.path.exists(index_path):
+        print(f"索引文件不存在: {index_path}")
+        return []
+
+    index = LibraryIndex(index_path)
+    start_time = time.time()
+    rows = index.search(query, limit=limit)
+    elapsed_ms = (time.time() - start_time) * 1000
+
+    for row in rows:
+        exists = os.path.exists(row['file']) if row['file'] else False
+        print(f"\n{row['title']}")
+        print(f"  DOI: {row['doi'] or '-'}")
+        if row['authors']:
+            print(f"  作者: {row['authors']}")
+        if row['venue']:
+            print(f"  出处: {row['venue']}")
+        print(f"  文件: {row['file']}{'' if exists else '（文件已不存在）'}")
+        print(f"  大小: {row['size']} bytes  下载时间: {row['downloaded_at']}")
+
+    print(f"\n找到 {len(rows)} 条结果（索引共 {index.count()} 篇，查询用时 {elapsed_ms:.1f} 毫秒）")
+    return rows
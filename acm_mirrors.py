@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+开放获取镜像源：ACM上拿不到PDF（付费墙、当前IP无权限）时，按DOI/标题到其他合法来源查找开放获取版本
+
+内置来源:
+- arxiv:           arXiv API（按标题查找预印本）
+- unpaywall:       Unpaywall（按DOI查找开放获取位置，需要提供邮箱）
+- semanticscholar: Semantic Scholar（按DOI查找openAccessPdf）
+
+新来源只需继承 MirrorSource 实现 find_pdf_urls，并加入 MIRROR_SOURCES。
+每个来源有自己的请求速率预算；各来源的地址都可以覆盖（例如指向本地的测试服务器）。
+多个候选地址可以同时请求（race），保留最先返回有效PDF文件头的那个。
+"""
+
+import os
+import re
+import time
+import queue
+import threading
+import xml.etree.ElementTree as ET
+from abc import ABC, abstractmethod
+from urllib.parse import quote, urlparse
+
+from acm_library_index import normalize_title
+from acm_pdf_verify import check_pdf
+
+
+class RateBudget:
+    """令牌桶：每分钟最多 per_minute 次请求，允许短时间内用完积攒的令牌"""
+
+    def __init__(self, per_minute, burst=None):
+        if per_minute <= 0:
+            raise ValueError(f"每分钟请求数必须大于0: {per_minute}")
+        self.rate = per_minute / 60.0
+        self.capacity = burst or max(1, per_minute // 6)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """取得一个令牌，不够时等待"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+
+class MirrorSource(ABC):
+    """镜像源基类"""
+
+    name = None
+    base_url = None
+    # 默认每分钟请求数
+    per_minute = 30
+
+    def __init__(self, base_url=None, per_minute=None, **options):
+        self.base_url = base_url or self.base_url
+        self.budget = RateBudget(per_minute or self.per_minute)
+        self.options = options
+
+    def get(self, http_get, url, **kwargs):
+        """经过速率预算发送请求"""
+        self.budget.acquire()
+        return http_get(url, **kwargs)
+
+    @abstractmethod
+    def find_pdf_urls(self, http_get, doi=None, title=None):
+        """返回候选PDF地址列表"""
+
+
+class ArxivSource(MirrorSource):
+    name = 'arxiv'
+    base_url = 'http://export.arxiv.org/api/query'
+    # arXiv API要求请求间隔不少于3秒
+    per_minute = 20
+
+    ATOM = '{http://www.w3.org/2005/Atom}'
+
+    def find_pdf_urls(self, http_get, doi=None, title=None):
+        if not title:
+            return []
+        words = re.sub(r'[^\w\s]', ' ', title).split()
+        query = quote('ti:"' + ' '.join(words) + '"')
+        response = self.get(http_get, f"{self.base_url}?search_query={query}&max_results=5", timeout=30)
+        if response.status_code != 200:
+            return []
+
+        urls = []
+        wanted = normalize_title(title)
+        for entry in ET.fromstring(response.content).iter(f'{self.ATOM}entry'):
+            entry_title = entry.findtext(f'{self.ATOM}title') or ''
+            # 只接受标题完全一致的条目，避免下载到同名不同文的论文
+            if normalize_title(entry_title) != wanted:
+                continue
+            for link in entry.iter(f'{self.ATOM}link'):
+                if link.get('title') == 'pdf' or link.get('type') == 'application/pdf':
+                    urls.append(link.get('href'))
+        return urls
+
+
+class UnpaywallSource(MirrorSource):
+    name = 'unpaywall'
+    base_url = 'https://api.unpaywall.org/v2/'
+    per_minute = 60
+
+    def find_pdf_urls(self, http_get, doi=None, title=None):
+        email = self.options.get('email')
+        if not doi or not email:
+            return []
+        response = self.get(http_get, f"{self.base_url.rstrip('/')}/{doi}?email={quote(email)}", timeout=30)
+        if response.status_code != 200:
+            return []
+
+        data = response.json()
+        locations = [data.get('best_oa_location')] + (data.get('oa_locations') or [])
+        urls = []
+        for location in locations:
+            url = (location or {}).get('url_for_pdf')
+            if url and url not in urls:
+                urls.append(url)
+        return urls
+
+
+class SemanticScholarSource(MirrorSource):
+    name = 'semanticscholar'
+    base_url = 'https://api.semanticscholar.org/graph/v1/paper/'
+    # 未使用API key时的共享限额很低
+    per_minute = 10
+
+    def find_pdf_urls(self, http_get, doi=None, title=None):
+        if not doi:
+            return []
+        response = self.get(http_get, f"{self.base_url.rstrip('/')}/DOI:{doi}?fields=openAccessPdf", timeout=30)
+        if response.status_code != 200:
+            return []
+        pdf = (response.json() or {}).get('openAccessPdf') or {}
+        return [pdf['url']] if pdf.get('url') else []
+
+
+MIRROR_SOURCES = {
+    'arxiv': ArxivSource,
+    'unpaywall': UnpaywallSource,
+    'semanticscholar': SemanticScholarSource,
+}
+
+
+def parse_source_options(values):
+    """解析 NAME=VALUE 形式的命令行参数，名称必须是已知的镜像源"""
+    options = {}
+    for value in values or []:
+        name, _, setting = value.partition('=')
+        name, setting = name.strip(), setting.strip()
+        if not name or not setting:
+            raise ValueError(f"参数格式应为 名称=值: {value}")
+        if name not in MIRROR_SOURCES:
+            raise ValueError(f"未知的镜像源: {name}（可选: {', '.join(MIRROR_SOURCES)}）")
+        options[name] = setting
+    return options
+
+
+def parse_source_urls(values):
+    """解析 --mirror-url NAME=URL，地址必须是完整的http(s)地址"""
+    urls = parse_source_options(values)
+    for name, url in urls.items():
+        parsed = urlparse(url)
+        if parsed.scheme not in ('http', 'https') or not parsed.netloc:
+            raise ValueError(f"镜像源 {name} 的地址无效（需要 http:// 或 https:// 开头的完整地址）: {url}")
+    return urls
+
+
+def parse_source_rates(values):
+    """解析 --mirror-rate NAME=PER_MINUTE，每分钟请求数必须是正数"""
+    rates = {}
+    for name, value in parse_source_options(values).items():
+        try:
+            rate = float(value)
+        except ValueError:
+            raise ValueError(f"镜像源 {name} 的每分钟请求数不是数字: {value}") from None
+        if not rate > 0 or rate == float('inf'):
+            raise ValueError(f"镜像源 {name} 的每分钟请求数必须大于0: {value}")
+        rates[name] = rate
+    return rates
+
+
+def build_mirror_sources(names, urls=None, rates=None, unpaywall_email=None):
+    """按名称创建镜像源，urls/rates 为 {名称: 地址/每分钟请求数}"""
+    urls = urls or {}
+    rates = rates or {}
+    sources = []
+    for name in names:
+        if name not in MIRROR_SOURCES:
+            raise ValueError(f"未知的镜像源: {name}（可选: {', '.join(MIRROR_SOURCES)}）")
+        options = {'email': unpaywall_email} if name == 'unpaywall' else {}
+        if name == 'unpaywall' and not unpaywall_email:
+            print("提示: unpaywall 需要提供邮箱（--unpaywall-email），已跳过")
+            continue
+        sources.append(MIRROR_SOURCES[name](
+            base_url=urls.get(name),
+            per_minute=rates.get(name),
+            **options
+        ))
+    return sources
+
+
+class MirrorFetcher:
+    """向镜像源查找并下载开放获取PDF"""
+
+    def __init__(self, sources, http_get, race=False, bandwidth=None):
+        self.sources = sources
+        self.http_get = http_get
+        self.race = race
+        # 可选的带宽限制（acm_bandwidth.BandwidthLimiter）
+        self.bandwidth = bandwidth
+
+    def find_candidates(self, doi=None, title=None):
+        """依次询问各来源，返回 [(来源, PDF地址)]"""
+        candidates = []
+        for source in self.sources:
+            try:
+                urls = source.find_pdf_urls(self.http_get, doi=doi, title=title)
+            except Exception as e:
+                print(f"镜像源 {source.name} 查询失败: {e}")
+                continue
+            for url in urls:
+                if url not in [c[1] for c in candidates]:
+                    candidates.append((source, url))
+        return candidates
+
+    def open_candidate(self, source, url):
+        """请求一个候选地址，读到第一块数据并确认是PDF后返回 (响应, 第一块数据)，否则返回None"""
+        response = source.get(self.http_get, url, timeout=120, stream=True)
+        if response.status_code != 200:
+            response.close()
+            return None
+        chunks = response.iter_content(chunk_size=8192)
+        first = next(chunks, b'')
+        if b'%PDF-' not in first[:1024]:
+            response.close()
+            return None
+        return response, first, chunks
+
+    def race_candidates(self, candidates):
+        """同时请求所有候选地址，按确认为PDF的先后顺序依次给出
+
+        最先的那个下载后无效时，直接使用其他已经打开的响应，不再重新请求；
+        生成器关闭时（已经下载成功）关闭其余的响应，包括之后才返回的那些。
+        """
+        results = queue.Queue()
+
+        def attempt(source, url):
+            opened = None
+            try:
+                opened = self.open_candidate(source, url)
+            except Exception as e:
+                print(f"镜像 {url} 请求失败: {e}")
+            results.put((source, url, opened))
+
+        for source, url in candidates:
+            threading.Thread(target=attempt, args=(source, url), name=f"mirror-{source.name}", daemon=True).start()
+
+        pending = len(candidates)
+        try:
+            while pending:
+                source, url, opened = results.get()
+                pending -= 1
+                if opened:
+                    yield source, url, opened
+        finally:
+            if pending:
+                threading.Thread(target=self.close_remaining, args=(results, pending), daemon=True).start()
+
+    @staticmethod
+    def close_remaining(results, count):
+        """关闭竞速中没有用到的响应"""
+        for _ in range(count):
+            _, _, opened = results.get()
+            if opened:
+                opened[0].close()
+
+    def sequential_candidates(self, candidates):
+        for source, url in candidates:
+            try:
+                opened = self.open_candidate(source, url)
+            except Exception as e:
+                print(f"镜像 {url} 请求失败: {e}")
+                continue
+            if opened:
+                yield source, url, opened
+
+    def download(self, filepath, doi=None, title=None):
+        """查找并下载开放获取版本，成功时返回 (来源名称, 地址)，失败时返回None"""
+        candidates = self.find_candidates(doi=doi, title=title)
+        if not candidates:
+            print("镜像源中没有找到开放获取版本")
+            return None
+        print(f"镜像源中找到 {len(candidates)} 个候选地址" + ("，同时请求" if self.race and len(candidates) > 1 else ""))
+
+        if self.race and len(candidates) > 1:
+            attempts = self.race_candidates(candidates)
+        else:
+            attempts = self.sequential_candidates(candidates)
+
+        try:
+            return self.save_first_valid(attempts, filepath)
+        finally:
+            attempts.close()
+
+    def save_first_valid(self, attempts, filepath):
+        """依次保存候选响应，返回第一个通过检查的 (来源名称, 地址)"""
+        part_path = filepath + '.part'
+        for source, url, (response, first, chunks) in attempts:
+            throttle = self.bandwidth.connection() if self.bandwidth else None
+            try:
+                with open(part_path, 'wb') as f:
+                    f.write(first)
+                    if throttle:
+                        throttle(len(first))
+                    for chunk in chunks:
+                        if chunk:
+                            f.write(chunk)
+                            if throttle:
+                                throttle(len(chunk))
+            except Exception as e:
+                print(f"从镜像 {url} 下载失败: {e}")
+                continue
+            finally:
+                response.close()
+
+            problem = check_pdf(part_path)['problem']
+            if problem:
+                print(f"镜像 {url} 的文件无效（{problem}），尝试下一个")
+                os.remove(part_path)
+                continue
+            os.replace(part_path, filepath)
+            return source.name, url
+
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        return None
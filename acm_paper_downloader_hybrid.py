@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ACM Digital Library 论文自动下载器 (混合版)
+浏览器只用来建立机构访问会话（校园网/机构登录），随后把Cookie导出到
+带连接池的HTTP会话中，所有搜索和PDF下载都走纯HTTP请求。
+只有在会话失效时才会重新启动浏览器。
+
+安装依赖:
+pip install pandas openpyxl requests beautifulsoup4 lxml selenium
+
+还需要安装Chrome浏览器和ChromeDriver（见README）
+
+使用方法:
+python acm_paper_downloader_hybrid.py papers.xlsx
+python acm_paper_downloader_hybrid.py papers.xlsx --headless
+python acm_paper_downloader_hybrid.py papers.xlsx --login-url https://your-library-proxy/login
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+from collections import deque
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+from acm_paper_downloader_ultimate import (ACMPaperDownloaderUltimate, add_download_arguments,
+                                           download_options, parse_download_args, run_download)
+from acm_trace import TracedRetry
+
+
+# 机构单点登录页面的主机名或路径中常见的片段
+SSO_URL_MARKERS = ('/login', 'sso', 'shibboleth', 'wayf', '/idp/')
+
+# 登录页和人机验证页面中的特征（小写）
+LOGIN_PAGE_MARKERS = [
+    b'type="password"',
+    b"type='password'",
+    b'shibboleth',
+    b'institutional login',
+    b'single sign-on',
+    b'challenge-platform',
+    b'cf-challenge',
+    b'captcha',
+]
+
+
+class ACMPaperDownloaderHybrid(ACMPaperDownloaderUltimate):
+    def __init__(self, excel_file_path, login_url="https://dl.acm.org/", headless=False,
+                 profile_dir="browser_profile", **kwargs):
+        # 以下属性在父类__init__调用setup_session之前就需要
+        self.login_url = login_url
+        self.headless = headless
+        self.profile_dir = profile_dir
+        self.browser_user_agent = None
+        self.bootstrap_count = 0
+        # 重建会话的频率限制：每个时间窗口内最多重建几次，长时间运行中偶尔过期总能重新登录，
+        # 但登录本身失败（如账号问题）时不会反复启动浏览器
+        self.bootstrap_times = deque()
+        self.max_bootstraps = 3
+        self.bootstrap_window = 1800
+        self.bootstrap_lock = threading.Lock()
+        super().__init__(excel_file_path, **kwargs)
+
+    def setup_session(self):
+        """设置带连接池的requests会话，Cookie稍后由浏览器导入"""
+        self.session = requests.Session()
+
+        # 403不在重试列表中：混合模式下403意味着机构会话失效，需要重新建立
+        retry_strategy = (TracedRetry if self.tracer else Retry)(
+            total=self.settings['retries']['http_total'],
+            backoff_factor=self.settings['retries']['http_backoff'],
+            status_forcelist=[429, 500, 502, 503, 504],
+        )
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=retry_strategy
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.update_headers()
+
+        print("混合模式网络会话初始化成功")
+
+    def update_headers(self):
+        """更新请求头，但保持与浏览器一致的User-Agent（Cookie通常与UA绑定）"""
+        super().update_headers()
+        if self.browser_user_agent:
+            self.session.headers['User-Agent'] = self.browser_user_agent
+
+    def bootstrap_session(self):
+        """启动浏览器建立机构访问会话，并把Cookie导出到HTTP会话"""
+        now = time.monotonic()
+        while self.bootstrap_times and now - self.bootstrap_times[0] > self.bootstrap_window:
+            self.bootstrap_times.popleft()
+        if len(self.bootstrap_times) >= self.max_bootstraps:
+            wait_time = self.bootstrap_window - (now - self.bootstrap_times[0])
+            print(f"{self.bootstrap_window // 60}分钟内已重建会话{len(self.bootstrap_times)}次，"
+                  f"{wait_time / 60:.0f}分钟内不再重建")
+            return False
+        self.bootstrap_times.append(now)
+
+        chrome_options = Options()
+        # 使用独立的浏览器配置目录，登录状态可以跨运行保留，会话过期后通常无需再次手动登录
+        chrome_options.add_argument(f"--user-data-dir={os.path.abspath(self.profile_dir)}")
+        if self.headless:
+            chrome_options.add_argument("--headless=new")
+
+        driver = None
+        try:
+            print("正在启动浏览器建立机构访问会话...")
+            driver = webdriver.Chrome(options=chrome_options)
+            driver.get(self.login_url)
+
+            if self.bootstrap_count == 0 and not self.headless and sys.stdin.isatty():
+                input("请在浏览器中完成校园网/机构登录（如已登录可直接继续），完成后按回车...")
+            else:
+                wait_time = random.randint(3, 6)
+                print(f"页面加载等待{wait_time}秒...")
+                time.sleep(wait_time)
+
+            # 确保拿到dl.acm.org域下的Cookie
+            if 'dl.acm.org' not in driver.current_url:
+                driver.get("https://dl.acm.org/")
+                time.sleep(random.randint(3, 6))
+
+            self.browser_user_agent = driver.execute_script("return navigator.userAgent")
+            cookies = driver.get_cookies()
+
+            self.session.cookies.clear()
+            for cookie in cookies:
+                self.session.cookies.set(
+                    cookie['name'],
+                    cookie['value'],
+                    domain=cookie.get('domain'),
+                    path=cookie.get('path', '/')
+                )
+            self.update_headers()
+
+            self.bootstrap_count += 1
+            print(f"已从浏览器导入 {len(cookies)} 个Cookie，浏览器即将关闭")
+            return True
+
+        except Exception as e:
+            print(f"浏览器建立会话失败: {e}")
+            print("请确保已安装Chrome浏览器和ChromeDriver")
+            return False
+        finally:
+            # 浏览器只用于建立会话，用完立即关闭以节省内存
+            if driver:
+                driver.quit()
+
+    @staticmethod
+    def is_login_page(response):
+        """响应是否是登录页或人机验证页面（只检查HTML响应的前64KB）"""
+        content_type = response.headers.get('content-type', '').lower()
+        if 'html' not in content_type:
+            return False
+        head = response.content[:65536].lower()
+        return any(marker in head for marker in LOGIN_PAGE_MARKERS)
+
+    def is_session_expired(self, url, response):
+        """判断响应是否说明机构会话已经失效"""
+        # 被重定向离开ACM、到了登录/单点登录页面（只看主机名和路径，搜索地址的查询参数中可能有
+        # "Processor"、"Lasso"这样的标题）
+        final = urlparse(response.url)
+        final_host = (final.hostname or '').lower()
+        redirected = bool(response.history) or final_host != (urlparse(url).hostname or '').lower()
+        if redirected and not final_host.endswith('dl.acm.org'):
+            location = final_host + final.path.lower()
+            if any(marker in location for marker in SSO_URL_MARKERS):
+                return True
+
+        # 请求PDF却拿到HTML页面（或401/403）多数只是这一篇没有订阅，只有确实是登录/验证页面时才算会话失效，
+        # 否则每篇付费论文都会触发一次浏览器重启
+        is_pdf_url = '/doi/pdf/' in url or url.lower().endswith('.pdf')
+        if is_pdf_url:
+            return self.is_login_page(response)
+
+        if response.status_code in (401, 403):
+            return True
+        return False
+
+    def http_get(self, url, **kwargs):
+        """发送GET请求，会话失效时重新启动浏览器后重试一次"""
+        generation = self.bootstrap_count
+        response = super().http_get(url, **kwargs)
+        if self.is_session_expired(url, response):
+            response.close()
+            with self.bootstrap_lock:
+                # 并发时可能已有其他线程重建了会话，此时直接用新Cookie重试
+                if self.bootstrap_count == generation:
+                    print("机构访问会话可能已失效，重新建立会话...")
+                    renewed = self.bootstrap_session()
+                else:
+                    renewed = True
+            if renewed:
+                response = super().http_get(url, **kwargs)
+        return response
+
+    def process_papers(self):
+        """先用浏览器建立会话，再用HTTP会话处理所有论文"""
+        if not self.bootstrap_session():
+            print("无法建立机构访问会话，退出")
+            return
+        super().process_papers()
+    
+    def trace_title(self, title):
+        if not self.bootstrap_session():
+            print("无法建立机构访问会话，退出")
+            return None
+        return super().trace_title(title)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ACM论文下载器（混合版：浏览器建立会话 + HTTP批量下载）")
+    add_download_arguments(parser)
+    parser.add_argument("--login-url", default="https://dl.acm.org/",
+                        help="建立会话时打开的页面，如图书馆代理或机构登录页")
+    parser.add_argument("--headless", action="store_true",
+                        help="无头模式启动浏览器（适合已保存登录状态的情况）")
+    parser.add_argument("--profile-dir", default="browser_profile",
+                        help="浏览器配置目录，用于保存登录状态")
+    args = parse_download_args(parser)
+
+    if not (args.toc or args.trace or args.plan_file) and (not args.excel_file or not os.path.exists(args.excel_file)):
+        print(f"错误: 文件 '{args.excel_file}' 不存在" if args.excel_file else "错误: 请提供Excel文件或 --toc 参数")
+        sys.exit(1)
+
+    downloader = ACMPaperDownloaderHybrid(
+        args.excel_file,
+        login_url=args.login_url,
+        headless=args.headless,
+        profile_dir=args.profile_dir,
+        **download_options(args)
+    )
+    run_download(downloader, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -17,10 +17,35 @@ import time
 import re
 import random
 import json
+import gzip
+import hashlib
+import csv
+import argparse
+import shutil
+import socket
+import threading
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 import requests
-from urllib.parse import quote, urljoin
+from collections import deque
+from contextlib import nullcontext
+from urllib.parse import quote, unquote, urljoin
 from bs4 import BeautifulSoup
+from acm_work_queue import open_work_queue
+from acm_daemon import run_service
+from acm_pdf_verify import verify_directory, load_repair_queue, save_repair_queue
+from acm_library_index import LibraryIndex, normalize_title, print_lookup
+from acm_fulltext import update_fulltext_index, print_text_search
+from acm_progress import ProgressTracker, format_duration
+from acm_trace import SpanTracer, TracedRetry, run_with_profiler
+from acm_plan import build_plan, print_plan, write_plan, load_plan, read_input_dois
+from acm_config import PROFILES, load_settings, apply_selectors, print_settings
+from acm_selector_health import SelectorHealth
+from acm_circuit import CircuitBreakers, CircuitOpenError
+from acm_singleflight import SingleFlight, normalize_url
+from acm_sync import SyncState, read_input_table, sync_state_path, print_sync_summary
+from acm_bandwidth import BandwidthLimiter, TransferWindow, parse_rate
+from acm_mirrors import MirrorFetcher, MIRROR_SOURCES, build_mirror_sources, parse_source_urls, parse_source_rates
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 try:
@@ -37,15 +62,692 @@ except ImportError:
     HAS_CLOUDSCRAPER = False
     print("提示: 安装 cloudscraper 可以绕过Cloudflare保护: pip install cloudscraper")
 
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    # 没有zstandard时页面缓存使用gzip压缩
+    HAS_ZSTD = False
+
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:
+    # Windows上没有resource模块，无法统计内存峰值
+    HAS_RESOURCE = False
+
+
+# 搜索结果页中第一个结果链接的选择器
+SEARCH_RESULT_SELECTORS = [
+    '.issue-item__title a',
+    '.search__item .hlFld-Title a',
+    '.issue-item-title a',
+    '.search-result-title a',
+    'h5 a[href*="/doi/"]',
+    'a[href*="/doi/"]',
+    '.search-result a[href*="/doi/"]',
+    '.result-item a[href*="/doi/"]'
+]
+
+# 论文详情页中PDF链接的选择器
+PDF_LINK_SELECTORS = [
+    'a[href*=".pdf"]',
+    'a[title*="PDF"]',
+    'a[aria-label*="PDF"]',
+    '.pdf-link',
+    '.download-pdf',
+    '.btn--pdf',
+    'a[href*="pdf"]',
+    'a[data-title*="PDF"]',
+    '.download-link[href*="pdf"]',
+    'a[href*="/ft_gateway.cfm"]'
+]
+
+# 详情页中参考文献列表可能使用的容器
+REFERENCE_SELECTORS = [
+    '.references__list',
+    'ol.references',
+    '.references',
+    '#references',
+    'section[data-title="References"]',
+]
+
+# 会议论文集/期刊目录页中每篇论文标题的链接
+TOC_ITEM_SELECTORS = [
+    '.issue-item__title a[href*="/doi/"]',
+    '.issue-item h5 a[href*="/doi/"]',
+    '.toc__item a[href*="/doi/"]',
+    'h5.issue-item__title a',
+]
+
+# 宽泛的兜底选择器，可能匹配到错误的链接，调整选择器顺序时始终排在最后
+FALLBACK_SELECTORS = {
+    'search': ['a[href*="/doi/"]'],
+    'pdf': ['a[href*="pdf"]'],
+}
+
+DOI_PATTERN = re.compile(r'(?:doi\.org/|/doi/(?:abs/|full/|pdf/)?|doi:\s*)(10\.\d{4,9}/[^\s?#"<>]+)', re.IGNORECASE)
+
+
+def use_extra_selectors(extra):
+    """把配置中的额外选择器排到内置选择器之前（解析进程启动时同样调用）"""
+    apply_selectors({
+        'search_result': SEARCH_RESULT_SELECTORS,
+        'pdf_link': PDF_LINK_SELECTORS,
+        'reference': REFERENCE_SELECTORS,
+        'toc_item': TOC_ITEM_SELECTORS,
+    }, extra)
+
+
+def extract_search_result(content, selectors=None):
+    """从搜索结果页中提取第一个结果的完整URL，返回 (链接, 命中的选择器)，找不到时链接为None
+    
+    selectors为尝试顺序（默认按内置顺序）。
+    """
+    soup = BeautifulSoup(content, 'html.parser')
+    try:
+        for selector in selectors or SEARCH_RESULT_SELECTORS:
+            links = soup.select(selector)
+            if links:
+                first_result_link = links[0].get('href')
+                if first_result_link:
+                    # 确保链接是完整的URL
+                    if first_result_link.startswith('/'):
+                        first_result_link = 'https://dl.acm.org' + first_result_link
+                    return first_result_link, selector
+                break
+        
+        return None, None
+    finally:
+        # 解析树的节点之间互相引用，显式拆除后内存可以立即回收
+        soup.decompose()
+
+
+def find_pdf_link(soup, paper_url, selectors=None):
+    """在已解析的详情页中查找PDF下载链接，返回 (链接, 命中的选择器)"""
+    for selector in selectors or PDF_LINK_SELECTORS:
+        pdf_links = soup.select(selector)
+        if pdf_links:
+            pdf_url = pdf_links[0].get('href')
+            if pdf_url:
+                # 确保链接是完整的URL
+                if pdf_url.startswith('/'):
+                    pdf_url = urljoin(paper_url, pdf_url)
+                return pdf_url, selector
+    
+    return None, None
+
+
+def find_paper_metadata(soup, paper_url):
+    """从详情页的meta标签中提取标题、DOI、作者和会议/期刊"""
+    def meta_values(*names):
+        values = []
+        for name in names:
+            for tag in soup.find_all('meta', attrs={'name': name}):
+                content = (tag.get('content') or '').strip()
+                if content and content not in values:
+                    values.append(content)
+        return values
+    
+    titles = meta_values('citation_title', 'dc.Title')
+    venues = meta_values('citation_conference_title', 'citation_journal_title', 'citation_inbook_title')
+    dois = [v for v in meta_values('citation_doi', 'dc.Identifier') if v.startswith('10.')]
+    if not dois:
+        match = re.search(r'/doi/(?:abs/|full/|pdf/)?(10\.\d{4,9}/[^?#]+)', paper_url)
+        if match:
+            dois = [match.group(1)]
+    
+    return {
+        'title': titles[0] if titles else None,
+        'doi': dois[0] if dois else None,
+        'authors': meta_values('citation_author', 'dc.Creator'),
+        'venue': venues[0] if venues else None,
+    }
+
+
+def find_references(soup, own_doi=None):
+    """从详情页的参考文献列表中提取被引论文的DOI（按出现顺序去重）"""
+    dois = []
+    for selector in REFERENCE_SELECTORS:
+        for container in soup.select(selector):
+            # 链接中的DOI和正文中写出的DOI都算
+            texts = [a.get('href', '') for a in container.find_all('a', href=True)]
+            texts.append(container.get_text(' '))
+            for text in texts:
+                for match in DOI_PATTERN.finditer(unquote(text)):
+                    doi = match.group(1).rstrip('.,;)').lower()
+                    if doi != own_doi and doi not in dois:
+                        dois.append(doi)
+        if dois:
+            break
+    return dois
+
+
+def extract_detail_page(content, paper_url, pdf_selectors=None):
+    """解析一次详情页，同时提取PDF链接、论文元数据和参考文献DOI
+    
+    返回 (PDF链接, 元数据, 命中的PDF链接选择器)。
+    """
+    soup = BeautifulSoup(content, 'html.parser')
+    try:
+        metadata = find_paper_metadata(soup, paper_url)
+        metadata['references'] = find_references(soup, (metadata['doi'] or '').lower())
+        pdf_url, selector = find_pdf_link(soup, paper_url, pdf_selectors)
+        return pdf_url, metadata, selector
+    finally:
+        soup.decompose()
+
+
+def extract_toc(content, toc_url):
+    """解析会议论文集/期刊目录页，返回 (目录标题, 论文DOI列表, 需要另外加载的分节页面)"""
+    soup = BeautifulSoup(content, 'html.parser')
+    
+    dois = []
+    for selector in TOC_ITEM_SELECTORS:
+        for link in soup.select(selector):
+            match = DOI_PATTERN.search(unquote(link.get('href', '')))
+            if match:
+                doi = match.group(1).lower()
+                if doi not in dois:
+                    dois.append(doi)
+        if dois:
+            break
+    
+    # 大的论文集只直接显示部分分节，其余分节通过 tocHeading 参数单独加载
+    sections = []
+    for link in soup.select('a[href*="tocHeading="]'):
+        section_url = urljoin(toc_url, link['href'])
+        if section_url not in sections:
+            sections.append(section_url)
+    
+    heading = soup.select_one('h1') or soup.find('title')
+    title = ' '.join(heading.get_text(' ').split()) if heading else None
+    soup.decompose()
+    return title, dois, sections
+
+
+def iter_with_last(items):
+    """逐个产出 (元素, 是否最后一个)，用于长度未知的流式输入"""
+    iterator = iter(items)
+    try:
+        current = next(iterator)
+    except StopIteration:
+        return
+    for following in iterator:
+        yield current, False
+        current = following
+    yield current, True
+
+
+def peak_rss_mb():
+    """本进程的内存峰值(MB)，无法统计时返回None"""
+    if not HAS_RESOURCE:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux上单位是KB，macOS上是字节
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def toc_url_for(spec):
+    """目录参数可以是目录页地址，或会议论文集的DOI"""
+    spec = spec.strip()
+    if spec.startswith(('http://', 'https://')):
+        return spec
+    if spec.lower().startswith('doi:'):
+        spec = spec[4:]
+    return f"https://dl.acm.org/doi/proceedings/{spec}"
+
+
+def extract_pdf_link(content, paper_url):
+    """从论文详情页中提取PDF下载链接，返回 (链接, 命中的选择器)"""
+    soup = BeautifulSoup(content, 'html.parser')
+    try:
+        return find_pdf_link(soup, paper_url)
+    finally:
+        soup.decompose()
+
+
+# 详情页中的访问权限/PDF区域：付费墙的提示文字只在这些区域中查找，
+# 页眉页脚中的"Subscribe"、"Purchase"等通用链接不能作为付费墙的依据
+ACCESS_WIDGET_SELECTORS = [
+    '.get-access',
+    '.access-options',
+    '.info-panel__access',
+    '.article__access',
+    '.accessDenial',
+    '[data-pb-dropzone="accessDenial"]',
+    '.purchaseArea',
+    '.pdf-file',
+    '.issue-item__access',
+]
+
+# 访问权限区域中说明需要付费/订阅的文字（小写）
+PAYWALL_MARKERS = [
+    'get access',
+    'purchase',
+    'buy this',
+    'access through your institution',
+    'check if you have access',
+    'subscribe',
+]
+
+# 只在没有权限时出现的明确提示，在整个页面中查找（小写）
+ENTITLEMENT_MARKERS = [
+    b'you do not have access to this content',
+    b'you do not currently have access',
+    b'access to this content is restricted',
+]
+
+# 搜索结果页中说明没有结果的文字（小写页面上的正则）：结果数必须恰好为0，"120 results"不算
+NO_RESULTS_PATTERNS = [
+    re.compile(rb'(?<![\d,.])\b0\s+results?\b'),
+    # ACM结果页中显示结果数的元素
+    re.compile(rb'class="hitslength"[^>]*>\s*0\s*<'),
+    re.compile(rb'\bno\s+(?:matching\s+)?results\s+(?:were\s+)?found\b'),
+    re.compile(rb'did not match any'),
+    re.compile(rb'your search did not return'),
+]
+
+# 各类失败的重试间隔（秒）：在此之前再次运行时直接跳过，不发送任何请求
+# 同一篇论文重复失败时间隔翻倍，最多为基础间隔的8倍
+NEGATIVE_CACHE_TTL = {
+    'not_in_acm': 30 * 24 * 3600,      # ACM中没有这篇论文
+    'paywalled': 14 * 24 * 3600,       # 需要付费或订阅
+    'selector_miss': 24 * 3600,        # 页面结构可能变了，修复选择器后很快就应重试
+    'download_failed': 24 * 3600,      # 下载到的不是有效的PDF
+    'network': 3600,                   # 403/429/超时等网络问题
+    'error': 3600,                     # 其他异常
+}
+
+# 逐篇处理时状态文件（条件请求、失败记录、排队的PDF、增量同步）最多每隔多少秒写一次，结束时再写一次；
+# 每篇都重写整个文件时，上万篇的批量任务的磁盘写入量和篇数的平方成正比
+STATE_SAVE_INTERVAL = 30
+
+# 本次运行中可以直接复用的失败结果：同一个地址再请求一次结果也不会变（网络错误和熔断不复用）
+SHARED_FAILURES = ('not_in_acm', 'paywalled', 'selector_miss', 'download_failed')
+
+# 汇总队列结果时不算失败的状态：已有文件算成功；失败记录中未到重试时间、PDF排队、熔断中没有处理的算跳过
+QUEUE_SUCCESS_STATUSES = ('downloaded', 'already_downloaded')
+QUEUE_SKIPPED_STATUSES = ('skipped', 'deferred', 'circuit_open')
+
+
+def classify_empty_search(content):
+    """搜索结果页中没有找到结果时，判断是论文不在ACM中还是选择器失效"""
+    lowered = content.lower()
+    if any(pattern.search(lowered) for pattern in NO_RESULTS_PATTERNS):
+        return 'not_in_acm'
+    return 'selector_miss'
+
+
+def classify_missing_pdf(content):
+    """详情页中没有找到PDF链接时，判断是需要付费还是选择器失效
+    
+    只有明确的无权限提示，或访问权限区域中的付费/订阅文字才算付费墙；不确定时按选择器失效处理，
+    这样页面改版不会被当作付费墙跳过14天，选择器命中统计也能及时提示。
+    """
+    if any(marker in content.lower() for marker in ENTITLEMENT_MARKERS):
+        return 'paywalled'
+    soup = BeautifulSoup(content, 'html.parser')
+    try:
+        for selector in ACCESS_WIDGET_SELECTORS:
+            for widget in soup.select(selector):
+                text = ' '.join(widget.get_text(' ').lower().split())
+                if any(marker in text for marker in PAYWALL_MARKERS):
+                    return 'paywalled'
+    finally:
+        soup.decompose()
+    return 'selector_miss'
+
+
+class HTMLResponseCache:
+    """压缩保存搜索页/详情页原始响应的磁盘缓存，用于离线重放提取逻辑"""
+    
+    # 参与缓存键计算的请求头（User-Agent每次随机，不能参与）
+    KEY_HEADERS = ('Accept', 'Accept-Language')
+    
+    def __init__(self, cache_dir, compression=None):
+        self.cache_dir = cache_dir
+        self.compression = compression or ('zstd' if HAS_ZSTD else 'gzip')
+        if self.compression == 'zstd' and not HAS_ZSTD:
+            print("提示: 未安装 zstandard，页面缓存改用gzip压缩: pip install zstandard")
+            self.compression = 'gzip'
+        self.index_file = os.path.join(cache_dir, "index.jsonl")
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    def make_key(self, url, headers=None):
+        """根据URL和关键请求头计算缓存键"""
+        parts = [url]
+        if headers:
+            for name in self.KEY_HEADERS:
+                parts.append(f"{name}={headers.get(name, '')}")
+        return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+    
+    def path_for(self, key, compression):
+        suffix = '.html.zst' if compression == 'zstd' else '.html.gz'
+        # 按前两位分目录，避免单个目录下文件过多
+        return os.path.join(self.cache_dir, key[:2], key + suffix)
+    
+    def put(self, url, headers, content, kind, **meta):
+        """压缩保存一个页面，并在索引中追加一条记录"""
+        key = self.make_key(url, headers)
+        path = self.path_for(key, self.compression)
+        if self.compression == 'zstd':
+            data = zstandard.ZstdCompressor(level=10).compress(content)
+        else:
+            data = gzip.compress(content, compresslevel=6)
+        
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        
+        record = {'key': key, 'url': url, 'kind': kind, 'file': os.path.relpath(path, self.cache_dir),
+                  'size': len(content), 'time': time.strftime('%Y-%m-%d %H:%M:%S')}
+        record.update(meta)
+        with self.lock:
+            with open(self.index_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    
+    def read_file(self, relative_path):
+        """读取并解压一个缓存文件"""
+        path = os.path.join(self.cache_dir, relative_path)
+        with open(path, 'rb') as f:
+            data = f.read()
+        if path.endswith('.zst'):
+            if not HAS_ZSTD:
+                raise RuntimeError("该缓存文件使用zstd压缩，请先安装 zstandard")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+    
+    def entries(self, kind=None):
+        """遍历索引中的缓存记录，同一页面只保留最新的一条"""
+        latest = {}
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    record = json.loads(line)
+                    latest[record['key']] = record
+        except FileNotFoundError:
+            return []
+        return [r for r in latest.values() if kind is None or r['kind'] == kind]
+
+
+class DNSCache:
+    """进程内DNS缓存：同一主机在TTL内只解析一次，新建连接时省去DNS查询"""
+    
+    def __init__(self, ttl, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.users = 0
+        self.original_getaddrinfo = None
+    
+    def install(self):
+        """替换socket.getaddrinfo（urllib3建立连接时使用）"""
+        with self.lock:
+            if self.original_getaddrinfo is None:
+                self.original_getaddrinfo = socket.getaddrinfo
+                socket.getaddrinfo = self.getaddrinfo
+    
+    def uninstall(self):
+        """恢复原来的socket.getaddrinfo（其他代码之后又替换过时不动它）并清空缓存"""
+        with self.lock:
+            if self.original_getaddrinfo is not None:
+                if socket.getaddrinfo == self.getaddrinfo:
+                    socket.getaddrinfo = self.original_getaddrinfo
+                self.original_getaddrinfo = None
+            self.entries.clear()
+    
+    def evict(self, now):
+        """移除过期的条目；仍然超过上限时移除最早过期的（调用方持有锁）"""
+        for key in [key for key, entry in self.entries.items() if entry[0] <= now]:
+            del self.entries[key]
+        if len(self.entries) > self.max_entries:
+            for key in sorted(self.entries, key=lambda k: self.entries[k][0])[:len(self.entries) - self.max_entries]:
+                del self.entries[key]
+    
+    def getaddrinfo(self, host, port, *args, **kwargs):
+        key = (host, port, args, tuple(sorted(kwargs.items())))
+        now = time.time()
+        with self.lock:
+            # 在锁内取出原函数，避免其他线程同时uninstall()把它置为None
+            original = self.original_getaddrinfo
+            entry = self.entries.get(key)
+            if entry and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+        
+        if original is None:
+            # 已经卸载：之前取到替换函数的调用直接交给当前的socket.getaddrinfo，不再缓存
+            return socket.getaddrinfo(host, port, *args, **kwargs)
+        
+        result = original(host, port, *args, **kwargs)
+        with self.lock:
+            if self.original_getaddrinfo is None:
+                return result
+            self.entries[key] = (now + self.ttl, result)
+            self.misses += 1
+            if len(self.entries) > self.max_entries:
+                self.evict(now)
+        return result
+
+
+# 整个进程共用一个DNS缓存，最后一个使用者关闭时恢复socket.getaddrinfo
+_dns_cache = None
+_dns_cache_lock = threading.Lock()
+
+
+def install_dns_cache(ttl):
+    """启用进程内DNS缓存，重复调用时只更新TTL"""
+    global _dns_cache
+    with _dns_cache_lock:
+        if _dns_cache is None:
+            _dns_cache = DNSCache(ttl)
+        _dns_cache.install()
+        _dns_cache.ttl = ttl
+        _dns_cache.users += 1
+        return _dns_cache
+
+
+def release_dns_cache(cache):
+    """一个下载器不再使用DNS缓存，没有使用者时卸载"""
+    with _dns_cache_lock:
+        cache.users -= 1
+        if cache.users <= 0:
+            cache.users = 0
+            cache.uninstall()
+
+
+def replay_html_cache(cache_dir, output_file=None):
+    """离线重放：对缓存中的所有页面重新运行提取逻辑，不发送任何网络请求"""
+    cache = HTMLResponseCache(cache_dir)
+    entries = cache.entries()
+    if not entries:
+        print(f"页面缓存为空: {cache_dir}")
+        return []
+    
+    print(f"开始离线重放 {len(entries)} 个缓存页面...")
+    start_time = time.time()
+    results = []
+    hits = 0
+    selector_hits = {}
+    
+    for record in entries:
+        try:
+            content = cache.read_file(record['file'])
+        except Exception as e:
+            print(f"读取缓存页面失败 {record['url']}: {e}")
+            continue
+        
+        dois = None
+        if record['kind'] == 'search':
+            link, selector = extract_search_result(content)
+        elif record['kind'] == 'detail':
+            link, selector = extract_pdf_link(content, record['url'])
+        elif record['kind'] == 'toc':
+            # 目录页没有单个链接，提取到论文DOI即算成功
+            _, dois, _ = extract_toc(content, record['url'])
+            link, selector = (dois[0] if dois else None), 'toc'
+        else:
+            # 不认识的页面类型（更新版本写入的缓存）跳过，不算作未命中
+            continue
+        
+        if link:
+            hits += 1
+            key = (record['kind'], selector)
+            selector_hits[key] = selector_hits.get(key, 0) + 1
+        else:
+            print(f"未提取到链接 [{record['kind']}] {record.get('title') or record['url']}")
+        
+        results.append({
+            'kind': record['kind'],
+            'url': record['url'],
+            'title': record.get('title'),
+            'link': link,
+            'selector': selector,
+            **({'dois': dois} if dois is not None else {})
+        })
+    
+    elapsed = time.time() - start_time
+    print(f"\n离线重放完成: {len(results)} 个页面, 提取成功 {hits} 个, 用时 {elapsed:.1f} 秒")
+    for (kind, selector), count in sorted(selector_hits.items(), key=lambda x: -x[1]):
+        print(f"  [{kind}] {selector}: {count}")
+    
+    if output_file:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=1)
+        print(f"重放结果已保存到: {output_file}")
+    
+    return results
+
 
 class ACMPaperDownloaderUltimate:
-    def __init__(self, excel_file_path):
+    def __init__(self, excel_file_path, cache_html=False, workers=1, parse_workers=0,
+                 pool_connections=10, pool_maxsize=None, dns_cache_ttl=0, retry_failed=False,
+                 library_index=None, refresh=False, extract_text=False, expand_depth=0,
+                 expand_budget=200, toc=None, low_memory=False, max_inflight_pages=None,
+                 max_inflight_downloads=None, status_file=None, dashboard_interval=60, trace=False,
+                 plan_file=None, mirrors=None, mirror_race=False, mirror_urls=None, mirror_rates=None,
+                 unpaywall_email=None, breaker_threshold=3, breaker_cooldown=300, settings=None,
+                 bandwidth_limit=None, connection_bandwidth_limit=None, transfer_window=None,
+                 sync=False, sync_prune=False):
         self.excel_file_path = excel_file_path
+        # 超时、重试次数、等待时间范围和额外选择器（配置文件/配置档案，见 acm_config.py）
+        self.settings = settings or load_settings()
+        use_extra_selectors(self.settings['selectors'])
         self.output_dir = "downloaded_papers"
         self.base_url = "https://dl.acm.org/search/search-results?q="
         self.session = None
         self.ua = UserAgent() if HAS_FAKE_UA else None
         self.use_cloudscraper = HAS_CLOUDSCRAPER
+        # 本地缓存目录：保存ETag/Last-Modified等状态，供后续运行做条件请求
+        self.cache_dir = ".acm_cache"
+        self.validators_file = os.path.join(self.cache_dir, "validators.json")
+        self.validators = self.load_json_state(self.validators_file, {})
+        # 旧版本在这里保存过参考文献列表（现在保存在索引库中），读入时去掉，下次写入时文件随之变小
+        for entry in self.validators.values():
+            (entry.get('metadata') or {}).pop('references', None)
+        # 有改动、尚未写回磁盘的状态文件，以及上次写入的时间
+        self.dirty_states = set()
+        self.state_saved_at = time.monotonic()
+        # 失败记录：之前失败过的论文在调度时排到最后
+        self.failures_file = os.path.join(self.cache_dir, "failures.json")
+        self.failures = self.load_json_state(self.failures_file, {})
+        # 重新下载队列：verify命令发现的损坏文件，下次运行时优先处理
+        self.repair_queue_file = os.path.join(self.cache_dir, "repair_queue.json")
+        self.repair_queue = load_repair_queue(self.repair_queue_file)
+        # 已下载论文的索引库，多个项目可以共用同一个索引文件跨项目去重
+        self.library_index = LibraryIndex(library_index or os.path.join(self.cache_dir, "library.db"))
+        # 忽略索引，重新检查（条件请求）所有已下载的论文
+        self.refresh = refresh
+        # 下载完成后增量提取新PDF的全文并写入本地全文索引
+        self.extract_text = extract_text
+        self.fulltext_index = os.path.join(self.cache_dir, "fulltext.db")
+        # 引用扩展：沿参考文献广度优先下载的层数，以及扩展阶段最多发送的请求数
+        self.expand_depth = expand_depth
+        self.expand_budget = expand_budget
+        # 低内存模式：流式读取输入文件，不把整个表格和标题列表载入内存
+        self.low_memory = low_memory
+        # 进度统计：定期写入JSON状态文件，并在终端显示进度面板
+        self.progress = ProgressTracker(status_file or os.path.join(self.cache_dir, "status.json"),
+                                        interval=dashboard_interval)
+        # 耗时追踪：记录每个请求、重试、等待和解析的调用树（--trace/--profile）
+        self.tracer = SpanTracer().activate() if trace else None
+        # 执行计划（plan命令生成）：给出时只处理计划中需要联网的论文，不再重复离线检查
+        self.plan_file = plan_file
+        self.plan_checked = False
+        # 计划中有DOI的论文（输入表格的DOI列）：{标题: DOI}，直接访问详情页
+        self.title_dois = {}
+        # 按接口的熔断器：被封IP时不再对剩余论文逐一重试，暂停到冷却结束后用一个请求探测
+        self.breakers = CircuitBreakers(breaker_threshold, breaker_cooldown) if breaker_threshold > 0 else None
+        # 选择器命中统计：最常命中的选择器先试，命中情况明显变化时提示网站可能改版
+        self.selector_health = SelectorHealth(os.path.join(self.cache_dir, "selector_health.json"))
+        # PDF下载的带宽限制（每秒字节数，全局/每个连接）和传输时间窗口
+        self.bandwidth = None
+        if bandwidth_limit or connection_bandwidth_limit:
+            self.bandwidth = BandwidthLimiter(bandwidth_limit, connection_bandwidth_limit)
+        self.transfer_window = TransferWindow(transfer_window) if transfer_window else None
+        # 批量处理时，窗口之外的PDF下载先排队（保存到文件，中断后下次运行继续），窗口打开后再下载
+        self.defer_transfers = False
+        self.deferred_file = os.path.join(self.cache_dir, "deferred_downloads.json")
+        self.deferred_downloads = self.load_json_state(self.deferred_file, {})
+        self.deferred_titles = 0
+        # 开放获取镜像源：ACM上拿不到PDF时按DOI/标题到arXiv、Unpaywall等来源查找（--mirrors）
+        self.mirror_fetcher = None
+        if mirrors:
+            sources = build_mirror_sources(mirrors, urls=mirror_urls, rates=mirror_rates,
+                                           unpaywall_email=unpaywall_email)
+            if sources:
+                self.mirror_fetcher = MirrorFetcher(sources, self.mirror_get, race=mirror_race, bandwidth=self.bandwidth)
+        # 增量同步：只处理表格中新增、修改过或上次没有成功的行；sync_prune时删除已从表格中删除的行的PDF
+        self.sync = sync
+        self.sync_prune = sync_prune
+        self.sync_state = None
+        # 合并相同的请求：同一地址的搜索、详情页和PDF同时只请求一次，本次运行中已有确定结果时直接复用
+        self.single_flight = SingleFlight()
+        # 会议论文集/期刊目录：给出时从目录中读取论文DOI，代替Excel中的标题
+        self.toc = toc
+        # 本次运行中各论文详情页的参考文献，扩展时不需要再次请求详情页
+        self.paper_references = {}
+        # 忽略失败记录中的重试间隔，强制重新尝试所有论文
+        self.retry_failed = retry_failed
+        # 每个线程记录自己最近一次失败的原因
+        self.local = threading.local()
+        # 可选的原始页面缓存，保存搜索页和详情页供离线重放
+        self.html_cache = HTMLResponseCache(os.path.join(self.cache_dir, "html")) if cache_html else None
+        # 并发处理论文的线程数（网络I/O），以及解析HTML的进程数（CPU）
+        self.workers = max(1, workers)
+        self.parse_workers = max(0, parse_workers)
+        self.parse_pool = None
+        self.parse_slots = None
+        # 同时在内存中的页面（从请求到解析完成）和同时进行的下载数量上限，默认不超过线程数
+        self.page_slots = threading.BoundedSemaphore(max_inflight_pages or self.workers)
+        self.download_slots = threading.BoundedSemaphore(max_inflight_downloads or self.workers)
+        self.state_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.successful_downloads = 0
+        self.failed_downloads = 0
+        self.skipped_titles = 0
+        self.indexed_titles = 0
+        # 经过http_get发给ACM的请求数（不含镜像源请求和连接池内部的重试），引用扩展的预算按它计算
+        self.acm_requests = 0
+        # 正在处理的论文数和已开始处理的论文数，用于判断单篇论文的连接统计是否混入了其他论文
+        self.active_titles = 0
+        self.titles_started = 0
+        # 连接池设置：pool_connections为缓存的主机连接池数量，pool_maxsize为每个主机保留的长连接数
+        # 连接数少于并发线程数时多余的连接会被丢弃，下次请求又要重新握手
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize or max(10, self.workers * 2)
+        self.headers_session = None
+        self.dns_cache = install_dns_cache(dns_cache_ttl) if dns_cache_ttl > 0 else None
         self.setup_session()
         
     def get_random_user_agent(self):
@@ -80,17 +782,23 @@ class ACMPaperDownloaderUltimate:
                     'desktop': True
                 }
             )
+            # cloudscraper自带的适配器使用默认的连接池大小，按配置重新挂载
+            self.configure_connection_pool()
         else:
             print("使用标准requests会话...")
             self.session = requests.Session()
             
-            # 设置重试策略
-            retry_strategy = Retry(
-                total=3,
-                backoff_factor=3,
+            # 设置重试策略（追踪时记录每次重试和退避等待）
+            retry_strategy = (TracedRetry if self.tracer else Retry)(
+                total=self.settings['retries']['http_total'],
+                backoff_factor=self.settings['retries']['http_backoff'],
                 status_forcelist=[403, 429, 500, 502, 503, 504],
             )
-            adapter = HTTPAdapter(max_retries=retry_strategy)
+            adapter = HTTPAdapter(
+                pool_connections=self.pool_connections,
+                pool_maxsize=self.pool_maxsize,
+                max_retries=retry_strategy
+            )
             self.session.mount("http://", adapter)
             self.session.mount("https://", adapter)
         
@@ -99,8 +807,133 @@ class ACMPaperDownloaderUltimate:
         
         print("终极版网络会话初始化成功")
     
+    def configure_connection_pool(self):
+        """按配置的连接池大小重新挂载会话中的适配器
+        
+        cloudscraper的适配器带有特殊的TLS设置，新适配器沿用原来的SSL上下文和密码套件。
+        """
+        for prefix, adapter in list(self.session.adapters.items()):
+            pool = {'pool_connections': self.pool_connections, 'pool_maxsize': self.pool_maxsize,
+                    'max_retries': adapter.max_retries}
+            if HAS_CLOUDSCRAPER and isinstance(adapter, cloudscraper.CipherSuiteAdapter):
+                pooled = cloudscraper.CipherSuiteAdapter(
+                    cipherSuite=adapter.cipherSuite,
+                    ecdhCurve=adapter.ecdhCurve,
+                    server_hostname=adapter.server_hostname,
+                    source_address=adapter.source_address,
+                    ssl_context=adapter.ssl_context,
+                    **pool
+                )
+            elif type(adapter) is HTTPAdapter:
+                pooled = HTTPAdapter(**pool)
+            else:
+                continue
+            adapter.close()
+            self.session.mount(prefix, pooled)
+    
+    def close(self):
+        """关闭会话的连接池，卸载DNS缓存（没有其他下载器使用时）"""
+        if self.dns_cache:
+            release_dns_cache(self.dns_cache)
+            self.dns_cache = None
+        if self.session is not None:
+            self.session.close()
+    
+    def connection_counters(self):
+        """统计连接池中的请求数、新建连接数和TLS握手数（新建的HTTPS连接）"""
+        counters = {'requests': 0, 'connections': 0, 'tls_handshakes': 0}
+        seen = set()
+        for adapter in self.session.adapters.values():
+            poolmanager = getattr(adapter, 'poolmanager', None)
+            if poolmanager is None or id(poolmanager) in seen:
+                continue
+            seen.add(id(poolmanager))
+            for key in list(poolmanager.pools.keys()):
+                pool = poolmanager.pools.get(key)
+                if pool is None:
+                    continue
+                counters['requests'] += pool.num_requests
+                counters['connections'] += pool.num_connections
+                if pool.scheme == 'https':
+                    counters['tls_handshakes'] += pool.num_connections
+        return counters
+    
+    def print_connection_stats(self, titles_processed):
+        """打印连接复用统计"""
+        counters = self.connection_counters()
+        if not counters['requests']:
+            return
+        reuse_rate = 1 - counters['connections'] / counters['requests']
+        print(f"连接复用统计: 请求 {counters['requests']} 次, 新建连接 {counters['connections']} 次, "
+              f"TLS握手 {counters['tls_handshakes']} 次, 连接复用率 {reuse_rate*100:.1f}%")
+        if titles_processed:
+            print(f"平均每篇论文TLS握手: {counters['tls_handshakes']/titles_processed:.2f} 次")
+        if self.dns_cache:
+            print(f"DNS缓存: 命中 {self.dns_cache.hits} 次, 解析 {self.dns_cache.misses} 次")
+        shared = self.single_flight.stats
+        if shared['coalesced'] or shared['memo_hits']:
+            print(f"合并相同请求: 共享进行中的请求 {shared['coalesced']} 次, 复用已有结果 {shared['memo_hits']} 次")
+        if self.breakers:
+            tripped = {name: b for name, b in self.breakers.summary().items() if b['trips']}
+            if tripped:
+                print("熔断: " + ", ".join(f"{name} {b['trips']} 次（当前 {b['state']}）" for name, b in tripped.items()))
+    
+    def span(self, name, **args):
+        """追踪时记录一个耗时区间，未启用追踪时不做任何事"""
+        if self.tracer is None:
+            return nullcontext({})
+        return self.tracer.span(name, **args)
+    
+    def wait_seconds(self, name):
+        """按配置中的范围随机取一个等待时间（秒）"""
+        low, high = self.settings['waits'][name]
+        if isinstance(low, int) and isinstance(high, int):
+            return random.randint(low, high)
+        return round(random.uniform(low, high), 1)
+    
+    def pause(self, seconds, reason):
+        """主动等待（网络礼仪、重试间隔等），追踪时记录等待原因"""
+        with self.span('sleep', reason=reason, seconds=seconds):
+            time.sleep(seconds)
+    
+    def http_get(self, url, **kwargs):
+        """发送GET请求，所有网络请求都经过这里，便于子类统一处理"""
+        breaker = self.breakers.before_request(url) if self.breakers else None
+        self.progress.record_request()
+        with self.stats_lock:
+            self.acm_requests += 1
+        with self.span('http GET', url=url) as span_args:
+            try:
+                response = self.session.get(url, **kwargs)
+            except Exception as e:
+                if breaker:
+                    self.breakers.after_response(breaker, error=e)
+                raise
+            span_args['status'] = response.status_code
+        if breaker:
+            self.breakers.after_response(breaker, response.status_code)
+        headers = kwargs.get('headers') or {}
+        if 'If-None-Match' in headers or 'If-Modified-Since' in headers:
+            self.progress.record_cache('http_304', response.status_code == 304)
+        return response
+    
+    def mirror_get(self, url, **kwargs):
+        """镜像源的请求：不经过http_get，子类对ACM会话的处理（如重新登录）不应被其他网站的响应触发"""
+        self.progress.record_request()
+        with self.span('http GET', url=url) as span_args:
+            response = self.session.get(url, **kwargs)
+            span_args['status'] = response.status_code
+        return response
+    
     def update_headers(self):
-        """更新请求头，使用随机User-Agent和更真实的浏览器特征"""
+        """更新请求头，使用随机User-Agent和更真实的浏览器特征
+        
+        完整的浏览器请求头每个会话只设置一次，之后只更换User-Agent。
+        """
+        if self.headers_session is self.session:
+            self.session.headers['User-Agent'] = self.get_random_user_agent()
+            return
+        
         headers = {
             'User-Agent': self.get_random_user_agent(),
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
@@ -120,6 +953,103 @@ class ACMPaperDownloaderUltimate:
         }
         
         self.session.headers.update(headers)
+        self.headers_session = self.session
+    
+    def load_json_state(self, path, default):
+        """读取JSON状态文件，不存在或损坏时返回默认值"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return default
+        except Exception as e:
+            print(f"读取状态文件 {path} 失败，将重新创建: {e}")
+            return default
+    
+    def save_json_state(self, path, data):
+        """原子写入JSON状态文件，避免中途中断导致文件损坏"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+    
+    def conditional_headers(self, url):
+        """根据上次保存的ETag/Last-Modified构造条件请求头"""
+        entry = self.validators.get(url)
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+    
+    def remember_validators(self, url, response, **extra):
+        """保存响应中的ETag/Last-Modified，以及从该响应得到的结果"""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            # 服务器不支持条件请求，没有必要保存
+            with self.state_lock:
+                self.validators.pop(url, None)
+            return
+        
+        entry = {'etag': etag, 'last_modified': last_modified}
+        entry.update(extra)
+        with self.state_lock:
+            self.validators[url] = entry
+            self.dirty_states.add(self.validators_file)
+    
+    def save_state(self, force=False):
+        """把有改动的状态文件写回磁盘
+        
+        逐篇处理时调用，距上次写入不到 STATE_SAVE_INTERVAL 秒时跳过；运行结束时用force=True写入所有改动。
+        """
+        with self.state_lock:
+            now = time.monotonic()
+            if self.dirty_states and (force or now - self.state_saved_at >= STATE_SAVE_INTERVAL):
+                states = {self.validators_file: self.validators, self.failures_file: self.failures,
+                          self.deferred_file: self.deferred_downloads}
+                for path in sorted(self.dirty_states):
+                    try:
+                        self.save_json_state(path, states[path])
+                    except Exception as e:
+                        print(f"保存状态文件 {path} 失败: {e}")
+                self.dirty_states.clear()
+                self.state_saved_at = now
+        if self.sync_state:
+            self.sync_state.save(force=force)
+    
+    def start_parse_pool(self):
+        """启动解析进程池，HTML解析是CPU密集型工作，放到独立进程中避免阻塞网络线程"""
+        if self.parse_workers > 0 and self.parse_pool is None:
+            self.parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers, initializer=use_extra_selectors,
+                                                  initargs=(self.settings['selectors'],))
+            # 有界队列：同时等待解析的页面数有上限，网络线程在队列满时暂停，避免页面堆积占用内存
+            self.parse_slots = threading.BoundedSemaphore(self.parse_workers * 2)
+            print(f"解析进程池已启动: {self.parse_workers} 个进程")
+    
+    def stop_parse_pool(self):
+        """关闭解析进程池"""
+        if self.parse_pool:
+            self.parse_pool.shutdown()
+            self.parse_pool = None
+    
+    def parse(self, func, *args):
+        """执行提取函数：有解析进程池时交给进程池，否则在当前线程执行"""
+        with self.span('parse', func=func.__name__, in_pool=self.parse_pool is not None):
+            if self.parse_pool is None:
+                return func(*args)
+            with self.parse_slots:
+                return self.parse_pool.submit(func, *args).result()
+    
+    def cache_page(self, url, response, kind, **meta):
+        """把原始响应写入页面缓存，缓存失败不影响下载流程"""
+        try:
+            self.html_cache.put(url, response.request.headers, response.content, kind, **meta)
+        except Exception as e:
+            print(f"写入页面缓存失败: {e}")
     
     def create_output_directory(self):
         """创建输出目录"""
@@ -129,21 +1059,304 @@ class ACMPaperDownloaderUltimate:
         else:
             print(f"输出目录已存在: {self.output_dir}")
     
-    def read_excel_file(self):
+    def read_excel_file(self, excel_file_path=None):
         """读取Excel文件中的论文标题"""
         try:
-            df = pd.read_excel(self.excel_file_path)
+            df = pd.read_excel(excel_file_path or self.excel_file_path)
             if 'Title' not in df.columns:
                 print("错误: Excel文件中未找到'Title'列")
                 return []
             
-            titles = df['Title'].dropna().tolist()
+            titles = self.schedule_titles(df)
             print(f"成功读取 {len(titles)} 个论文标题")
             return titles
         except Exception as e:
             print(f"读取Excel文件失败: {e}")
             return []
     
+    def iter_input_titles(self, path=None):
+        """流式读取论文标题（.xlsx/.csv/.txt），一次只在内存中保留一行
+        
+        不会按优先级/截止日期重新排序（需要先读完整个表格）；已知失败的论文由失败记录跳过。
+        """
+        path = path or self.excel_file_path
+        if path.endswith('.txt'):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        yield line.strip()
+            return
+        
+        if path.endswith('.csv'):
+            with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+                reader = csv.DictReader(f)
+                if 'Title' not in (reader.fieldnames or []):
+                    print("错误: CSV文件中未找到'Title'列")
+                    return
+                for row in reader:
+                    if (row['Title'] or '').strip():
+                        yield row['Title'].strip()
+            return
+        
+        from openpyxl import load_workbook
+        workbook = load_workbook(path, read_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = next(rows, None) or ()
+            if 'Title' not in header:
+                print("错误: Excel文件中未找到'Title'列")
+                return
+            column = header.index('Title')
+            for row in rows:
+                if column < len(row) and row[column] is not None and str(row[column]).strip():
+                    yield str(row[column]).strip()
+        finally:
+            workbook.close()
+    
+    def read_sync_titles(self):
+        """增量同步：只返回新增、修改过或上次没有成功的行（同样按截止日期/优先级排序）"""
+        try:
+            df = read_input_table(self.excel_file_path)
+        except Exception as e:
+            print(f"读取输入文件失败: {e}")
+            return []
+        if 'Title' not in df.columns:
+            print("错误: 输入文件中未找到'Title'列")
+            return []
+        
+        self.sync_state = SyncState(sync_state_path(self.cache_dir, self.excel_file_path))
+        changed, removed, counts = self.sync_state.diff(df)
+        print_sync_summary(counts, removed, prune=self.sync_prune)
+        if removed and self.sync_prune:
+            self.prune_removed(removed)
+        if changed.empty:
+            print("表格没有需要处理的改动")
+            return []
+        return self.schedule_titles(changed)
+    
+    def prune_removed(self, entries):
+        """删除已从表格中删除的行对应的PDF文件（当前下载目录中的）和索引记录
+        
+        表格中其他行仍然用到的文件（重复的标题，或索引中登记到同一文件的其他标题）保留不动。
+        """
+        current = self.sync_state.current_titles
+        referenced = {self.sanitize_filename(title) for title in current}
+        current_keys = {normalize_title(title) for title in current}
+        removed_files = 0
+        kept_files = 0
+        for entry in entries:
+            filename = self.sanitize_filename(entry['title'])
+            path = os.path.abspath(os.path.join(self.output_dir, filename))
+            if filename in referenced or any(normalize_title(title) in current_keys
+                                             for title in self.library_index.titles_for_file(path)):
+                kept_files += 1
+                continue
+            if os.path.exists(path):
+                os.remove(path)
+                removed_files += 1
+            self.library_index.remove_file(path)
+        self.sync_state.forget(entries)
+        print(f"已清理 {len(entries)} 行，删除PDF文件 {removed_files} 个"
+              + (f"，{kept_files} 个文件仍被表格中的其他行使用，保留" if kept_files else ""))
+    
+    def read_plan(self, plan_file=None):
+        """读取执行计划，返回需要联网处理的论文（顺序与计划相同）"""
+        plan = load_plan(plan_file or self.plan_file)
+        titles = []
+        registered = 0
+        for item in plan['items']:
+            if item['action'] in ('search', 'doi'):
+                titles.append(item['title'])
+                if item['action'] == 'doi' and item['detail'] and not item['title'].startswith('doi:'):
+                    self.title_dois[item['title']] = item['detail']
+            elif item['action'] == 'on_disk' and os.path.exists(item['detail']):
+                # 索引建立之前下载的文件，登记后下次运行也能直接跳过
+                self.index_download(item['title'], item['detail'], {})
+                registered += 1
+        if registered:
+            print(f"已把下载目录中的 {registered} 个已有文件登记到索引")
+        print(f"计划中需要联网处理的论文: {len(titles)} 篇")
+        # 已下载索引和失败记录在生成计划时已经检查过
+        self.plan_checked = True
+        return titles
+    
+    def read_toc(self, toc=None):
+        """获取会议论文集/期刊目录页（一次请求，加上未直接显示的分节），返回 doi:前缀的论文列表
+        
+        这些论文直接走DOI到PDF的路径，不需要逐篇搜索。
+        """
+        toc_url = toc_url_for(toc or self.toc)
+        pending = [toc_url]
+        visited = set()
+        dois = []
+        toc_title = None
+        
+        while pending:
+            url = pending.pop(0)
+            if url in visited:
+                continue
+            if visited:
+                # 分节页面之间和详情页一样留出间隔，不连续请求
+                self.pause(self.wait_seconds('detail_page_load'), 'detail_page_load')
+            visited.add(url)
+            try:
+                response = self.http_get(url, headers={'Referer': 'https://dl.acm.org/'},
+                                         timeout=self.settings['timeouts']['toc'])
+                response.raise_for_status()
+            except Exception as e:
+                print(f"获取目录页失败 {url}: {e}")
+                continue
+            
+            if self.html_cache:
+                self.cache_page(url, response, 'toc')
+            
+            title, page_dois, sections = self.parse(extract_toc, response.content, url)
+            toc_title = toc_title or title
+            dois.extend(doi for doi in page_dois if doi not in dois)
+            pending.extend(section for section in sections if section not in visited)
+        
+        print(f"目录: {toc_title or toc_url}")
+        print(f"从 {len(visited)} 个目录页中读取到 {len(dois)} 篇论文")
+        return [f"doi:{doi}" for doi in dois]
+    
+    def schedule_titles(self, df):
+        """按截止日期、优先级和失败记录安排处理顺序
+        
+        排序规则：之前失败过的论文排在最后；其余按截止日期从早到晚，
+        没有截止日期的排在有截止日期的之后；截止日期相同时按Priority从高到低；
+        都相同时保持表格中的原始顺序。没有Priority/Deadline列时只按失败记录调整。
+        """
+        df = df.dropna(subset=['Title']).reset_index(drop=True)
+        
+        if 'Priority' in df.columns:
+            priority = pd.to_numeric(df['Priority'], errors='coerce').fillna(0)
+        else:
+            priority = pd.Series(0, index=df.index)
+        
+        if 'Deadline' in df.columns:
+            deadline = pd.to_datetime(df['Deadline'], errors='coerce')
+        else:
+            deadline = pd.Series(pd.NaT, index=df.index)
+        
+        failed = df['Title'].map(lambda t: t in self.failures)
+        
+        order = pd.DataFrame({
+            'failed': failed,
+            'no_deadline': deadline.isna(),
+            'deadline': deadline,
+            'priority': -priority,
+            'row': df.index
+        }).sort_values(['failed', 'no_deadline', 'deadline', 'priority', 'row'])
+        
+        if 'Priority' in df.columns or 'Deadline' in df.columns:
+            print("已按截止日期(Deadline)和优先级(Priority)安排处理顺序")
+        if failed.any():
+            print(f"{int(failed.sum())} 篇之前失败过的论文排到最后处理")
+        
+        return df['Title'].loc[order.index].tolist()
+    
+    def indexed_repairs(self):
+        """重新下载队列中索引里有原始标题的论文，有DOI的登记后直接访问详情页"""
+        repairs = []
+        for title, entry in self.repair_queue.items():
+            if entry.get('indexed'):
+                repairs.append(title)
+                if entry.get('doi'):
+                    self.title_dois.setdefault(title, entry['doi'])
+        return repairs
+    
+    def prepend_repair_queue(self, titles):
+        """把重新下载队列中的论文排到最前面
+        
+        不在索引中的文件只有净化后的文件名，只在输入中有对应的标题时才处理，不拿文件名去搜索。
+        """
+        if not self.repair_queue:
+            return titles
+        
+        if not isinstance(titles, list):
+            return self.iter_with_repairs(titles)
+        
+        repairs = self.indexed_repairs()
+        by_stem = {self.sanitize_filename(t)[:-4]: t for t in titles}
+        for key, entry in self.repair_queue.items():
+            if not entry.get('indexed') and key in by_stem:
+                repairs.append(by_stem[key])
+        repairs = list(dict.fromkeys(repairs))
+        print(f"重新下载队列中有 {len(repairs)} 篇损坏的论文，优先处理")
+        unmatched = len(self.repair_queue) - len(repairs)
+        if unmatched > 0:
+            print(f"另有 {unmatched} 个损坏的文件不在索引中，输入中也没有对应的标题，未处理")
+        repair_set = set(repairs)
+        return repairs + [t for t in titles if t not in repair_set]
+    
+    def iter_with_repairs(self, titles):
+        """流式输入时的重新下载队列：先产出索引中有标题的论文，之后跳过输入中的同一篇
+        
+        不在索引中的文件等流式读到对应的标题时按正常顺序处理。
+        """
+        repairs = self.indexed_repairs()
+        print(f"重新下载队列中有 {len(repairs)} 篇损坏的论文，优先处理")
+        yield from repairs
+        repair_set = set(repairs)
+        for title in titles:
+            if title not in repair_set:
+                yield title
+    
+    def record_result(self, title, status):
+        """记录论文处理结果：失败的记入失败记录，成功的从失败记录中移除"""
+        if status == 'already_downloaded':
+            status = 'downloaded'
+        if status == 'downloaded' and self.repair_queue:
+            with self.state_lock:
+                # 索引中有标题的条目以标题为键，其他的以文件名为键
+                removed = [self.repair_queue.pop(key, None) for key in (title, self.sanitize_filename(title)[:-4])]
+                if any(entry is not None for entry in removed):
+                    try:
+                        save_repair_queue(self.repair_queue_file, self.repair_queue)
+                    except Exception as e:
+                        print(f"保存重新下载队列出错: {e}")
+        
+        with self.state_lock:
+            if status == 'downloaded':
+                if self.failures.pop(title, None) is None:
+                    return
+            elif status in ('skipped', 'deferred'):
+                # 跳过时没有发送请求、排队时还没有结果，失败记录保持不变
+                return
+            else:
+                entry = self.failures.get(title, {'count': 0})
+                entry['status'] = status
+                entry['count'] = entry.get('count', 0) + 1
+                entry['last_attempt'] = time.strftime('%Y-%m-%d %H:%M:%S')
+                ttl = NEGATIVE_CACHE_TTL.get(status, NEGATIVE_CACHE_TTL['error'])
+                ttl *= min(2 ** (entry['count'] - 1), 8)
+                entry['retry_after'] = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(time.time() + ttl))
+                self.failures[title] = entry
+            self.dirty_states.add(self.failures_file)
+    
+    def note_failure(self, reason):
+        """记录当前线程最近一次失败的原因"""
+        self.local.failure = reason
+    
+    def take_failure(self, default):
+        """取出并清除当前线程最近一次失败的原因"""
+        reason = getattr(self.local, 'failure', None) or default
+        self.local.failure = None
+        return reason
+    
+    def negative_cache_hit(self, title):
+        """失败记录中的重试时间未到时返回该记录，否则返回None"""
+        if self.retry_failed:
+            return None
+        entry = self.failures.get(title)
+        if not entry or not entry.get('retry_after'):
+            return None
+        try:
+            retry_after = time.mktime(time.strptime(entry['retry_after'], '%Y-%m-%d %H:%M:%S'))
+        except ValueError:
+            return None
+        return entry if retry_after > time.time() else None
+    
     def sanitize_filename(self, title):
         """净化文件名，移除非法字符"""
         # 移除或替换非法字符
@@ -169,39 +1382,70 @@ class ACMPaperDownloaderUltimate:
             lambda t: f"https://dl.acm.org/action/doSearch?Title={quote(t)}&expand=all"
         ]
         
-        for i, method in enumerate(search_methods, 1):
+        # 方法1-3使用搜索页，方法4-5使用doSearch API，某个接口熔断时只用另一个
+        endpoints = ['search'] * 3 + ['doSearch'] * 2
+        
+        reasons = []
+        for i, (method, endpoint) in enumerate(zip(search_methods, endpoints), 1):
+            if self.breakers and self.breakers[endpoint].blocked():
+                print(f"搜索方法 {i} 的接口 {endpoint} 已熔断，跳过")
+                reasons.append('circuit_open')
+                continue
             try:
                 search_url = method(title)
                 print(f"尝试搜索方法 {i}: {search_url}")
-                result = self.perform_search_request(search_url, title)
+                with self.span('search_method', method=i):
+                    result, source = self.fetch_once('search', search_url,
+                                                     self.perform_search_request, search_url, title)
                 if result:
                     return result
+                reasons.append(self.take_failure('network'))
+                # 熔断或复用了已有结果时没有发送请求，不需要等待
+                if reasons[-1] == 'circuit_open' or source:
+                    continue
                     
                 # 每次尝试后等待
-                wait_time = random.randint(3, 8)
+                wait_time = self.wait_seconds('next_search_method')
                 print(f"方法 {i} 失败，等待{wait_time}秒后尝试下一种方法...")
-                time.sleep(wait_time)
+                self.pause(wait_time, 'next_search_method')
                 
             except Exception as e:
                 print(f"搜索方法 {i} 出错: {e}")
+                reasons.append('network')
                 continue
         
+        # 汇总各方法的失败原因：只要有一种方法确认没有结果，就认为ACM中没有这篇论文
+        if 'not_in_acm' in reasons:
+            self.note_failure('not_in_acm')
+        elif 'selector_miss' in reasons:
+            self.note_failure('selector_miss')
+        elif 'circuit_open' in reasons:
+            self.note_failure('circuit_open')
+        else:
+            self.note_failure('network')
         return None
     
     def perform_search_request(self, search_url, title):
         """执行搜索请求"""
-        max_retries = 2
+        max_retries = self.settings['retries']['search_attempts']
         
         for attempt in range(max_retries):
             try:
                 # 每次请求前更新User-Agent
                 self.update_headers()
                 
+                # 上一次失败已经让接口熔断时，不再等待重试
+                breaker = self.breakers.for_url(search_url) if self.breakers else None
+                if attempt > 0 and breaker and breaker.blocked():
+                    print(f"接口 {breaker.name} 已熔断，不再重试")
+                    self.note_failure('circuit_open')
+                    return None
+                
                 # 添加随机延迟
                 if attempt > 0:
-                    wait_time = random.randint(5, 15)
+                    wait_time = self.wait_seconds('search_retry')
                     print(f"第{attempt+1}次尝试前等待{wait_time}秒...")
-                    time.sleep(wait_time)
+                    self.pause(wait_time, 'search_retry')
                 
                 # 设置请求头
                 headers = {
@@ -213,7 +1457,7 @@ class ACMPaperDownloaderUltimate:
                 }
                 
                 # 发送请求
-                response = self.session.get(search_url, headers=headers, timeout=45)
+                response = self.http_get(search_url, headers=headers, timeout=self.settings['timeouts']['search'])
                 
                 # 检查响应状态
                 if response.status_code == 403:
@@ -222,64 +1466,63 @@ class ACMPaperDownloaderUltimate:
                         continue
                     else:
                         print(f"所有尝试都被拒绝，可能需要更换网络环境")
+                        self.note_failure('network')
                         return None
                 
                 if response.status_code == 429:
                     print(f"请求过于频繁(429)，需要等待更长时间")
-                    wait_time = random.randint(60, 120)
+                    wait_time = self.wait_seconds('rate_limited_429')
                     print(f"等待{wait_time}秒...")
-                    time.sleep(wait_time)
+                    self.pause(wait_time, 'rate_limited_429')
                     continue
                 
                 response.raise_for_status()
                 
                 # 随机等待，模拟人类行为
-                wait_time = random.randint(3, 8)
+                wait_time = self.wait_seconds('search_page_load')
                 print(f"页面加载等待{wait_time}秒...")
-                time.sleep(wait_time)
-                
-                # 解析搜索结果页面
-                soup = BeautifulSoup(response.content, 'html.parser')
+                self.pause(wait_time, 'search_page_load')
                 
-                # 查找第一个搜索结果链接
-                selectors = [
-                    '.issue-item__title a',
-                    '.search__item .hlFld-Title a',
-                    '.issue-item-title a',
-                    '.search-result-title a',
-                    'h5 a[href*="/doi/"]',
-                    'a[href*="/doi/"]',
-                    '.search-result a[href*="/doi/"]',
-                    '.result-item a[href*="/doi/"]'
-                ]
+                if self.html_cache:
+                    self.cache_page(search_url, response, 'search', title=title)
                 
-                first_result_link = None
-                for selector in selectors:
-                    links = soup.select(selector)
-                    if links:
-                        first_result_link = links[0].get('href')
-                        break
+                # 解析搜索结果页面，查找第一个搜索结果链接
+                first_result_link, selector = self.parse(
+                    extract_search_result, response.content,
+                    self.selector_health.order('search', SEARCH_RESULT_SELECTORS, FALLBACK_SELECTORS['search'])
+                )
                 
                 if first_result_link:
-                    # 确保链接是完整的URL
-                    if first_result_link.startswith('/'):
-                        first_result_link = 'https://dl.acm.org' + first_result_link
-                    
                     print(f"找到搜索结果: {first_result_link}")
+                    self.selector_health.record('search', selector)
                     return first_result_link
                 else:
                     print(f"未找到搜索结果")
+                    reason = classify_empty_search(response.content)
+                    # 明确没有结果的页面不算选择器失效
+                    if reason == 'selector_miss':
+                        self.selector_health.record('search', None)
+                    self.note_failure(reason)
                     return None
                     
+            except CircuitOpenError as e:
+                print(e)
+                self.note_failure('circuit_open')
+                return None
             except Exception as e:
                 print(f"第{attempt+1}次搜索请求出错: {e}")
                 if attempt < max_retries - 1:
-                    wait_time = random.randint(5, 15)
+                    wait_time = self.wait_seconds('search_retry')
                     print(f"等待{wait_time}秒后重试...")
-                    time.sleep(wait_time)
+                    self.pause(wait_time, 'search_error_retry')
                 else:
                     print(f"所有搜索尝试都失败了")
+                    self.note_failure('network')
                     return None
+        
+        # 多次429后放弃
+        self.note_failure('network')
+        return None
     
     def search_paper(self, title):
         """搜索论文，使用多种方法"""
@@ -297,51 +1540,65 @@ class ACMPaperDownloaderUltimate:
                 'Sec-Fetch-Site': 'same-origin'
             }
             
-            response = self.session.get(paper_url, headers=headers, timeout=45)
+            # 上次已经从该详情页找到过PDF链接时，发送条件请求
+            cached = self.validators.get(paper_url)
+            if cached and cached.get('pdf_url'):
+                # 引用扩展需要参考文献，索引库中没有这篇论文的参考文献时重新获取完整页面
+                doi = (cached.get('metadata') or {}).get('doi')
+                if not self.expand_depth or (doi and self.indexed_references(f"doi:{doi}") is not None):
+                    headers.update(self.conditional_headers(paper_url))
+            
+            response = self.http_get(paper_url, headers=headers, timeout=self.settings['timeouts']['detail'])
+            
+            if response.status_code == 304 and cached:
+                print(f"详情页未变化(304)，使用缓存的PDF链接: {cached['pdf_url']}")
+                self.local.metadata = cached.get('metadata') or {}
+                return cached['pdf_url']
             
             if response.status_code == 403:
                 print(f"访问论文详情页被拒绝(403)")
+                self.note_failure('network')
                 return None
                 
             response.raise_for_status()
             
             # 随机等待
-            wait_time = random.randint(2, 5)
+            wait_time = self.wait_seconds('detail_page_load')
             print(f"详情页加载等待{wait_time}秒...")
-            time.sleep(wait_time)
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # 尝试多种可能的PDF链接选择器
-            pdf_selectors = [
-                'a[href*=".pdf"]',
-                'a[title*="PDF"]',
-                'a[aria-label*="PDF"]',
-                '.pdf-link',
-                '.download-pdf',
-                '.btn--pdf',
-                'a[href*="pdf"]',
-                'a[data-title*="PDF"]',
-                '.download-link[href*="pdf"]',
-                'a[href*="/ft_gateway.cfm"]'
-            ]
-            
-            for selector in pdf_selectors:
-                pdf_links = soup.select(selector)
-                if pdf_links:
-                    pdf_url = pdf_links[0].get('href')
-                    if pdf_url:
-                        # 确保链接是完整的URL
-                        if pdf_url.startswith('/'):
-                            pdf_url = urljoin(paper_url, pdf_url)
-                        print(f"找到PDF链接: {pdf_url}")
-                        return pdf_url
+            self.pause(wait_time, 'detail_page_load')
+            
+            if self.html_cache:
+                self.cache_page(paper_url, response, 'detail')
+            
+            # 尝试多种可能的PDF链接选择器，同时提取论文元数据
+            pdf_url, metadata, selector = self.parse(
+                extract_detail_page, response.content, paper_url,
+                self.selector_health.order('pdf', PDF_LINK_SELECTORS, FALLBACK_SELECTORS['pdf'])
+            )
+            self.local.metadata = metadata
+            if pdf_url:
+                print(f"找到PDF链接: {pdf_url}")
+                self.selector_health.record('pdf', selector)
+                # 参考文献列表随下载登记到索引库，这里只保存PDF链接和基本元数据
+                self.remember_validators(paper_url, response, pdf_url=pdf_url,
+                                         metadata={k: v for k, v in metadata.items() if k != 'references'})
+                return pdf_url
             
             print("未找到PDF下载链接")
+            reason = classify_missing_pdf(response.content)
+            # 付费墙页面本来就没有PDF链接，不算选择器失效
+            if reason == 'selector_miss':
+                self.selector_health.record('pdf', None)
+            self.note_failure(reason)
             return None
             
+        except CircuitOpenError as e:
+            print(e)
+            self.note_failure('circuit_open')
+            return None
         except Exception as e:
             print(f"获取PDF链接时出错: {e}")
+            self.note_failure('network')
             return None
     
     def download_pdf(self, pdf_url, filename):
@@ -349,8 +1606,21 @@ class ACMPaperDownloaderUltimate:
         try:
             print(f"开始下载PDF: {filename}")
             
+            file_path = os.path.join(self.output_dir, filename)
+            
+            # 本地已有该文件时发送条件请求，未变化则只花费响应头的流量
+            headers = {}
+            if os.path.exists(file_path):
+                headers.update(self.conditional_headers(pdf_url))
+            
             # 发送下载请求
-            response = self.session.get(pdf_url, timeout=180, stream=True)
+            response = self.http_get(pdf_url, headers=headers, timeout=self.settings['timeouts']['pdf'], stream=True)
+            
+            if response.status_code == 304:
+                response.close()
+                print(f"PDF未变化(304)，保留本地文件: {filename}")
+                return True
+            
             response.raise_for_status()
             
             # 检查响应内容类型
@@ -358,36 +1628,558 @@ class ACMPaperDownloaderUltimate:
             if 'pdf' not in content_type and 'application/octet-stream' not in content_type:
                 print(f"警告: 响应内容类型不是PDF: {content_type}")
             
-            # 保存文件
-            file_path = os.path.join(self.output_dir, filename)
-            with open(file_path, 'wb') as f:
+            # 先写入临时文件，确认有效后再替换，避免覆盖掉本地已有的完好文件
+            part_path = file_path + '.part'
+            throttle = self.bandwidth.connection() if self.bandwidth else None
+            with open(part_path, 'wb') as f:
                 for chunk in response.iter_content(chunk_size=8192):
                     if chunk:
                         f.write(chunk)
+                        if throttle:
+                            throttle(len(chunk))
             
             # 检查文件大小
-            file_size = os.path.getsize(file_path)
+            file_size = os.path.getsize(part_path)
             if file_size < 1024:  # 小于1KB可能是错误页面
                 print(f"警告: 下载的文件很小 ({file_size} bytes)，可能不是有效的PDF")
+                os.remove(part_path)
+                # 返回HTML页面通常是登录页或付费墙
+                self.note_failure('paywalled' if 'html' in content_type else 'download_failed')
                 return False
             
+            os.replace(part_path, file_path)
+            self.remember_validators(pdf_url, response, file=filename)
+            
             print(f"成功下载并保存为: {filename} ({file_size} bytes)")
             return True
             
+        except CircuitOpenError as e:
+            print(e)
+            self.note_failure('circuit_open')
+            return False
         except Exception as e:
             print(f"下载PDF时出错: {e}")
+            response = getattr(e, 'response', None)
+            if response is not None and response.status_code in (401, 402, 403):
+                self.note_failure('paywalled')
+            else:
+                self.note_failure('network')
+            return False
+    
+    def fetch_once(self, kind, url, func, *args):
+        """合并相同的请求：同一地址正在处理时等待并共享其结果，本次运行中已有确定结果时直接复用
+        
+        返回 (结果, 来源)，来源为None时本线程实际发送了请求。失败原因和详情页元数据随结果一起共享。
+        """
+        def call():
+            self.local.failure = None
+            result = func(*args)
+            metadata = getattr(self.local, 'metadata', None) if kind == 'detail' else None
+            return result, getattr(self.local, 'failure', None), metadata
+        
+        (result, reason, metadata), source = self.single_flight.do(
+            (kind, normalize_url(url)), call,
+            memoize=lambda value: bool(value[0]) or value[1] in SHARED_FAILURES
+        )
+        self.progress.record_cache('single_flight', source is not None)
+        if source:
+            print(f"{'相同的请求正在进行，共享其结果' if source == 'coalesced' else '本次运行中已请求过，复用结果'}: {url}")
+            self.local.failure = reason
+            if metadata is not None:
+                self.local.metadata = dict(metadata)
+        return result, source
+    
+    def fetch_pdf_link(self, paper_url):
+        """获取详情页中的PDF链接，相同的详情页只请求一次"""
+        pdf_url, _ = self.fetch_once('detail', paper_url, self.get_pdf_link, paper_url)
+        return pdf_url
+    
+    def fetch_pdf(self, pdf_url, filename):
+        """下载PDF；同一个PDF已由其他论文下载（或正在下载）时复用那个文件"""
+        def download():
+            if self.download_pdf(pdf_url, filename):
+                return os.path.join(self.output_dir, filename)
+            return None
+        
+        file_path, source = self.fetch_once('pdf', pdf_url, download)
+        if source and file_path:
+            try:
+                self.link_output_file(file_path, filename)
+            except OSError as e:
+                print(f"复用文件失败，重新下载: {e}")
+                return self.download_pdf(pdf_url, filename)
+        return bool(file_path)
+    
+    def process_title(self, title, paper_url=None):
+        """处理单篇论文：搜索、获取PDF链接、下载
+        
+        已知详情页地址（如引用扩展中的DOI）时传入paper_url，跳过搜索。
+        成功时返回'downloaded'，失败时返回失败类别（见NEGATIVE_CACHE_TTL）。
+        """
+        self.take_failure(None)
+        
+        # 搜索论文
+        if not paper_url:
+            with self.page_slots:
+                start_time = time.time()
+                with self.span('search'):
+                    paper_url = self.with_circuit(('search', 'doSearch'), self.search_paper, title)
+                self.progress.record_stage('search', time.time() - start_time)
+        if not paper_url:
+            print(f"搜索失败: {title}")
+            return self.take_failure('not_in_acm')
+        
+        # 获取PDF链接
+        self.local.metadata = {}
+        with self.page_slots:
+            start_time = time.time()
+            with self.span('detail', url=paper_url):
+                pdf_url = self.with_circuit(('detail',), self.fetch_pdf_link, paper_url)
+            self.progress.record_stage('detail', time.time() - start_time)
+        metadata = self.local.metadata or {}
+        if self.expand_depth and 'references' in metadata:
+            with self.state_lock:
+                self.paper_references[title] = metadata['references']
+        
+        # 按DOI扩展的论文用详情页中的标题命名文件
+        if metadata.get('title') and title.startswith('doi:'):
+            title = metadata['title']
+        filename = self.sanitize_filename(title)
+        
+        if not pdf_url:
+            print(f"无法获取PDF链接: {title}")
+            reason = self.take_failure('selector_miss')
+            if self.mirror_fetcher and self.transfer_deferred():
+                self.defer_download(title, None, filename, metadata, paper_url, reason)
+                return 'deferred'
+            if self.try_mirrors(title, filename, metadata, paper_url):
+                return 'downloaded'
+            return reason
+        
+        # 不同标题可能指向同一篇论文（同一个DOI），索引中已有时直接复用文件，不再下载
+        if metadata.get('doi') and not self.refresh:
+            entry = self.library_index.find_by_doi(metadata['doi'])
+            if entry and entry['file'] and os.path.exists(entry['file']):
+                print(f"DOI {metadata['doi']} 已下载过，复用文件: {entry['file']}")
+                self.reuse_indexed_file(entry, title, filename, metadata)
+                return 'already_downloaded'
+        
+        if self.transfer_deferred():
+            self.defer_download(title, pdf_url, filename, metadata, paper_url)
+            return 'deferred'
+        
+        # 下载PDF
+        with self.download_slots:
+            start_time = time.time()
+            with self.span('download', url=pdf_url):
+                downloaded = self.with_circuit(('pdf',), self.fetch_pdf, pdf_url, filename)
+            self.progress.record_stage('download', time.time() - start_time)
+        if not downloaded:
+            print(f"下载失败: {title}")
+            reason = self.take_failure('download_failed')
+            if reason != 'network' and self.try_mirrors(title, filename, metadata, paper_url):
+                return 'downloaded'
+            return reason
+        
+        self.index_download(title, os.path.join(self.output_dir, filename), metadata)
+        return 'downloaded'
+    
+    def transfer_deferred(self):
+        """传输时间窗口之外返回True（批量处理时PDF排队稍后下载）；其他模式下等到窗口打开"""
+        if not self.transfer_window or self.transfer_window.is_open():
+            return False
+        if self.defer_transfers:
+            return True
+        self.wait_for_transfer_window()
+        return False
+    
+    def wait_for_transfer_window(self):
+        wait_time = self.transfer_window.seconds_until_open()
+        if wait_time > 0:
+            print(f"当前不在传输时间窗口（{self.transfer_window.spec}）内，{format_duration(wait_time)} 后开始传输PDF")
+            self.pause(wait_time, 'transfer_window')
+    
+    def defer_download(self, title, pdf_url, filename, metadata, paper_url=None, reason=None):
+        """把PDF下载放入排队列表，窗口打开后由 run_deferred_downloads 处理"""
+        print(f"不在传输时间窗口（{self.transfer_window.spec}）内，PDF排队稍后下载: {title}")
+        with self.state_lock:
+            self.deferred_downloads[title] = {
+                'pdf_url': pdf_url,
+                'filename': filename,
+                'paper_url': paper_url,
+                'metadata': {k: v for k, v in metadata.items() if k != 'references'},
+                'reason': reason,
+                'deferred_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            }
+            self.dirty_states.add(self.deferred_file)
+        self.save_state()
+    
+    def download_deferred(self, title, item):
+        """下载一篇排队的PDF，返回处理状态"""
+        self.take_failure(None)
+        self.progress.title_started(title)
+        metadata = item.get('metadata') or {}
+        status = item.get('reason') or 'selector_miss'
+        if item.get('pdf_url'):
+            with self.download_slots:
+                start_time = time.time()
+                with self.span('download', url=item['pdf_url']):
+                    downloaded = self.with_circuit(('pdf',), self.fetch_pdf, item['pdf_url'], item['filename'])
+                self.progress.record_stage('download', time.time() - start_time)
+            if downloaded:
+                self.index_download(title, os.path.join(self.output_dir, item['filename']), metadata)
+                status = 'downloaded'
+            else:
+                status = self.take_failure('download_failed')
+        if status != 'downloaded' and status != 'network' and \
+                self.try_mirrors(title, item['filename'], metadata, item.get('paper_url')):
+            status = 'downloaded'
+        
+        with self.stats_lock:
+            if status == 'downloaded':
+                self.successful_downloads += 1
+            else:
+                self.failed_downloads += 1
+        self.record_result(title, status)
+        with self.state_lock:
+            self.deferred_downloads.pop(title, None)
+            self.dirty_states.add(self.deferred_file)
+        self.save_state()
+        if self.sync_state:
+            self.sync_state.record(title, status)
+        self.progress.title_finished(status)
+        return status
+    
+    def run_deferred_downloads(self):
+        """等到传输时间窗口打开，下载排队的PDF（包括之前运行中断时留下的）"""
+        with self.state_lock:
+            items = list(self.deferred_downloads.items())
+        if not items:
+            return 0
+        print(f"\n=== 排队的PDF下载: {len(items)} 篇 ===")
+        for i, (title, item) in enumerate(items, 1):
+            # 下载过程中窗口可能再次关闭，每篇之前都检查
+            if self.transfer_window and not self.transfer_window.is_open():
+                self.wait_for_transfer_window()
+            print(f"\n[排队 {i}/{len(items)}] {title}")
+            self.download_deferred(title, item)
+            if i < len(items):
+                self.pause(self.wait_seconds('politeness'), 'politeness')
+        return len(items)
+    
+    def try_mirrors(self, title, filename, metadata, paper_url=None):
+        """ACM上拿不到PDF时到开放获取镜像源查找，成功时登记到索引并返回True"""
+        if not self.mirror_fetcher:
             return False
+        doi = metadata.get('doi')
+        if not doi and paper_url and '/doi/' in paper_url:
+            doi = paper_url.split('/doi/', 1)[1].split('?')[0]
+            doi = doi.split('/', 1)[1] if doi.startswith(('abs/', 'pdf/', 'epdf/', 'fullHtml/')) else doi
+        search_title = metadata.get('title') or (None if title.startswith('doi:') else title)
+        
+        print(f"尝试开放获取镜像源: {title}")
+        with self.download_slots:
+            start_time = time.time()
+            with self.span('mirror', doi=doi) as span_args:
+                found = self.mirror_fetcher.download(os.path.join(self.output_dir, filename),
+                                                     doi=doi, title=search_title)
+                span_args['source'] = found[0] if found else None
+            self.progress.record_stage('mirror', time.time() - start_time)
+        if not found:
+            return False
+        
+        source, url = found
+        print(f"从镜像源 {source} 下载成功: {url}")
+        self.index_download(title, os.path.join(self.output_dir, filename), dict(metadata, doi=doi))
+        return True
+    
+    def with_circuit(self, endpoints, func, *args):
+        """执行一个阶段；因接口熔断没有完成时暂停到可以探测，再重新执行该阶段
+        
+        这样熔断期间的论文既不发送请求，也不会被当作失败写入失败记录。
+        """
+        while True:
+            result = func(*args)
+            if result or not self.breakers:
+                return result
+            reason = getattr(self.local, 'failure', None)
+            # 触发熔断的那次请求本身记为网络错误，这时接口已经熔断，同样等待后重试
+            if reason != 'circuit_open' and not (reason == 'network' and self.breakers.all_blocked(endpoints)):
+                return result
+            self.take_failure(None)
+            wait_time = max(5, self.breakers.seconds_until_any(endpoints))
+            print(f"接口 {'/'.join(endpoints)} 已熔断，暂停 {wait_time:.0f} 秒后探测...")
+            self.pause(wait_time, 'circuit_open')
+    
+    def index_download(self, title, file_path, metadata):
+        """把下载好的论文登记到索引库（doi:条目使用详情页中的标题，没有标题时不登记）"""
+        if title.startswith('doi:'):
+            title = metadata.get('title')
+            if not title:
+                return
+        try:
+            self.library_index.add(
+                title,
+                file_path,
+                doi=metadata.get('doi'),
+                authors=metadata.get('authors'),
+                venue=metadata.get('venue'),
+                references=metadata.get('references')
+            )
+        except Exception as e:
+            print(f"登记索引失败: {e}")
+    
+    def link_output_file(self, source, filename):
+        """把已有的文件硬链接（不支持时复制）到输出目录中的filename，返回目标路径"""
+        target = os.path.abspath(os.path.join(self.output_dir, filename))
+        if os.path.abspath(source) != target and not os.path.exists(target):
+            try:
+                os.link(source, target)
+            except OSError:
+                shutil.copy2(source, target)
+        return target
+    
+    def reuse_indexed_file(self, entry, title, filename, metadata=None):
+        """复用索引中已有的文件：在其他目录时硬链接（不支持时复制）到当前输出目录"""
+        target = self.link_output_file(entry['file'], filename)
+        metadata = metadata or {}
+        self.index_download(title, target, {
+            'doi': metadata.get('doi') or entry.get('doi'),
+            'authors': metadata.get('authors') or entry.get('authors'),
+            'venue': metadata.get('venue') or entry.get('venue'),
+        })
+    
+    def handle_title(self, index, total, title, wait_after=None, paper_url=None):
+        """处理一篇论文并更新统计，之后按网络礼仪等待"""
+        with self.span('title', title=title) as span_args:
+            print(f"\n[{index}/{total or '?'}] 正在处理: {title}")
+            print("=" * 80)
+            self.progress.title_started(title)
+        
+            # doi:前缀的条目（目录、引用扩展）和计划中有DOI的论文直接访问详情页，不需要搜索
+            if paper_url is None:
+                doi = title[4:] if title.startswith('doi:') else self.title_dois.get(title)
+                if doi:
+                    paper_url = f"https://dl.acm.org/doi/{doi}"
+        
+            # 索引中已有且文件仍然存在的论文直接跳过（只需一次索引查询和一次stat）
+            if not self.refresh and not self.plan_checked:
+                if title.startswith('doi:'):
+                    entry = self.library_index.find_by_doi(title[4:])
+                else:
+                    entry = self.library_index.find_by_title(title)
+                indexed = bool(entry and entry['file'] and os.path.exists(entry['file']))
+                self.progress.record_cache('library_index', indexed)
+                if indexed:
+                    print(f"已下载过（索引中有记录）: {entry['file']}")
+                    # 只有标题确实和索引中的不同，或文件在其他项目的目录中时，才在当前目录按标题生成文件；
+                    # doi:条目直接使用已有的文件，不再生成 doi_xxx.pdf，也不把doi:标题写入索引
+                    in_output_dir = os.path.dirname(entry['file']) == os.path.abspath(self.output_dir)
+                    if not title.startswith('doi:') and (entry['title'] != title or not in_output_dir):
+                        self.reuse_indexed_file(entry, title, self.sanitize_filename(title))
+                    with self.stats_lock:
+                        self.successful_downloads += 1
+                        self.indexed_titles += 1
+                    self.progress.title_finished('already_downloaded')
+                    span_args['status'] = 'already_downloaded'
+                    return 'already_downloaded'
+        
+            # 已知失败且未到重试时间的论文直接跳过，不发送任何请求
+            cached_failure = None if self.plan_checked else self.negative_cache_hit(title)
+            if cached_failure:
+                print(f"跳过: 上次失败原因为 {cached_failure['status']}，"
+                      f"{cached_failure['retry_after']} 之前不再重试（使用 --retry-failed 强制重试）")
+                with self.stats_lock:
+                    self.skipped_titles += 1
+                self.progress.title_finished('skipped')
+                span_args['status'] = 'skipped'
+                return 'skipped'
+        
+            with self.stats_lock:
+                self.active_titles += 1
+                self.titles_started += 1
+                alone = self.active_titles == 1
+                started = self.titles_started
+            before = self.connection_counters()
+            start_time = time.time()
+            try:
+                status = self.process_title(title, paper_url=paper_url)
+            except Exception as e:
+                print(f"处理论文时出错: {e}")
+                status = 'error'
+            self.progress.record_stage('title', time.time() - start_time)
+            with self.stats_lock:
+                self.active_titles -= 1
+                alone = alone and self.titles_started == started
+        
+            # 并发时各线程的连接混在一起，只在处理期间没有其他论文同时进行时报告单篇的连接情况
+            if alone:
+                after = self.connection_counters()
+                print(f"本篇论文: 请求 {after['requests'] - before['requests']} 次, "
+                      f"新建连接 {after['connections'] - before['connections']} 次, "
+                      f"TLS握手 {after['tls_handshakes'] - before['tls_handshakes']} 次")
+        
+            with self.stats_lock:
+                if status in ('downloaded', 'already_downloaded'):
+                    self.successful_downloads += 1
+                elif status == 'deferred':
+                    self.deferred_titles += 1
+                else:
+                    self.failed_downloads += 1
+        
+            self.record_result(title, status)
+        
+            # 定期保存条件请求状态和失败记录，中断后最多丢失最近一小段时间的结果
+            self.save_state()
+        
+            # 网络礼仪：随机等待，避免被封IP（并发时每个线程各自等待）
+            if wait_after is None:
+                wait_after = total is None or index < total  # 最后一个不需要等待
+            if wait_after:
+                wait_time = self.wait_seconds('politeness')
+                print(f"\n等待{wait_time}秒后处理下一篇论文...")
+                start_time = time.time()
+                self.pause(wait_time, 'politeness')
+                self.progress.record_stage('sleep', time.time() - start_time)
+        
+            # 等待结束后才算完成，吞吐量和预计完成时间因此包含实际的等待时间
+            self.progress.title_finished(status)
+            span_args['status'] = status
+            return status
+    
+    def handle_input_title(self, index, total, title, wait_after=None):
+        """处理输入文件中的一篇论文，增量同步时记录该行的结果"""
+        status = self.handle_title(index, total, title, wait_after=wait_after)
+        if self.sync_state:
+            self.sync_state.record(title, status)
+        return status
+    
+    def indexed_references(self, key):
+        """索引库中保存的参考文献DOI（key为标题或doi:DOI），没有记录时返回None"""
+        if key.startswith('doi:'):
+            entry = self.library_index.find_by_doi(key[4:])
+        else:
+            entry = self.library_index.find_by_title(key)
+        if not entry or entry.get('refs') is None:
+            return None
+        return json.loads(entry['refs'])
+    
+    def cached_references(self, key):
+        """论文的参考文献DOI：优先用本次运行的结果，其次用下载时登记到索引库中的结果"""
+        with self.state_lock:
+            if key in self.paper_references:
+                return self.paper_references[key]
+        return self.indexed_references(key) or []
+    
+    def expand_citations(self, seeds):
+        """引用扩展：从种子论文的参考文献出发，按层广度优先下载被引论文
+        
+        参考文献来自下载时已经获取的详情页，已下载过的DOI不发送任何请求，
+        所以每篇新论文大约只需要一次详情页请求和一次PDF请求。
+        扩展阶段经过http_get发给ACM的请求数达到预算后停止（镜像源请求不计入）。
+        """
+        frontier = deque()
+        seen = set()
+        for title in seeds:
+            entry = self.library_index.find_by_title(title)
+            if entry and entry['doi']:
+                seen.add(entry['doi'])
+        
+        def enqueue(key, depth):
+            if depth > self.expand_depth:
+                return
+            for doi in self.cached_references(key):
+                if doi not in seen:
+                    seen.add(doi)
+                    frontier.append((doi, depth))
+        
+        for title in seeds:
+            enqueue(title, 1)
+        
+        print(f"\n=== 引用扩展: 最多 {self.expand_depth} 层，请求预算 {self.expand_budget} 次 ===")
+        print(f"第1层待处理: {len(frontier)} 篇")
+        
+        start_requests = self.acm_requests
+        processed = 0
+        known = 0
+        depth_counts = {}
+        while frontier:
+            used = self.acm_requests - start_requests
+            if used >= self.expand_budget:
+                print(f"\n已用完请求预算（{used} 次），剩余 {len(frontier)} 篇未处理")
+                break
+            
+            doi, depth = frontier.popleft()
+            key = f"doi:{doi}"
+            
+            # 已下载过的论文不再请求，只沿缓存中的参考文献继续扩展
+            entry = None if self.refresh else self.library_index.find_by_doi(doi)
+            if entry and entry['file'] and os.path.exists(entry['file']):
+                known += 1
+                enqueue(key, depth + 1)
+                continue
+            
+            processed += 1
+            status = self.handle_title(processed, processed + len(frontier), key,
+                                       wait_after=bool(frontier), paper_url=f"https://dl.acm.org/doi/{doi}")
+            depth_counts.setdefault(depth, {})
+            depth_counts[depth][status] = depth_counts[depth].get(status, 0) + 1
+            enqueue(key, depth + 1)
+        
+        used = self.acm_requests - start_requests
+        print(f"\n引用扩展完成: 处理 {processed} 篇，已在索引中 {known} 篇，用了 {used} 次请求")
+        for depth in sorted(depth_counts):
+            summary = ', '.join(f"{status} {count}" for status, count in sorted(depth_counts[depth].items()))
+            print(f"- 第{depth}层: {summary}")
+        return processed
+    
+    def trace_title(self, title):
+        """只处理一篇论文（--trace），耗时树由调用方输出"""
+        self.create_output_directory()
+        self.start_parse_pool()
+        try:
+            return self.handle_title(1, 1, title, wait_after=False)
+        finally:
+            self.stop_parse_pool()
+            self.save_state(force=True)
+            self.selector_health.save()
     
     def process_papers(self):
         """处理所有论文"""
-        titles = self.read_excel_file()
-        if not titles:
+        if self.plan_file:
+            titles = self.read_plan()
+        elif self.toc:
+            titles = self.read_toc()
+        elif self.sync:
+            titles = self.read_sync_titles()
+        elif self.low_memory:
+            titles = self.iter_input_titles()
+            # 引用扩展需要所有种子标题，这时仍然读入完整的标题列表
+            if self.expand_depth > 0:
+                titles = list(titles)
+        else:
+            titles = self.read_excel_file()
+        if isinstance(titles, list) and not titles:
             return
+        titles = self.prepend_repair_queue(titles)
+        total = len(titles) if isinstance(titles, list) else None
+        processed = 0
         
         self.create_output_directory()
         
-        successful_downloads = 0
-        failed_downloads = 0
+        self.successful_downloads = 0
+        self.failed_downloads = 0
+        self.skipped_titles = 0
+        self.indexed_titles = 0
+        self.deferred_titles = 0
+        expanded = 0
+        # 批量处理时窗口之外的PDF排队，搜索和详情页照常进行
+        self.defer_transfers = self.transfer_window is not None
+        if self.transfer_window:
+            print(f"PDF传输时间窗口: {self.transfer_window.spec}"
+                  f"（现在{'在' if self.transfer_window.is_open() else '不在'}窗口内）")
+        if self.bandwidth:
+            print(f"PDF下载带宽限制: {self.bandwidth.describe()}")
         
         print("\n=== 开始处理论文下载 ===")
         print(f"提示: 如果遇到大量403错误，建议:")
@@ -396,68 +2188,562 @@ class ACMPaperDownloaderUltimate:
         print(f"3. 联系学校图书馆获取数据库访问权限")
         print("\n")
         
+        self.start_parse_pool()
+        self.progress.start(total)
+        
         try:
-            for i, title in enumerate(titles, 1):
-                print(f"\n[{i}/{len(titles)}] 正在处理: {title}")
-                print("=" * 80)
-                
-                # 搜索论文
-                paper_url = self.search_paper(title)
-                if paper_url:
-                    # 获取PDF链接
-                    pdf_url = self.get_pdf_link(paper_url)
-                    if pdf_url:
-                        # 下载PDF
-                        filename = self.sanitize_filename(title)
-                        if self.download_pdf(pdf_url, filename):
-                            successful_downloads += 1
-                        else:
-                            failed_downloads += 1
-                            print(f"下载失败: {title}")
-                    else:
-                        failed_downloads += 1
-                        print(f"无法获取PDF链接: {title}")
-                else:
-                    failed_downloads += 1
-                    print(f"搜索失败: {title}")
-                
-                # 网络礼仪：随机等待，避免被封IP
-                if i < len(titles):  # 最后一个不需要等待
-                    wait_time = random.randint(15, 30)
-                    print(f"\n等待{wait_time}秒后处理下一篇论文...")
-                    time.sleep(wait_time)
+            if self.workers > 1:
+                print(f"并发处理: {self.workers} 个线程")
+                with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                    # 只提交有限数量的任务，避免一次为所有标题创建Future
+                    in_flight = set()
+                    for i, title in enumerate(titles, 1):
+                        if len(in_flight) >= self.workers * 2:
+                            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                            for future in done:
+                                future.result()
+                        in_flight.add(executor.submit(self.handle_input_title, i, total, title))
+                        processed = i
+                    for future in in_flight:
+                        future.result()
+            else:
+                for i, (title, is_last) in enumerate(iter_with_last(titles), 1):
+                    processed = i
+                    self.handle_input_title(i, total, title, wait_after=not is_last)
+            
+            if self.expand_depth > 0:
+                expanded = self.expand_citations(titles)
+            
+            self.run_deferred_downloads()
                 
         finally:
+            self.defer_transfers = False
+            self.stop_parse_pool()
+            self.save_state(force=True)
+            self.selector_health.save()
+            self.progress.stop()
+            
+            successful_downloads = self.successful_downloads
+            failed_downloads = self.failed_downloads
+            
             print(f"\n" + "=" * 50)
             print(f"下载完成统计:")
             print(f"成功下载: {successful_downloads} 篇")
             print(f"下载失败: {failed_downloads} 篇")
-            print(f"总计处理: {len(titles)} 篇")
-            print(f"成功率: {successful_downloads/len(titles)*100:.1f}%" if titles else "0%")
+            if self.indexed_titles:
+                print(f"其中已在索引中: {self.indexed_titles} 篇（未发送请求）")
+            if self.skipped_titles:
+                print(f"跳过(已知失败): {self.skipped_titles} 篇")
+            with self.state_lock:
+                still_deferred = len(self.deferred_downloads)
+            if still_deferred:
+                print(f"PDF仍在排队: {still_deferred} 篇（下次运行时继续: {self.deferred_file}）")
+            if self.bandwidth and self.bandwidth.throttled_seconds:
+                print(f"带宽限制累计等待: {self.bandwidth.throttled_seconds:.0f} 秒")
+            if expanded:
+                print(f"其中引用扩展: {expanded} 篇")
+            processed += expanded
+            print(f"总计处理: {processed} 篇")
+            print(f"成功率: {successful_downloads/processed*100:.1f}%" if processed else "0%")
+            
+            self.print_connection_stats(successful_downloads + failed_downloads)
+            self.selector_health.print_summary()
+            
+            progress = self.progress.snapshot()
+            if progress['titles_per_hour']:
+                print(f"吞吐量: {progress['titles_per_hour']} 篇/小时（进度统计: {self.progress.status_file}）")
+            
+            peak = peak_rss_mb()
+            if peak is not None:
+                print(f"内存峰值(RSS): {peak:.1f} MB")
             
             if failed_downloads > 0:
-                print(f"\n失败原因可能包括:")
-                print(f"- 论文需要付费或订阅")
-                print(f"- 网络访问受限(403错误)")
-                print(f"- 论文不存在于ACM数据库")
-                print(f"- 网络连接问题")
+                reasons = {}
+                for entry in self.failures.values():
+                    reasons[entry['status']] = reasons.get(entry['status'], 0) + 1
+                print(f"\n失败记录中各类原因（见 {self.failures_file}）:")
+                for reason, count in sorted(reasons.items(), key=lambda x: -x[1]):
+                    print(f"- {reason}: {count} 篇")
+        
+        if self.extract_text:
+            print("\n=== 更新全文索引 ===")
+            update_fulltext_index(self.output_dir, self.fulltext_index, workers=self.parse_workers or None)
+
+
+    def run_coordinator(self, queue, poll_interval=60, failed_output="failed_papers.xlsx"):
+        """协调者：把Excel中的标题写入共享队列，定期回收过期租约并汇总结果"""
+        titles = self.read_excel_file()
+        if not titles:
+            return
+        
+        added = queue.enqueue(titles)
+        print(f"已加入队列 {added} 个新标题（{len(titles) - added} 个已在队列中）")
+        
+        try:
+            while True:
+                reclaimed = queue.reclaim_expired()
+                if reclaimed:
+                    print(f"回收了 {reclaimed} 个过期租约（工作者可能已退出）")
+                
+                stats = queue.stats()
+                print(f"[{time.strftime('%H:%M:%S')}] 待处理 {stats['pending']}, "
+                      f"处理中 {stats['leased']}, 已完成 {stats['done']}/{stats['total']}")
+                if stats['pending'] == 0 and stats['leased'] == 0:
+                    break
+                time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            print("\n协调者已停止，工作者可以继续处理队列中的标题")
+        
+        self.report_queue_results(queue, failed_output)
+    
+    def report_queue_results(self, queue, failed_output):
+        """汇总所有工作者的结果，失败的标题导出为新的Excel文件（已下载过和跳过的不算失败）"""
+        results = queue.results()
+        succeeded = [r for r in results if r['status'] in QUEUE_SUCCESS_STATUSES]
+        skipped = [r for r in results if r['status'] in QUEUE_SKIPPED_STATUSES]
+        failed = [r for r in results
+                  if r['status'] not in QUEUE_SUCCESS_STATUSES and r['status'] not in QUEUE_SKIPPED_STATUSES]
+        
+        print(f"\n" + "=" * 50)
+        print(f"队列处理统计:")
+        print(f"成功下载: {len(succeeded)} 篇"
+              + (f"（其中 {sum(r['status'] == 'already_downloaded' for r in succeeded)} 篇已下载过）"
+                 if any(r['status'] == 'already_downloaded' for r in succeeded) else ""))
+        if skipped:
+            print(f"跳过: {len(skipped)} 篇（失败记录中未到重试时间，或PDF排队/接口熔断中）")
+        print(f"下载失败: {len(failed)} 篇")
+        
+        workers = {}
+        for r in results:
+            workers[r['worker']] = workers.get(r['worker'], 0) + 1
+        for worker, count in sorted(workers.items(), key=lambda x: str(x[0])):
+            print(f"  工作者 {worker}: {count} 篇")
+        
+        if failed and failed_output:
+            try:
+                pd.DataFrame([{'Title': r['title'], 'Status': r['status'], 'Worker': r['worker'],
+                               'Attempts': r['attempts']} for r in failed]).to_excel(failed_output, index=False)
+                print(f"失败的论文已导出到: {failed_output}（可直接作为下次运行的输入）")
+            except Exception as e:
+                print(f"导出失败列表出错: {e}")
+    
+    def run_worker(self, queue, worker_id=None, lease_seconds=1800, poll_interval=60):
+        """工作者：从共享队列领取标题并处理，结果写回队列，直到队列处理完毕"""
+        worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        print(f"工作者 {worker_id} 已启动，租约时长 {lease_seconds} 秒")
+        
+        self.create_output_directory()
+        self.start_parse_pool()
+        processed = 0
+        
+        def lease_loop():
+            nonlocal processed
+            while True:
+                title = queue.lease(worker_id, lease_seconds)
+                if title is None:
+                    stats = queue.stats()
+                    if stats['pending'] == 0 and stats['leased'] == 0:
+                        print("队列已处理完毕")
+                        break
+                    # 其他工作者还持有租约，等待它们完成或租约过期
+                    print(f"暂无可领取的标题（{stats['leased']} 篇处理中），{poll_interval}秒后重试...")
+                    time.sleep(poll_interval)
+                    continue
+                
+                with self.stats_lock:
+                    processed += 1
+                    index = processed
+                stats = queue.stats()
+                # 每个线程各自遵守网络礼仪等待
+                status = self.handle_title(index, stats['total'], title, wait_after=True)
+                if not queue.complete(title, worker_id, status):
+                    print(f"租约已过期并转给其他工作者，本次结果未被采用: {title}")
+        
+        try:
+            if self.workers > 1:
+                print(f"并发处理: {self.workers} 个线程")
+                with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                    for future in [executor.submit(lease_loop) for _ in range(self.workers)]:
+                        future.result()
+            else:
+                lease_loop()
+        finally:
+            self.stop_parse_pool()
+            self.save_state(force=True)
+            self.selector_health.save()
+            print(f"\n工作者 {worker_id} 共处理 {processed} 篇，"
+                  f"成功 {self.successful_downloads} 篇，失败 {self.failed_downloads} 篇")
+            self.print_connection_stats(processed)
+            self.close()
+
+
+def add_download_arguments(parser):
+    """添加下载相关的命令行参数（终极版和混合版共用）"""
+    parser.add_argument("excel_file", nargs='?', help="包含Title列的Excel文件（使用 --toc 时可省略）")
+    parser.add_argument("--toc", default=None,
+                        help="会议论文集/期刊目录页地址或论文集DOI，下载目录中的所有论文（不需要Excel文件）")
+    parser.add_argument("--cache-html", action="store_true",
+                        help="压缩保存搜索页和详情页原始响应，供离线重放")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="并发处理论文的线程数（默认1，即逐篇处理）")
+    parser.add_argument("--parse-workers", type=int, default=0,
+                        help="解析HTML的进程数（默认0，即在网络线程中解析）")
+    parser.add_argument("--pool-connections", type=int, default=10,
+                        help="缓存的主机连接池数量")
+    parser.add_argument("--pool-maxsize", type=int, default=None,
+                        help="每个主机保留的长连接数（默认为 max(10, 线程数*2)）")
+    parser.add_argument("--dns-cache-ttl", type=int, default=0,
+                        help="DNS缓存时间（秒），0表示不缓存")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="忽略失败记录中的重试间隔，重新尝试所有已知失败的论文")
+    parser.add_argument("--library-index", default=None,
+                        help="已下载论文的索引文件（默认 .acm_cache/library.db，多个项目可共用以跨项目去重）")
+    parser.add_argument("--refresh", action="store_true",
+                        help="不跳过索引中已有的论文，用条件请求重新检查它们是否有更新")
+    parser.add_argument("--expand-depth", type=int, default=0,
+                        help="引用扩展：沿参考文献继续下载的层数（默认0，不扩展）")
+    parser.add_argument("--expand-budget", type=int, default=200,
+                        help="引用扩展阶段最多发送的请求数（每篇新论文约2次）")
+    parser.add_argument("--low-memory", action="store_true",
+                        help="低内存模式：流式读取输入文件（.xlsx/.csv/.txt），不按优先级/截止日期排序")
+    parser.add_argument("--max-inflight-pages", type=int, default=None,
+                        help="同时在内存中的页面数上限（默认等于线程数）")
+    parser.add_argument("--max-inflight-downloads", type=int, default=None,
+                        help="同时进行的PDF下载数上限（默认等于线程数）")
+    parser.add_argument("--status-file", default=None,
+                        help="进度状态JSON文件（默认 .acm_cache/status.json）")
+    parser.add_argument("--dashboard-interval", type=int, default=60,
+                        help="每隔多少秒更新状态文件并在终端显示进度面板，0表示不显示")
+    parser.add_argument("--trace", metavar="TITLE", default=None,
+                        help="只处理这一篇论文，打印请求、重试、等待和解析的耗时树（已下载过时加 --refresh）")
+    parser.add_argument("--profile", nargs='?', const='cprofile', choices=['cprofile', 'sampling'], default=None,
+                        help="在性能分析器中运行（cprofile 或 sampling，后者需要 pyinstrument），同时记录耗时树")
+    parser.add_argument("--trace-output", default="acm_trace.json",
+                        help="Chrome Trace格式的追踪文件（可用 perfetto 或 speedscope 打开）")
+    parser.add_argument("--plan", dest="plan_file", default=None,
+                        help="使用plan命令生成的执行计划，只处理其中需要联网的论文")
+    parser.add_argument("--mirrors", default=None,
+                        help=f"ACM上拿不到PDF时依次查询的开放获取镜像源，逗号分隔（可选: {','.join(MIRROR_SOURCES)}）")
+    parser.add_argument("--mirror-race", action="store_true",
+                        help="同时请求所有镜像候选地址，保留最先返回有效PDF的那个")
+    parser.add_argument("--unpaywall-email", default=None,
+                        help="Unpaywall API要求提供的联系邮箱")
+    parser.add_argument("--mirror-url", action="append", metavar="NAME=URL",
+                        help="覆盖镜像源的API地址（如指向本地测试服务器），可多次使用")
+    parser.add_argument("--mirror-rate", action="append", metavar="NAME=PER_MINUTE",
+                        help="镜像源每分钟最多请求数，可多次使用")
+    parser.add_argument("--breaker-threshold", type=int, default=3,
+                        help="某个接口（搜索页/doSearch/详情页/PDF）连续失败多少次后熔断，0表示不熔断")
+    parser.add_argument("--breaker-cooldown", type=int, default=300,
+                        help="熔断后多少秒发送一个探测请求（探测失败时加倍，最长1小时）")
+    parser.add_argument("--bandwidth-limit", default=None,
+                        help="所有PDF下载合计的带宽上限，如 2M、500K（每秒字节数）")
+    parser.add_argument("--connection-limit", default=None,
+                        help="每个PDF下载连接的带宽上限，如 512K")
+    parser.add_argument("--transfer-window", default=None,
+                        help="只在这些时间段传输PDF，如 22:00-07:00 或 22:00-07:00,12:00-13:00；"
+                             "窗口之外照常搜索，PDF排队到窗口打开后下载")
+    parser.add_argument("--sync", action="store_true",
+                        help="增量同步：只处理表格中新增、修改过或上次没有成功的行")
+    parser.add_argument("--sync-prune", action="store_true",
+                        help="增量同步时删除已从表格中删除的行对应的PDF文件和索引记录")
+    add_config_arguments(parser)
+    parser.add_argument("--extract-text", action="store_true",
+                        help="下载完成后提取新PDF的全文，增量更新本地全文索引（需要 pypdf）")
+
+
+def add_config_arguments(parser):
+    """添加配置文件相关的参数（下载和其他联网/解析的子命令共用）"""
+    parser.add_argument("--config", default=None,
+                        help="配置文件（.toml/.yaml/.json）：超时、重试、等待时间、额外选择器和下载参数的默认值")
+    parser.add_argument("--config-profile", default=None, choices=sorted(PROFILES),
+                        help="命名的配置档案（配置文件中的设置会覆盖它）")
+    parser.add_argument("--set", action="append", metavar="KEY=VALUE",
+                        help="覆盖单个配置项，如 waits.politeness=5,10 或 timeouts.pdf=300，可多次使用")
+    parser.add_argument("--show-config", action="store_true",
+                        help="打印生效的配置后退出")
+
+
+def parse_download_args(parser, argv=None, download_parser=None):
+    """解析参数并加载配置（args.settings）
+    
+    下载命令中，配置的 [download] 作为命令行参数的默认值，命令行中给出的参数优先。
+    """
+    args = parser.parse_args(argv)
+    if not hasattr(args, 'config'):
+        return args
+    
+    try:
+        settings = load_settings(args.config, args.config_profile, args.set)
+    except (OSError, ValueError) as e:
+        parser.error(f"读取配置失败: {e}")
+    
+    if settings['download'] and getattr(args, 'command', 'download') == 'download':
+        target = download_parser or parser
+        known = {action.dest for action in target._actions}
+        unknown = sorted(set(settings['download']) - known)
+        if unknown:
+            parser.error(f"配置中有未知的下载参数: {', '.join(unknown)}")
+        target.set_defaults(**settings['download'])
+        args = parser.parse_args(argv)
+    args.settings = settings
+    
+    # 镜像源参数在这里检查，格式错误时给出用法提示而不是在创建下载器时抛出异常
+    if hasattr(args, 'mirror_url'):
+        try:
+            args.mirror_urls = parse_source_urls(args.mirror_url)
+            args.mirror_rates = parse_source_rates(args.mirror_rate)
+            unknown = [m.strip() for m in (args.mirrors or '').split(',') if m.strip() and m.strip() not in MIRROR_SOURCES]
+            if unknown:
+                raise ValueError(f"未知的镜像源: {', '.join(unknown)}（可选: {', '.join(MIRROR_SOURCES)}）")
+        except ValueError as e:
+            parser.error(str(e))
+    
+    if args.show_config:
+        print_settings(settings)
+        sys.exit(0)
+    return args
+
+
+def download_options(args):
+    """把命令行参数转换为下载器的构造参数"""
+    return {
+        'cache_html': args.cache_html,
+        'workers': args.workers,
+        'parse_workers': args.parse_workers,
+        'pool_connections': args.pool_connections,
+        'pool_maxsize': args.pool_maxsize,
+        'dns_cache_ttl': args.dns_cache_ttl,
+        'retry_failed': args.retry_failed,
+        'library_index': args.library_index,
+        'refresh': args.refresh,
+        'extract_text': args.extract_text,
+        'expand_depth': args.expand_depth,
+        'expand_budget': args.expand_budget,
+        'toc': args.toc,
+        'low_memory': args.low_memory,
+        'max_inflight_pages': args.max_inflight_pages,
+        'max_inflight_downloads': args.max_inflight_downloads,
+        'status_file': args.status_file,
+        'dashboard_interval': args.dashboard_interval,
+        'trace': bool(args.trace or args.profile),
+        'plan_file': args.plan_file,
+        'mirrors': [m.strip() for m in args.mirrors.split(',') if m.strip()] if args.mirrors else None,
+        'mirror_race': args.mirror_race,
+        'mirror_urls': args.mirror_urls,
+        'mirror_rates': args.mirror_rates,
+        'unpaywall_email': args.unpaywall_email,
+        'breaker_threshold': args.breaker_threshold,
+        'breaker_cooldown': args.breaker_cooldown,
+        'settings': getattr(args, 'settings', None),
+        'bandwidth_limit': parse_rate(args.bandwidth_limit),
+        'connection_bandwidth_limit': parse_rate(args.connection_limit),
+        'transfer_window': args.transfer_window,
+        'sync': args.sync or args.sync_prune,
+        'sync_prune': args.sync_prune,
+    }
+
+
+def run_download(downloader, args):
+    """执行下载：按需只追踪一篇论文、在性能分析器中运行，结束后输出耗时追踪"""
+    if args.trace:
+        run = lambda: downloader.trace_title(args.trace)
+    else:
+        run = downloader.process_papers
+    try:
+        run_with_profiler(run, args.profile, output_prefix=os.path.splitext(args.trace_output)[0])
+    finally:
+        if downloader.tracer:
+            downloader.tracer.print_report()
+            downloader.tracer.write_chrome_trace(args.trace_output)
+        downloader.close()
 
 
 def main():
-    if len(sys.argv) != 2:
-        print("使用方法: python acm_paper_downloader_ultimate.py <excel_file_path>")
-        print("示例: python acm_paper_downloader_ultimate.py papers.xlsx")
+    commands = ('download', 'replay', 'coordinator', 'worker', 'serve', 'verify', 'lookup', 'extract', 'textsearch', 'plan')
+    parser = argparse.ArgumentParser(description="ACM论文下载器（终极版）")
+    subparsers = parser.add_subparsers(dest='command')
+    
+    download_parser = subparsers.add_parser('download', help="根据Excel文件搜索并下载论文（默认命令）")
+    add_download_arguments(download_parser)
+    
+    replay_parser = subparsers.add_parser('replay', help="对页面缓存离线重新运行提取逻辑")
+    replay_parser.add_argument("--cache-dir", default=os.path.join(".acm_cache", "html"),
+                               help="页面缓存目录")
+    replay_parser.add_argument("--output", help="把重放结果保存为JSON文件")
+    add_config_arguments(replay_parser)
+    
+    coordinator_parser = subparsers.add_parser('coordinator', help="把Excel中的标题写入共享队列并汇总结果")
+    coordinator_parser.add_argument("excel_file", help="包含Title列的Excel文件")
+    coordinator_parser.add_argument("--queue", required=True,
+                                    help="共享队列：SQLite文件路径，或 redis://host:port/db")
+    coordinator_parser.add_argument("--poll-interval", type=int, default=60, help="检查进度的间隔（秒）")
+    coordinator_parser.add_argument("--failed-output", default="failed_papers.xlsx",
+                                    help="失败论文导出的Excel文件")
+    coordinator_parser.add_argument("--max-attempts", type=int, default=3,
+                                    help="租约过期后最多重新分配的次数")
+    add_config_arguments(coordinator_parser)
+    
+    worker_parser = subparsers.add_parser('worker', help="从共享队列领取标题并下载")
+    worker_parser.add_argument("--queue", required=True,
+                               help="共享队列：SQLite文件路径，或 redis://host:port/db")
+    worker_parser.add_argument("--worker-id", help="工作者名称（默认为 主机名-进程号）")
+    worker_parser.add_argument("--lease-seconds", type=int, default=1800,
+                               help="租约时长（秒），应大于处理单篇论文的最长时间")
+    worker_parser.add_argument("--poll-interval", type=int, default=60, help="队列暂时为空时的等待间隔（秒）")
+    worker_parser.add_argument("--max-attempts", type=int, default=3,
+                               help="租约过期后最多重新分配的次数")
+    worker_parser.add_argument("--workers", type=int, default=1,
+                               help="本工作者中并发处理论文的线程数（每个线程各自领取租约）")
+    worker_parser.add_argument("--cache-html", action="store_true",
+                               help="压缩保存搜索页和详情页原始响应，供离线重放")
+    worker_parser.add_argument("--parse-workers", type=int, default=0,
+                               help="解析HTML的进程数（默认0，即在网络线程中解析）")
+    add_config_arguments(worker_parser)
+    
+    serve_parser = subparsers.add_parser('serve', help="常驻服务模式，通过监视目录或本地HTTP接口接收任务")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="HTTP接口监听地址")
+    serve_parser.add_argument("--port", type=int, default=8765, help="HTTP接口端口")
+    serve_parser.add_argument("--watch-dir", help="监视目录，放入.xlsx或.txt文件即提交任务")
+    serve_parser.add_argument("--poll-interval", type=int, default=5, help="扫描监视目录的间隔（秒）")
+    serve_parser.add_argument("--workers", type=int, default=1, help="处理论文的线程数")
+    serve_parser.add_argument("--cache-html", action="store_true",
+                              help="压缩保存搜索页和详情页原始响应，供离线重放")
+    serve_parser.add_argument("--parse-workers", type=int, default=0,
+                              help="解析HTML的进程数（默认0，即在网络线程中解析）")
+    add_config_arguments(serve_parser)
+    
+    verify_parser = subparsers.add_parser('verify', help="并行检查已下载PDF的完整性，损坏的文件加入重新下载队列")
+    verify_parser.add_argument("--dir", default="downloaded_papers", help="要检查的目录")
+    verify_parser.add_argument("--workers", type=int, default=None, help="检查进程数（默认为CPU核数）")
+    verify_parser.add_argument("--pages", action="store_true", help="统计页数（需要读取整个文件，较慢）")
+    verify_parser.add_argument("--no-quarantine", action="store_true",
+                               help="只报告问题，不移动文件、不加入重新下载队列")
+    verify_parser.add_argument("--index", default=os.path.join(".acm_cache", "library.db"),
+                               help="索引文件，被隔离的文件会从索引中移除")
+    
+    lookup_parser = subparsers.add_parser('lookup', help="在已下载论文的索引中查询（标题、作者、会议或DOI）")
+    lookup_parser.add_argument("query", help="查询内容，DOI形式（10.xxxx/...）时精确匹配")
+    lookup_parser.add_argument("--index", default=os.path.join(".acm_cache", "library.db"), help="索引文件")
+    lookup_parser.add_argument("--limit", type=int, default=20, help="最多显示多少条结果")
+    
+    extract_parser = subparsers.add_parser('extract', help="增量提取已下载PDF的全文，更新本地全文索引")
+    extract_parser.add_argument("--dir", default="downloaded_papers", help="PDF所在目录")
+    extract_parser.add_argument("--db", default=os.path.join(".acm_cache", "fulltext.db"), help="全文索引文件")
+    extract_parser.add_argument("--workers", type=int, default=None, help="提取进程数（默认为CPU核数）")
+    
+    textsearch_parser = subparsers.add_parser('textsearch', help="在已下载论文的全文中查询")
+    textsearch_parser.add_argument("query", help="查询内容")
+    textsearch_parser.add_argument("--db", default=os.path.join(".acm_cache", "fulltext.db"), help="全文索引文件")
+    textsearch_parser.add_argument("--limit", type=int, default=20, help="最多显示多少条结果")
+    
+    plan_parser = subparsers.add_parser('plan', help="试运行：不联网检查每篇论文的处理情况，估算成本并生成执行计划")
+    plan_parser.add_argument("excel_file", help="包含Title列的Excel文件")
+    plan_parser.add_argument("--output", default="acm_plan.json", help="执行计划文件")
+    plan_parser.add_argument("--workers", type=int, default=1, help="正式运行时的线程数（用于估算时间）")
+    plan_parser.add_argument("--library-index", default=None, help="已下载论文的索引文件")
+    plan_parser.add_argument("--retry-failed", action="store_true", help="正式运行时会使用 --retry-failed")
+    plan_parser.add_argument("--refresh", action="store_true", help="正式运行时会使用 --refresh")
+    # 按正式运行时的配置（等待时间）估算
+    add_config_arguments(plan_parser)
+    
+    # 兼容旧用法: python acm_paper_downloader_ultimate.py papers.xlsx
+    argv = sys.argv[1:]
+    if argv and argv[0] not in commands and argv[0] not in ('-h', '--help'):
+        argv = ['download'] + argv
+    args = parse_download_args(parser, argv, download_parser)
+    
+    if args.command == 'replay':
+        # 配置中补充的选择器同样用于重放，修改配置后可以直接离线验证
+        use_extra_selectors(args.settings['selectors'])
+        replay_html_cache(args.cache_dir, args.output)
+        return
+    
+    if args.command == 'coordinator':
+        if not os.path.exists(args.excel_file):
+            print(f"错误: 文件 '{args.excel_file}' 不存在")
+            sys.exit(1)
+        queue = open_work_queue(args.queue, max_attempts=args.max_attempts)
+        downloader = ACMPaperDownloaderUltimate(args.excel_file, settings=args.settings)
+        downloader.run_coordinator(queue, poll_interval=args.poll_interval, failed_output=args.failed_output)
+        downloader.close()
+        return
+    
+    if args.command == 'worker':
+        queue = open_work_queue(args.queue, max_attempts=args.max_attempts)
+        downloader = ACMPaperDownloaderUltimate(None, cache_html=args.cache_html, workers=args.workers,
+                                                parse_workers=args.parse_workers, settings=args.settings)
+        downloader.run_worker(queue, worker_id=args.worker_id, lease_seconds=args.lease_seconds,
+                              poll_interval=args.poll_interval)
+        return
+    
+    if args.command == 'verify':
+        results = verify_directory(
+            args.dir,
+            workers=args.workers,
+            count_pages=args.pages,
+            quarantine_dir=None if args.no_quarantine else os.path.join(args.dir, "quarantine"),
+            repair_queue_file=os.path.join(".acm_cache", "repair_queue.json"),
+            index=LibraryIndex(args.index) if os.path.exists(args.index) else None
+        )
+        # 被隔离的文件从索引中移除，下次运行时才会重新下载
+        if not args.no_quarantine and os.path.exists(args.index):
+            index = LibraryIndex(args.index)
+            for r in results:
+                if r['problem']:
+                    index.remove_file(r['path'])
+        return
+    
+    if args.command == 'lookup':
+        print_lookup(args.index, args.query, limit=args.limit)
+        return
+    
+    if args.command == 'plan':
+        if not os.path.exists(args.excel_file):
+            print(f"错误: 文件 '{args.excel_file}' 不存在")
+            sys.exit(1)
+        downloader = ACMPaperDownloaderUltimate(
+            args.excel_file, workers=args.workers, library_index=args.library_index,
+            retry_failed=args.retry_failed, refresh=args.refresh, dashboard_interval=0, settings=args.settings
+        )
+        titles = downloader.prepend_repair_queue(downloader.read_excel_file())
+        plan = build_plan(downloader, titles, input_path=args.excel_file,
+                          dois=dict(downloader.title_dois, **read_input_dois(args.excel_file)))
+        print_plan(plan)
+        write_plan(plan, args.output)
+        downloader.close()
+        return
+    
+    if args.command == 'extract':
+        update_fulltext_index(args.dir, args.db, workers=args.workers)
+        return
+    
+    if args.command == 'textsearch':
+        print_text_search(args.db, args.query, limit=args.limit)
+        return
+    
+    if args.command == 'serve':
+        # 信号量和连接池按服务的处理线程数设置，否则多个线程只能轮流占用一个页面/下载名额
+        downloader = ACMPaperDownloaderUltimate(None, cache_html=args.cache_html, workers=args.workers,
+                                                parse_workers=args.parse_workers, settings=args.settings)
+        run_service(downloader, host=args.host, port=args.port, watch_dir=args.watch_dir,
+                    workers=args.workers, poll_interval=args.poll_interval)
+        return
+    
+    if args.command != 'download':
+        parser.print_help()
+        print("\n示例: python acm_paper_downloader_ultimate.py papers.xlsx")
         sys.exit(1)
     
-    excel_file = sys.argv[1]
+    excel_file = args.excel_file
     
-    if not os.path.exists(excel_file):
-        print(f"错误: 文件 '{excel_file}' 不存在")
+    if not (args.toc or args.trace or args.plan_file) and (not excel_file or not os.path.exists(excel_file)):
+        print(f"错误: 文件 '{excel_file}' 不存在" if excel_file else "错误: 请提供Excel文件或 --toc 参数")
         sys.exit(1)
     
-    downloader = ACMPaperDownloaderUltimate(excel_file)
-    downloader.process_papers()
+    downloader = ACMPaperDownloaderUltimate(excel_file, **download_options(args))
+    run_download(downloader, args)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量检查已下载PDF的完整性
+
+多进程并行扫描下载目录，每个文件只通过内存映射读取开头和结尾各1KB：
+- 开头是否有 %PDF- 文件头（HTML页面伪装成PDF时这里是 <html 等）
+- 结尾是否有 %%EOF 和 startxref
+- startxref 指向的位置是否确实是 xref 表或交叉引用流对象
+可选统计页数（需要扫描整个文件，速度较慢）。
+
+有问题的文件移动到隔离目录，并写入重新下载队列（按索引库中登记的原始标题和DOI，
+不用净化后的文件名去搜索），下次运行时优先处理。
+"""
+
+import os
+import re
+import mmap
+import json
+import time
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+# 文件开头和结尾各检查多少字节
+CHECK_BYTES = 1024
+
+STARTXREF_PATTERN = re.compile(rb'startxref\s+(\d+)')
+XREF_OBJECT_PATTERN = re.compile(rb'\s*\d+\s+\d+\s+obj')
+PAGE_PATTERN = re.compile(rb'/Type\s*/Page(?![a-zA-Z])')
+
+
+def is_xref_start(chunk):
+    """判断一段字节是否是xref表或交叉引用流对象的开头"""
+    return chunk.lstrip().startswith(b'xref') or XREF_OBJECT_PATTERN.match(chunk) is not None
+
+
+def check_pdf(path, count_pages=False):
+    """检查单个PDF文件，返回检查结果（problem为None表示文件正常）"""
+    result = {'path': path, 'size': 0, 'problem': None, 'pages': None}
+    try:
+        size = os.path.getsize(path)
+        result['size'] = size
+        if size == 0:
+            result['problem'] = 'empty'
+            return result
+
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            head = data[:CHECK_BYTES]
+            tail = data[max(0, size - CHECK_BYTES):]
+
+            if b'%PDF-' not in head:
+                stripped = head.lstrip().lower()
+                if stripped.startswith((b'<!doctype html', b'<html', b'<?xml', b'<')):
+                    result['problem'] = 'html_not_pdf'
+                else:
+                    result['problem'] = 'missing_header'
+                return result
+
+            if b'%%EOF' not in tail:
+                result['problem'] = 'truncated'
+                return result
+
+            matches = STARTXREF_PATTERN.findall(tail)
+            if not matches:
+                result['problem'] = 'missing_startxref'
+                return result
+
+            # startxref 是相对 %PDF- 的偏移量，文件头前可能有少量多余字节，两种算法都检查
+            offset = int(matches[-1])
+            candidates = {offset, offset + head.find(b'%PDF-')}
+            if all(c >= size for c in candidates):
+                result['problem'] = 'bad_xref_offset'
+                return result
+            if not any(is_xref_start(data[c:c + 32]) for c in candidates if c < size):
+                result['problem'] = 'bad_xref'
+                return result
+
+            if count_pages:
+                result['pages'] = len(PAGE_PATTERN.findall(data))
+                if result['pages'] == 0:
+                    # 对象流压缩的PDF中页面对象不可见，无法据此判断，只记录为未知
+                    result['pages'] = None
+
+    except Exception as e:
+        result['problem'] = f'error: {e}'
+
+    return result
+
+
+def _check_pdf_with_pages(path):
+    return check_pdf(path, count_pages=True)
+
+
+def list_pdf_files(directory):
+    """列出目录中的所有PDF文件（不包含子目录）"""
+    with os.scandir(directory) as entries:
+        return [entry.path for entry in entries if entry.is_file() and entry.name.lower().endswith('.pdf')]
+
+
+def verify_directory(directory, workers=None, count_pages=False, quarantine_dir=None,
+                     repair_queue_file=None, index=None):
+    """并行检查目录中的所有PDF，有问题的文件移入隔离目录并加入重新下载队列
+
+    index为已下载论文的索引库（acm_library_index.LibraryIndex），用来查找文件对应的原始标题和DOI。
+    """
+    if not os.path.isdir(directory):
+        print(f"目录不存在: {directory}")
+        return []
+
+    paths = list_pdf_files(directory)
+    if not paths:
+        print(f"目录中没有PDF文件: {directory}")
+        return []
+
+    workers = workers or os.cpu_count() or 1
+    print(f"开始检查 {len(paths)} 个PDF文件（{workers} 个进程）...")
+    start_time = time.time()
+
+    func = _check_pdf_with_pages if count_pages else check_pdf
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(func, paths, chunksize=64))
+
+    bad = [r for r in results if r['problem']]
+    elapsed = time.time() - start_time
+    print(f"检查完成: {len(results)} 个文件, 正常 {len(results) - len(bad)} 个, "
+          f"有问题 {len(bad)} 个, 用时 {elapsed:.1f} 秒")
+
+    problems = {}
+    for r in bad:
+        problems[r['problem']] = problems.get(r['problem'], 0) + 1
+    for problem, count in sorted(problems.items(), key=lambda x: -x[1]):
+        print(f"- {problem}: {count} 个")
+
+    if count_pages:
+        pages = [r['pages'] for r in results if r['pages']]
+        if pages:
+            print(f"共 {sum(pages)} 页（{len(pages)} 个文件可统计页数）")
+
+    if bad and quarantine_dir:
+        quarantine_files(bad, quarantine_dir, repair_queue_file, index=index)
+
+    return results
+
+
+def repair_targets(path, index=None):
+    """文件对应的 [(原始标题, DOI)]：来自索引库，文件不在索引中时返回空列表"""
+    if index is None:
+        return []
+    targets = []
+    for title in index.titles_for_file(path):
+        entry = index.find_by_title(title)
+        targets.append((title, entry['doi'] if entry else None))
+    return targets
+
+
+def quarantine_files(bad_results, quarantine_dir, repair_queue_file=None, index=None):
+    """把有问题的文件移入隔离目录，并加入重新下载队列
+
+    队列的键为索引中登记的原始标题（带DOI时下次直接访问详情页）；文件不在索引中时只能用文件名，
+    这样的条目只和输入中的标题按文件名对应，不会单独拿去搜索。
+    """
+    os.makedirs(quarantine_dir, exist_ok=True)
+
+    queue = load_repair_queue(repair_queue_file) if repair_queue_file else {}
+    for r in bad_results:
+        name = os.path.basename(r['path'])
+        targets = repair_targets(r['path'], index)
+        try:
+            shutil.move(r['path'], os.path.join(quarantine_dir, name))
+        except Exception as e:
+            print(f"移动文件失败 {name}: {e}")
+            continue
+        record = {'file': name, 'problem': r['problem'], 'quarantined': time.strftime('%Y-%m-%d %H:%M:%S')}
+        for title, doi in targets:
+            queue[title] = dict(record, doi=doi, indexed=True)
+        if not targets:
+            queue[os.path.splitext(name)[0]] = dict(record, indexed=False)
+
+    print(f"已将 {len(bad_results)} 个有问题的文件移入: {quarantine_dir}")
+    if repair_queue_file:
+        save_repair_queue(repair_queue_file, queue)
+        print(f"重新下载队列: {repair_queue_file}（共 {len(queue)} 篇，下次运行时优先处理）")
+
+
+def load_repair_queue(path):
+    """读取重新下载队列：{标题（不在索引中的文件为文件名）: {file, problem, quarantined, doi, indexed}}"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"读取重新下载队列失败: {e}")
+        return {}
+
+
+def save_repair_queue(path, queue):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(queue, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+试运行（plan）：不发送任何网络请求，预先检查一批论文的处理情况并估算成本
+
+对每个标题离线完成：去重、已下载索引检查、下载目录中的文件检查、失败记录检查、
+是否可以按DOI直接访问，然后估算需要的请求数、下载量和运行时间，
+并写出执行计划文件。正式运行时用 --plan 读取计划，只处理需要联网的论文，不再重复这些检查。
+"""
+
+import os
+import json
+import time
+
+from acm_library_index import normalize_title
+from acm_progress import format_duration
+from acm_sync import read_input_table, doi_column, clean_doi
+
+PLAN_VERSION = 1
+
+# 每种处理方式的名义请求数：搜索页 + 详情页 + PDF，或 详情页 + PDF
+REQUESTS_PER_ACTION = {'search': 3, 'doi': 2}
+# 没有历史数据时使用的名义值
+NOMINAL_HTML_BYTES = 200 * 1024
+NOMINAL_PDF_BYTES = 2 * 1024 * 1024
+# 每种处理方式除了等待之外的网络时间（秒）
+NETWORK_SECONDS = {'search': 4, 'doi': 3}
+
+
+def nominal_seconds(waits):
+    """按配置中的等待时间范围（取平均值）估算每种处理方式的名义耗时"""
+    mean = lambda name: sum(waits[name]) / 2
+    return {
+        'search': mean('search_page_load') + mean('detail_page_load') + mean('politeness') + NETWORK_SECONDS['search'],
+        'doi': mean('detail_page_load') + mean('politeness') + NETWORK_SECONDS['doi'],
+    }
+
+
+def read_input_dois(path):
+    """输入表格中每个标题对应的DOI（和增量同步一样读取DOI列），没有DOI列或读取失败时返回空字典"""
+    try:
+        df = read_input_table(path)
+    except Exception:
+        return {}
+    column = doi_column(df)
+    if column is None or 'Title' not in df.columns:
+        return {}
+    dois = {}
+    for title, value in zip(df['Title'], df[column]):
+        doi = clean_doi(value)
+        if doi and isinstance(title, str) and title.strip():
+            dois.setdefault(title.strip(), doi)
+    return dois
+
+
+def classify_title(downloader, title, doi=None):
+    """离线判断一篇论文需要怎样处理，返回 (处理方式, 说明)；doi为表格中该行的DOI"""
+    if title.startswith('doi:'):
+        doi = title[4:]
+    if not downloader.refresh:
+        entry = None if title.startswith('doi:') else downloader.library_index.find_by_title(title)
+        if not (entry and entry['file']) and doi:
+            entry = downloader.library_index.find_by_doi(doi)
+        if entry and entry['file'] and os.path.exists(entry['file']):
+            return 'indexed', entry['file']
+
+        # 下载目录中已有文件但不在索引中（例如索引建立之前下载的）
+        path = os.path.join(downloader.output_dir, downloader.sanitize_filename(title))
+        if not title.startswith('doi:') and os.path.exists(path) and os.path.getsize(path) > 0:
+            return 'on_disk', path
+
+    cached_failure = downloader.negative_cache_hit(title)
+    if cached_failure:
+        return 'skip', f"{cached_failure['status']}，{cached_failure['retry_after']} 之前不重试"
+
+    if doi:
+        return 'doi', doi
+    return 'search', None
+
+
+def load_measured_rate(status_file):
+    """读取上次运行的进度统计，得到实际的每篇耗时（秒）"""
+    try:
+        with open(status_file, 'r', encoding='utf-8') as f:
+            status = json.load(f)
+    except Exception:
+        return None
+    # 完成篇数太少时实测值不可靠
+    if not status.get('titles_per_hour') or (status.get('done') or 0) < 20:
+        return None
+    return {'seconds_per_title': 3600 / status['titles_per_hour'], 'measured_at': status.get('updated')}
+
+
+def estimate_cost(counts, workers, waits, average_pdf_bytes=None, measured=None):
+    """估算请求数、下载量和运行时间"""
+    network_titles = counts.get('search', 0) + counts.get('doi', 0)
+    requests_count = sum(REQUESTS_PER_ACTION[a] * counts.get(a, 0) for a in REQUESTS_PER_ACTION)
+    html_pages = requests_count - network_titles
+    pdf_bytes = average_pdf_bytes or NOMINAL_PDF_BYTES
+    total_bytes = html_pages * NOMINAL_HTML_BYTES + network_titles * pdf_bytes
+
+    if measured:
+        # 实测值来自上次运行的实际吞吐量，已经包含了并发的效果
+        seconds = network_titles * measured['seconds_per_title']
+        source = f"上次运行的实测吞吐量（{measured['measured_at']}）"
+    else:
+        per_action = nominal_seconds(waits)
+        seconds = sum(per_action[a] * counts.get(a, 0) for a in per_action) / max(1, workers)
+        source = f"名义等待时间，{workers} 个线程"
+
+    return {
+        'network_titles': network_titles,
+        'requests': requests_count,
+        'bytes': int(total_bytes),
+        'average_pdf_bytes': int(pdf_bytes),
+        'seconds': round(seconds),
+        'source': source,
+    }
+
+
+def build_plan(downloader, titles, input_path=None, dois=None):
+    """对所有标题做离线检查，返回执行计划；dois为 {标题: DOI}（输入表格的DOI列）"""
+    dois = dois or {}
+    items = []
+    seen = set()
+    counts = {}
+    for title in titles:
+        key = normalize_title(title)
+        if key in seen:
+            action, detail = 'duplicate', None
+        else:
+            seen.add(key)
+            action, detail = classify_title(downloader, title, dois.get(title))
+        counts[action] = counts.get(action, 0) + 1
+        items.append({'title': title, 'action': action, 'detail': detail})
+
+    estimate = estimate_cost(
+        counts,
+        downloader.workers,
+        downloader.settings['waits'],
+        average_pdf_bytes=downloader.library_index.average_size(),
+        measured=load_measured_rate(downloader.progress.status_file)
+    )
+    return {
+        'version': PLAN_VERSION,
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'input': os.path.abspath(input_path) if input_path else None,
+        'input_mtime': os.path.getmtime(input_path) if input_path and os.path.exists(input_path) else None,
+        'counts': counts,
+        'estimate': estimate,
+        'items': items,
+    }
+
+
+def format_bytes(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def print_plan(plan):
+    labels = {
+        'search': '需要搜索',
+        'doi': '有DOI，直接访问详情页',
+        'indexed': '已下载（索引中有记录）',
+        'on_disk': '下载目录中已有文件（将登记到索引）',
+        'skip': '失败记录中，未到重试时间',
+        'duplicate': '重复的标题',
+    }
+    print(f"\n=== 执行计划: 共 {len(plan['items'])} 篇 ===")
+    for action, label in labels.items():
+        if plan['counts'].get(action):
+            print(f"- {label}: {plan['counts'][action]} 篇")
+
+    estimate = plan['estimate']
+    print(f"\n需要联网处理: {estimate['network_titles']} 篇")
+    print(f"预计请求数: 约 {estimate['requests']} 次（不含重试和备用搜索方法）")
+    print(f"预计下载量: 约 {format_bytes(estimate['bytes'])}（平均每篇PDF {format_bytes(estimate['average_pdf_bytes'])}）")
+    print(f"预计运行时间: 约 {format_duration(estimate['seconds'])}（按{estimate['source']}估算）")
+
+
+def write_plan(plan, path):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(plan, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+    print(f"\n执行计划已写入: {path}（正式运行: --plan {path}）")
+
+
+def load_plan(path):
+    """读取执行计划，输入文件在计划之后被修改过时给出提示"""
+    with open(path, 'r', encoding='utf-8') as f:
+        plan = json.load(f)
+    if plan.get('version') != PLAN_VERSION:
+        raise ValueError(f"不支持的执行计划版本: {plan.get('version')}")
+
+    input_path = plan.get('input')
+    if input_path and plan.get('input_mtime') and os.path.exists(input_path):
+        if os.path.getmtime(input_path) > plan['input_mtime']:
+            print(f"警告: 输入文件在生成计划之后被修改过，建议重新运行 plan: {input_path}")
+    print(f"使用执行计划: {path}（生成于 {plan['created']}）")
+    return plan
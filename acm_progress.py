@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下载进度统计：吞吐量、各阶段耗时分位数、请求速率、缓存命中率和预计完成时间
+
+预计完成时间来自最近完成的论文的实际间隔（滑动窗口），而不是按等待时间的名义范围估算，
+因此会随网络状况、缓存命中和失败跳过自动调整。
+
+统计结果定期写入JSON状态文件（供其他程序读取），终端中定期显示进度面板
+（安装 rich 时显示为表格: pip install rich）。
+"""
+
+import os
+import sys
+import math
+import json
+import time
+import threading
+from collections import deque
+
+try:
+    from rich.console import Console
+    from rich.table import Table
+    HAS_RICH = True
+except ImportError:
+    HAS_RICH = False
+
+# 每个阶段保留最近多少次耗时用于计算分位数
+STAGE_WINDOW = 500
+# 用最近多少篇论文的完成时间估算吞吐量
+THROUGHPUT_WINDOW = 50
+# 请求速率按最近多少秒计算
+REQUEST_RATE_WINDOW = 60
+# 合并相同请求的统计只单独显示，不计入总体缓存命中率（每次请求都会记录，会把命中率拉向它）
+UNCACHED_KINDS = ('single_flight',)
+
+
+def percentile(sorted_values, fraction):
+    """已排序数据的分位数（最近秩法）"""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return '-'
+    seconds = int(seconds)
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    if days:
+        return f"{days}天{hours}小时{minutes}分"
+    if hours:
+        return f"{hours}小时{minutes}分"
+    return f"{minutes}分{seconds}秒"
+
+
+class ProgressTracker:
+    """线程安全的进度统计"""
+
+    def __init__(self, status_file=None, interval=60):
+        self.status_file = status_file
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.reset()
+
+    def reset(self, total=None):
+        with self.lock:
+            self.total = total
+            self.started = time.time()
+            self.done = 0
+            self.statuses = {}
+            self.stages = {}
+            self.completions = deque(maxlen=THROUGHPUT_WINDOW)
+            self.requests = deque()
+            self.request_count = 0
+            self.cache = {}
+            self.current = {}
+
+    def record_stage(self, stage, seconds):
+        with self.lock:
+            self.stages.setdefault(stage, deque(maxlen=STAGE_WINDOW)).append(seconds)
+
+    def record_request(self):
+        now = time.time()
+        with self.lock:
+            self.request_count += 1
+            self.requests.append(now)
+            while self.requests and self.requests[0] < now - REQUEST_RATE_WINDOW:
+                self.requests.popleft()
+
+    def record_cache(self, kind, hit):
+        """记录一次缓存查询：kind为缓存类别，hit表示是否命中"""
+        with self.lock:
+            counts = self.cache.setdefault(kind, [0, 0])
+            counts[0 if hit else 1] += 1
+
+    def title_started(self, title):
+        with self.lock:
+            self.current[threading.get_ident()] = (title, time.time())
+
+    def title_finished(self, status):
+        now = time.time()
+        with self.lock:
+            self.current.pop(threading.get_ident(), None)
+            self.done += 1
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            self.completions.append(now)
+
+    def snapshot(self):
+        """当前统计结果（可直接序列化为JSON）"""
+        now = time.time()
+        with self.lock:
+            elapsed = now - self.started
+            # 吞吐量：最近若干篇的实际完成间隔；刚开始时用总体平均
+            if len(self.completions) >= 2 and self.completions[-1] > self.completions[0]:
+                rate = (len(self.completions) - 1) / (self.completions[-1] - self.completions[0])
+            else:
+                rate = self.done / elapsed if self.done and elapsed > 0 else None
+
+            # 引用扩展等会在运行中追加论文，完成数可能超过最初的总数
+            remaining = max(0, self.total - self.done) if self.total is not None else None
+            eta_seconds = remaining / rate if rate and remaining is not None else None
+
+            stages = {}
+            for stage, values in self.stages.items():
+                ordered = sorted(values)
+                stages[stage] = {
+                    'count': len(ordered),
+                    'p50': percentile(ordered, 0.5),
+                    'p90': percentile(ordered, 0.9),
+                    'p99': percentile(ordered, 0.99),
+                }
+
+            counted = [c for kind, c in self.cache.items() if kind not in UNCACHED_KINDS]
+            hits = sum(c[0] for c in counted)
+            lookups = hits + sum(c[1] for c in counted)
+            cache = {kind: {'hits': c[0], 'misses': c[1], 'ratio': c[0] / (c[0] + c[1]) if any(c) else None}
+                     for kind, c in self.cache.items()}
+
+            return {
+                'updated': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now)),
+                'started': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started)),
+                'elapsed_seconds': round(elapsed, 1),
+                'done': self.done,
+                'total': self.total,
+                'statuses': dict(self.statuses),
+                'titles_per_hour': round(rate * 3600, 1) if rate else None,
+                'eta_seconds': round(eta_seconds) if eta_seconds is not None else None,
+                'eta': time.strftime('%Y-%m-%d %H:%M', time.localtime(now + eta_seconds))
+                if eta_seconds is not None else None,
+                'requests_total': self.request_count,
+                'requests_per_minute': round(len(self.requests) * 60 / min(REQUEST_RATE_WINDOW, max(elapsed, 1)), 1),
+                'cache_hit_ratio': hits / lookups if lookups else None,
+                'cache': cache,
+                'stages': stages,
+                'in_progress': [{'title': title, 'seconds': round(now - since, 1)}
+                                for title, since in self.current.values()],
+            }
+
+    def write_status(self, snapshot=None):
+        if not self.status_file:
+            return
+        snapshot = snapshot or self.snapshot()
+        try:
+            os.makedirs(os.path.dirname(self.status_file) or '.', exist_ok=True)
+            tmp_path = self.status_file + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.status_file)
+        except Exception as e:
+            print(f"写入状态文件失败: {e}")
+
+    def render(self, snapshot):
+        """在终端中显示进度面板"""
+        total = snapshot['total'] if snapshot['total'] is not None else '?'
+        ratio = snapshot['cache_hit_ratio']
+        summary = [
+            ('进度', f"{snapshot['done']}/{total}"),
+            ('已运行', format_duration(snapshot['elapsed_seconds'])),
+            ('吞吐量', f"{snapshot['titles_per_hour'] or '-'} 篇/小时"),
+            ('请求速率', f"{snapshot['requests_per_minute']} 次/分钟"),
+            ('缓存命中率', f"{ratio * 100:.1f}%" if ratio is not None else '-'),
+            ('预计完成', f"{snapshot['eta'] or '-'}（剩余 {format_duration(snapshot['eta_seconds'])}）"),
+        ]
+        stage_rows = [(stage, str(s['count']), *(f"{s[p]:.1f}s" for p in ('p50', 'p90', 'p99')))
+                      for stage, s in sorted(snapshot['stages'].items())]
+
+        if HAS_RICH:
+            console = Console(stderr=True)
+            table = Table(title="下载进度", show_header=False)
+            for name, value in summary:
+                table.add_row(name, value)
+            console.print(table)
+            if stage_rows:
+                stages = Table(title="各阶段耗时")
+                for column in ('阶段', '次数', 'p50', 'p90', 'p99'):
+                    stages.add_column(column)
+                for row in stage_rows:
+                    stages.add_row(*row)
+                console.print(stages)
+            return
+
+        lines = ["", "=" * 20 + " 下载进度 " + "=" * 20]
+        lines += [f"{name}: {value}" for name, value in summary]
+        for stage, count, p50, p90, p99 in stage_rows:
+            lines.append(f"  {stage:<10} {count:>6} 次  p50 {p50:>8}  p90 {p90:>8}  p99 {p99:>8}")
+        lines.append("=" * 50)
+        print('\n'.join(lines), file=sys.stderr)
+
+    def report(self, show=True):
+        snapshot = self.snapshot()
+        self.write_status(snapshot)
+        if show:
+            self.render(snapshot)
+
+    def start(self, total=None, show=None):
+        """开始新一轮统计，并在后台定期写状态文件、显示进度面板"""
+        self.reset(total)
+        if show is None:
+            show = sys.stderr.isatty()
+        self.stop_event.clear()
+
+        def loop():
+            while not self.stop_event.wait(self.interval):
+                self.report(show)
+
+        if self.interval > 0:
+            self.thread = threading.Thread(target=loop, name="progress", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+            self.thread = None
+        self.write_status()
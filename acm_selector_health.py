@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+选择器命中统计：记录每类页面（搜索结果页、详情页）实际是哪个选择器找到的链接
+
+- 按命中次数调整尝试顺序，最常命中的选择器先试，大页面上不再逐个跑完前面那些不会命中的选择器
+- 宽泛的兜底选择器（如 a[href*="pdf"]）可能匹配到错误的链接，始终排在最后，不参与调整
+- 最近一段时间的命中分布和长期分布明显不同时（常用选择器命中率大幅下降、找不到链接的页面增多）
+  立即提示，通常说明网站改版了，可以在整批任务失败之前修复选择器
+
+统计结果保存在 .acm_cache/selector_health.json，跨运行累积。
+"""
+
+import os
+import json
+import threading
+from collections import deque
+
+# 长期统计的衰减系数：每记录一次，旧的计数乘以该系数（半衰期约700个页面）
+DECAY = 0.999
+# 最近多少个页面用于和长期分布比较
+RECENT_WINDOW = 50
+# 长期统计和最近窗口都至少有这么多页面时才调整顺序和比较
+MIN_SAMPLES = 20
+# 命中率变化超过多少（比例）时提示
+SHIFT_THRESHOLD = 0.3
+# 每记录多少次保存一次
+SAVE_EVERY = 20
+
+PAGE_LABELS = {'search': '搜索结果页', 'pdf': '详情页PDF链接'}
+
+
+class SelectorHealth:
+    """线程安全的选择器命中统计"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+        # {页面类型: {选择器或None(未找到): 衰减后的计数}}
+        self.scores = {}
+        self.recent = {}
+        self.alerted = set()
+        self.unsaved = 0
+        self.load()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"读取选择器统计失败: {e}")
+            return
+        for kind, entry in data.items():
+            self.scores[kind] = {None if k == '' else k: v for k, v in entry.get('scores', {}).items()}
+            self.recent[kind] = deque((None if k == '' else k for k in entry.get('recent', [])),
+                                      maxlen=RECENT_WINDOW)
+
+    def save(self):
+        if not self.path:
+            return
+        with self.lock:
+            data = {kind: {'scores': {k or '': round(v, 3) for k, v in scores.items()},
+                           'recent': [k or '' for k in self.recent.get(kind, [])]}
+                    for kind, scores in self.scores.items()}
+            self.unsaved = 0
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"保存选择器统计失败: {e}")
+
+    def order(self, kind, selectors, fallbacks=()):
+        """按长期命中次数排序的选择器列表；兜底选择器保持原来的顺序排在最后"""
+        with self.lock:
+            scores = dict(self.scores.get(kind, {}))
+        if sum(scores.values()) < MIN_SAMPLES:
+            return list(selectors)
+        specific = [s for s in selectors if s not in fallbacks]
+        # sorted是稳定排序，没有命中记录的选择器保持内置顺序
+        specific.sort(key=lambda s: -scores.get(s, 0.0))
+        return specific + [s for s in selectors if s in fallbacks]
+
+    def record(self, kind, selector):
+        """记录一个页面的结果：命中的选择器，或None表示页面上应该有链接但没有找到"""
+        with self.lock:
+            scores = self.scores.setdefault(kind, {})
+            for key in scores:
+                scores[key] *= DECAY
+            scores[selector] = scores.get(selector, 0.0) + 1
+            recent = self.recent.setdefault(kind, deque(maxlen=RECENT_WINDOW))
+            recent.append(selector)
+            alert = self.check_shift(kind)
+            self.unsaved += 1
+            should_save = self.unsaved >= SAVE_EVERY
+        if alert:
+            print(alert)
+        if should_save:
+            self.save()
+
+    def shares(self, kind):
+        """长期分布和最近窗口中各结果所占比例（调用方持有锁）"""
+        scores = self.scores.get(kind, {})
+        total = sum(scores.values())
+        recent = self.recent.get(kind, [])
+        long_term = {k: v / total for k, v in scores.items()} if total else {}
+        window = {}
+        for k in recent:
+            window[k] = window.get(k, 0) + 1 / len(recent)
+        return long_term, window, total, len(recent)
+
+    def check_shift(self, kind):
+        """最近的命中分布和长期分布差别过大时返回提示文字（每次变化只提示一次）"""
+        long_term, window, total, count = self.shares(kind)
+        if total < MIN_SAMPLES * 2 or count < MIN_SAMPLES:
+            return None
+
+        label = PAGE_LABELS.get(kind, kind)
+        dominant = max((k for k in long_term if k is not None), key=lambda k: long_term[k], default=None)
+        problems = []
+        if dominant and long_term[dominant] - window.get(dominant, 0) > SHIFT_THRESHOLD:
+            problems.append(f"最常用的选择器 '{dominant}' 命中率 "
+                            f"{long_term[dominant] * 100:.0f}% → {window.get(dominant, 0) * 100:.0f}%")
+        if window.get(None, 0) - long_term.get(None, 0) > SHIFT_THRESHOLD:
+            problems.append(f"找不到链接的页面 {long_term.get(None, 0) * 100:.0f}% → {window[None] * 100:.0f}%")
+
+        if not problems:
+            self.alerted.discard(kind)
+            return None
+        if kind in self.alerted:
+            return None
+        self.alerted.add(kind)
+        return (f"警告: {label}的选择器命中情况明显变化（最近 {count} 个页面）: " + "；".join(problems) +
+                "。网站页面结构可能改版了，请检查选择器（可在配置文件的 [selectors] 中补充）")
+
+    def print_summary(self):
+        """打印各类页面最近的命中分布"""
+        with self.lock:
+            for kind in sorted(self.recent):
+                _, window, _, count = self.shares(kind)
+                if not count:
+                    continue
+                parts = [f"'{k}' {v * 100:.0f}%" if k else f"未找到 {v * 100:.0f}%"
+                         for k, v in sorted(window.items(), key=lambda x: -x[1])]
+                print(f"选择器命中（{PAGE_LABELS.get(kind, kind)}，最近 {count} 个页面）: {', '.join(parts)}")
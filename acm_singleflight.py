@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+相同请求的合并（single-flight）与本次运行内的结果复用
+
+并发处理论文时，两行标题可能指向同一个DOI，多种搜索方法也可能生成同一个搜索地址（如短标题没有特殊字符时，
+方法1-3的地址完全相同）。按规范化后的地址：
+- 正在进行的相同请求只发送一次，其他线程等待并共享它的结果
+- 已经完成且结果确定的请求在本次运行中直接复用，不再发送
+
+只合并完整的处理结果（搜索结果链接、PDF链接和元数据、下载好的文件），不共享原始响应对象。
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, unquote
+
+# 指向同一个详情页的不同路径前缀
+DOI_PAGE_PREFIXES = ('/doi/abs/', '/doi/full/')
+
+
+def normalize_url(url):
+    """规范化地址：协议和主机名小写、去掉默认端口和片段、查询参数排序；ACM的DOI不区分大小写"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and (scheme, parts.port) not in (('http', 80), ('https', 443)):
+        host = f"{host}:{parts.port}"
+    path = unquote(parts.path) or '/'
+    if host.endswith('dl.acm.org') and path.lower().startswith('/doi/'):
+        path = path.lower()
+        for prefix in DOI_PAGE_PREFIXES:
+            if path.startswith(prefix):
+                path = '/doi/' + path[len(prefix):]
+    if len(path) > 1:
+        path = path.rstrip('/')
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ''))
+
+
+class InFlightCall:
+    """一个正在进行的请求，等待者在done上等待"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """按键合并并发的相同调用，并缓存确定的结果（线程安全）
+
+    ttl为缓存结果的有效期（秒，None表示整个运行期间有效），max_entries限制缓存的条目数，
+    常驻服务中也不会无限增长。
+    """
+
+    def __init__(self, ttl=None, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.memo = OrderedDict()
+        self.stats = {'calls': 0, 'coalesced': 0, 'memo_hits': 0}
+
+    def lookup(self, key):
+        """缓存中未过期的结果（调用方持有锁），没有时返回 (False, None)"""
+        entry = self.memo.get(key)
+        if entry is None:
+            return False, None
+        value, stored_at = entry
+        if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+            del self.memo[key]
+            return False, None
+        self.memo.move_to_end(key)
+        return True, value
+
+    def do(self, key, func, *args, memoize=None):
+        """执行func(*args)，返回 (结果, 来源)
+
+        来源为None表示本线程实际执行了调用，'coalesced'表示共享了其他线程正在进行的调用，
+        'memo'表示复用了之前的结果。memoize(结果)返回True时缓存该结果；func抛出的异常会传给所有等待者。
+        """
+        with self.lock:
+            found, value = self.lookup(key)
+            if found:
+                self.stats['memo_hits'] += 1
+                return value, 'memo'
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = InFlightCall()
+                self.stats['calls'] += 1
+            else:
+                self.stats['coalesced'] += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, 'coalesced'
+
+        try:
+            call.value = func(*args)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+                if call.error is None and memoize is not None and memoize(call.value):
+                    self.memo[key] = (call.value, time.monotonic())
+                    while self.max_entries and len(self.memo) > self.max_entries:
+                        self.memo.popitem(last=False)
+            call.done.set()
+        return call.value, None
+
+    def clear(self):
+        with self.lock:
+            self.memo.clear()
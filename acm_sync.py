@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量同步：对不断更新的论文表格，只处理新增或修改过的行
+
+每一行按所有列的内容计算指纹，和上次运行保存的状态比较：
+- 新增的行、内容变了的行（如修改了标题、优先级）、上次没有成功的行 → 本次处理
+- 内容没变且上次已经成功的行 → 不处理，也不查询索引
+- 表格中已经删除的行 → 列出来；加 --sync-prune 时删除对应的PDF文件和索引记录
+  （表格中其他行仍然用到的文件保留）
+
+有DOI列时按DOI识别每一行，否则按规范化的标题；同一个键出现多次时按出现顺序加序号，
+重复的行各自保存指纹，不会互相覆盖。
+状态按输入文件分别保存在 .acm_cache/sync/ 中，只加了几行时重新运行的耗时只和改动的行数有关。
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+
+import pandas as pd
+
+from acm_library_index import normalize_title
+
+# 这些状态表示该行已经处理完成，内容不变时不再处理
+# （deferred的PDF还没有下载，中断后下次同步时重新处理）
+DONE_STATUSES = ('downloaded', 'already_downloaded')
+
+
+def doi_column(df):
+    """表格中的DOI列名（不区分大小写），没有时返回None"""
+    for column in df.columns:
+        if str(column).strip().lower() == 'doi':
+            return column
+    return None
+
+
+def clean_doi(value):
+    """单元格中的DOI（可以是 https://doi.org/ 链接或带 doi: 前缀），不是DOI时返回None"""
+    if value is None or isinstance(value, float) and pd.isna(value):
+        return None
+    match = re.search(r'10\.\d{4,9}/\S+', str(value).strip())
+    return match.group(0).rstrip('.').lower() if match else None
+
+
+def row_keys(df):
+    """每一行的同步键：有DOI时为 doi:<DOI>，否则为规范化的标题；重复的键按出现顺序加 #序号"""
+    column = doi_column(df)
+    seen = {}
+    keys = []
+    for _, row in df.iterrows():
+        doi = clean_doi(row[column]) if column is not None else None
+        base = f"doi:{doi}" if doi else normalize_title(str(row['Title']))
+        occurrence = seen.get(base, 0)
+        seen[base] = occurrence + 1
+        keys.append(base if occurrence == 0 else f"{base}#{occurrence}")
+    return keys
+
+
+def read_input_table(path):
+    """把输入文件读成DataFrame（.xlsx/.csv/.txt，.txt每行一个标题）"""
+    if path.endswith('.txt'):
+        with open(path, 'r', encoding='utf-8') as f:
+            return pd.DataFrame({'Title': [line.strip() for line in f if line.strip()]})
+    if path.endswith('.csv'):
+        return pd.read_csv(path, encoding='utf-8-sig')
+    return pd.read_excel(path)
+
+
+def row_fingerprint(row):
+    """一行所有列内容的指纹（列按名称排序，空值统一处理）"""
+    parts = []
+    for column in sorted(row.index, key=str):
+        value = row[column]
+        if isinstance(value, float) and pd.isna(value) or value is None or value is pd.NaT:
+            value = ''
+        parts.append(f"{column}={value}")
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()[:16]
+
+
+def sync_state_path(cache_dir, input_path):
+    """每个输入文件一个状态文件，文件名包含绝对路径的哈希，同名文件不会互相覆盖"""
+    absolute = os.path.abspath(input_path)
+    digest = hashlib.sha1(absolute.encode('utf-8')).hexdigest()[:8]
+    stem = os.path.splitext(os.path.basename(absolute))[0]
+    return os.path.join(cache_dir, 'sync', f"{stem}-{digest}.json")
+
+
+class SyncState:
+    """一个输入文件的同步状态: {行键: {title, fingerprint, status, synced_at}}"""
+
+    def __init__(self, path, save_interval=30):
+        self.path = path
+        self.lock = threading.Lock()
+        self.rows = {}
+        # 逐行记录结果时最多每隔save_interval秒写一次文件，结束时由调用方save(force=True)
+        self.save_interval = save_interval
+        self.saved_at = time.monotonic()
+        self.dirty = False
+        # 本次安排处理的行: {行键: 指纹}，以及规范化标题到行键的对应（重复的标题对应多行）
+        self.pending = {}
+        self.pending_titles = {}
+        # 表格中当前所有行的标题，清理已删除的行时用来检查文件是否仍被引用
+        self.current_titles = set()
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.rows = json.load(f).get('rows', {})
+            except Exception as e:
+                print(f"读取同步状态失败，将作为首次同步处理: {e}")
+
+    def diff(self, df):
+        """比较表格和上次的状态，返回 (需要处理的行的DataFrame, 已删除的行, 统计)"""
+        df = df.dropna(subset=['Title']).reset_index(drop=True)
+        keys = row_keys(df)
+        fingerprints = df.apply(row_fingerprint, axis=1) if len(df) else pd.Series(dtype=str)
+
+        counts = {'new': 0, 'changed': 0, 'retry': 0, 'unchanged': 0}
+        selected = []
+        with self.lock:
+            self.current_titles = {str(title) for title in df['Title']}
+            for i, (key, fingerprint, title) in enumerate(zip(keys, fingerprints, df['Title'])):
+                previous = self.rows.get(key)
+                if previous is None:
+                    kind = 'new'
+                elif previous['fingerprint'] != fingerprint:
+                    kind = 'changed'
+                elif previous.get('status') not in DONE_STATUSES:
+                    kind = 'retry'
+                else:
+                    kind = 'unchanged'
+                counts[kind] += 1
+                if kind != 'unchanged':
+                    selected.append(i)
+                    self.pending[key] = fingerprint
+                    self.pending_titles.setdefault(normalize_title(str(title)), []).append(key)
+            current = set(keys)
+            removed = [dict(entry, key=key) for key, entry in self.rows.items() if key not in current]
+        return df.loc[selected], removed, counts
+
+    def record(self, title, status):
+        """记录本次处理的结果（只记录本次同步安排的行，同一标题的重复行一起记录）"""
+        with self.lock:
+            keys = self.pending_titles.get(normalize_title(title))
+            if not keys:
+                return
+            for key in keys:
+                self.rows[key] = {
+                    'title': title,
+                    'fingerprint': self.pending[key],
+                    'status': status,
+                    'synced_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                }
+            self.dirty = True
+        self.save()
+
+    def forget(self, entries):
+        with self.lock:
+            for entry in entries:
+                self.rows.pop(entry['key'], None)
+            self.dirty = True
+        self.save(force=True)
+
+    def save(self, force=False):
+        """有改动时写回文件；不是force时距上次写入不到save_interval秒则跳过"""
+        with self.lock:
+            now = time.monotonic()
+            if not self.dirty or not force and now - self.saved_at < self.save_interval:
+                return
+            self.dirty = False
+            self.saved_at = now
+            data = {'rows': self.rows}
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
+
+
+def print_sync_summary(counts, removed, prune=False, limit=20):
+    print(f"增量同步: 新增 {counts['new']} 行, 修改 {counts['changed']} 行, "
+          f"上次未成功 {counts['retry']} 行, 未变化 {counts['unchanged']} 行（跳过）")
+    if removed:
+        print(f"表格中已删除 {len(removed)} 行" + ("，将删除对应的PDF和索引记录:" if prune
+                                                  else "（使用 --sync-prune 删除对应的PDF和索引记录）:"))
+        for entry in removed[:limit]:
+            print(f"  - {entry['title']}（上次状态: {entry.get('status')}, {entry.get('synced_at')}）")
+        if len(removed) > limit:
+            print(f"  ... 共 {len(removed)} 行")
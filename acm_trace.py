@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+单篇论文的耗时追踪与性能分析
+
+SpanTracer 记录每篇论文处理过程中的调用树：搜索方法、每个HTTP请求、urllib3的自动重试和退避等待、
+主动等待以及HTML解析，结束后打印耗时树，并写出Chrome Trace格式的文件
+（可用 chrome://tracing、https://ui.perfetto.dev 或 https://www.speedscope.app 打开）。
+
+还可以把整个运行包在性能分析器中：
+- cprofile: 标准库cProfile，输出 .prof 文件并打印耗时最多的函数
+- sampling: 采样分析器 pyinstrument（pip install pyinstrument），输出speedscope格式文件
+"""
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from urllib3.util.retry import Retry
+
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import SpeedscopeRenderer
+    HAS_PYINSTRUMENT = True
+except ImportError:
+    HAS_PYINSTRUMENT = False
+
+# 当前启用的追踪器，供urllib3重试等无法直接传参的地方使用
+active_tracer = None
+
+# 最多保留多少个顶层区间（整批运行时每篇论文一个），更早的只计入汇总统计
+MAX_ROOTS = 2000
+# 被移出的顶层区间中，保留多少篇最慢的论文用于打印耗时树
+KEEP_SLOWEST = 3
+
+
+class SpanTracer:
+    """记录嵌套的耗时区间（span），每个线程各自维护调用栈"""
+
+    def __init__(self, max_roots=MAX_ROOTS):
+        self.origin = time.perf_counter()
+        self.wall_origin = time.time()
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.roots = []
+        # 整批运行时顶层区间不无限增长：超过max_roots后把最早完成的移出，计入evicted_totals
+        self.max_roots = max_roots
+        self.evicted_roots = 0
+        self.evicted_totals = {}
+        self.slowest_evicted = []
+
+    def activate(self):
+        global active_tracer
+        active_tracer = self
+        return self
+
+    def _stack(self):
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+        return self.local.stack
+
+    def _attach(self, record, stack):
+        if stack:
+            stack[-1]['children'].append(record)
+        else:
+            with self.lock:
+                self.roots.append(record)
+                if self.max_roots and len(self.roots) > self.max_roots:
+                    self._evict()
+
+    def _evict(self):
+        """把最早完成的顶层区间移出（调用方持有锁），汇总其耗时，并保留最慢的几篇论文"""
+        finished = [r for r in self.roots if r['end'] is not None]
+        for record in finished[:len(self.roots) - self.max_roots]:
+            self.roots.remove(record)
+            self.evicted_roots += 1
+            self._add_totals(self.evicted_totals, record)
+            if record['name'] == 'title':
+                self.slowest_evicted.append(record)
+                self.slowest_evicted.sort(key=lambda r: r['start'] - r['end'])
+                del self.slowest_evicted[KEEP_SLOWEST:]
+
+    def _add_totals(self, totals, root):
+        for record, _ in self.walk([root]):
+            entry = totals.setdefault(record['name'], [0, 0.0, 0.0])
+            entry[0] += 1
+            if record.get('instant'):
+                continue
+            seconds = (record['end'] or time.perf_counter()) - record['start']
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    @contextmanager
+    def span(self, name, **args):
+        """记录一个区间，产出的字典可以在区间内补充参数（如响应状态码）"""
+        stack = self._stack()
+        record = {'name': name, 'args': args, 'start': time.perf_counter(), 'end': None,
+                  'tid': threading.get_ident(), 'thread': threading.current_thread().name, 'children': []}
+        self._attach(record, stack)
+        stack.append(record)
+        try:
+            yield record['args']
+        finally:
+            record['end'] = time.perf_counter()
+            stack.pop()
+
+    def instant(self, name, **args):
+        """记录一个瞬时事件（如一次重试）"""
+        now = time.perf_counter()
+        record = {'name': name, 'args': args, 'start': now, 'end': now, 'instant': True,
+                  'tid': threading.get_ident(), 'thread': threading.current_thread().name, 'children': []}
+        self._attach(record, self._stack())
+
+    def walk(self, records=None, depth=0):
+        for record in self.roots if records is None else records:
+            yield record, depth
+            yield from self.walk(record['children'], depth + 1)
+
+    def chrome_events(self):
+        """转换为Chrome Trace事件列表（时间单位为微秒）"""
+        pid = os.getpid()
+        events = []
+        threads = {}
+        for record, _ in self.walk():
+            threads[record['tid']] = record['thread']
+            end = record['end'] if record['end'] is not None else time.perf_counter()
+            args = {k: v if isinstance(v, (int, float, str, bool, type(None))) else str(v)
+                    for k, v in record['args'].items()}
+            event = {'name': record['name'], 'cat': 'acm', 'pid': pid, 'tid': record['tid'],
+                     'ts': round((record['start'] - self.origin) * 1e6), 'args': args}
+            if record.get('instant'):
+                event.update(ph='i', s='t')
+            else:
+                event.update(ph='X', dur=round((end - record['start']) * 1e6))
+            events.append(event)
+        for tid, name in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}})
+        return events
+
+    def write_chrome_trace(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': self.chrome_events(), 'displayTimeUnit': 'ms',
+                       'otherData': {'started': time.strftime('%Y-%m-%d %H:%M:%S',
+                                                              time.localtime(self.wall_origin))}},
+                      f, ensure_ascii=False)
+        print(f"已写入追踪文件: {path}（可用 https://ui.perfetto.dev 或 https://www.speedscope.app 打开）")
+
+    def print_tree(self, records=None, min_seconds=0.0):
+        """打印耗时树，短于min_seconds的区间省略"""
+        for record, depth in self.walk(records):
+            if record.get('instant'):
+                label = f"* {record['name']}"
+                duration = ''
+            else:
+                seconds = (record['end'] or time.perf_counter()) - record['start']
+                if seconds < min_seconds and depth > 0:
+                    continue
+                label = record['name']
+                duration = f"{seconds:8.3f}s  "
+            args = ' '.join(f"{k}={v}" for k, v in record['args'].items() if v is not None)
+            print(f"{duration:>12}{'  ' * depth}{label} {args}".rstrip())
+
+    def summary(self):
+        """按区间名称汇总：次数、总耗时、最长耗时（包括已移出的顶层区间）"""
+        with self.lock:
+            totals = {name: list(entry) for name, entry in self.evicted_totals.items()}
+            roots = list(self.roots)
+        for root in roots:
+            self._add_totals(totals, root)
+        return totals
+
+    def print_report(self, tree_limit=3):
+        """打印各类区间的汇总，以及最慢的几篇论文的耗时树"""
+        print("\n=== 耗时追踪 ===")
+        print(f"{'区间':<16}{'次数':>8}{'总耗时':>12}{'最长':>12}")
+        for name, (count, total, longest) in sorted(self.summary().items(), key=lambda x: -x[1][1]):
+            print(f"{name:<16}{count:>8}{total:>11.2f}s{longest:>11.2f}s")
+
+        titles = [r for r in self.roots if r['name'] == 'title' and r['end'] is not None] + self.slowest_evicted
+        slowest = sorted(titles, key=lambda r: r['start'] - r['end'])[:tree_limit]
+        if self.evicted_roots:
+            print(f"\n（较早的 {self.evicted_roots} 个顶层区间只计入上面的汇总，不在追踪文件中）")
+        for record in slowest:
+            print()
+            self.print_tree([record], min_seconds=0.001 if len(titles) == 1 else 0.05)
+
+
+class TracedRetry(Retry):
+    """把urllib3的自动重试和退避等待记录到追踪器中"""
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        # urllib3按位置传入method和url，这里按Retry.increment的签名接收
+        if active_tracer is not None:
+            active_tracer.instant('retry', url=url,
+                                  status=getattr(response, 'status', None),
+                                  error=repr(error) if error else None)
+        return super().increment(method, url, response=response, error=error,
+                                 _pool=_pool, _stacktrace=_stacktrace)
+
+    def sleep(self, response=None):
+        if active_tracer is None:
+            return super().sleep(response)
+        with active_tracer.span('retry_backoff', backoff=self.get_backoff_time()):
+            return super().sleep(response)
+
+
+def run_with_profiler(func, profiler=None, output_prefix="acm_profile"):
+    """在性能分析器中运行func；profiler为None时直接运行"""
+    if profiler is None:
+        return func()
+
+    if profiler == 'sampling':
+        if not HAS_PYINSTRUMENT:
+            print("采样分析需要安装 pyinstrument: pip install pyinstrument，改用 cProfile")
+            profiler = 'cprofile'
+        else:
+            sampler = Profiler(interval=0.001)
+            sampler.start()
+            try:
+                return func()
+            finally:
+                sampler.stop()
+                path = output_prefix + '.speedscope.json'
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(sampler.output(renderer=SpeedscopeRenderer()))
+                print(f"已写入采样分析结果: {path}（用 https://www.speedscope.app 打开）")
+
+    import cProfile
+    import pstats
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        return func()
+    finally:
+        profile.disable()
+        path = output_prefix + '.prof'
+        profile.dump_stats(path)
+        print(f"\n已写入cProfile结果: {path}（可用 snakeviz 或 python -m pstats 查看）")
+        pstats.Stats(profile).sort_stats('cumulative').print_stats(25)
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分布式工作队列：让多台机器共同处理同一批论文标题
+
+协调者(coordinator)把标题写入队列，各台机器上的工作者(worker)以租约方式领取标题，
+处理完后把结果写回队列。工作者中途退出时，租约到期后标题会被重新分配给其他工作者。
+
+支持两种存储:
+- SQLite文件（默认，无需额外依赖）：放在共享目录中即可被多台机器使用，
+  注意共享目录必须支持文件锁（部分NFS/SMB配置不支持）
+- Redis（可选）：队列参数以 redis:// 开头时使用，需要 pip install redis
+"""
+
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+try:
+    import redis
+    HAS_REDIS = True
+except ImportError:
+    HAS_REDIS = False
+
+
+class SQLiteWorkQueue:
+    """基于SQLite文件的工作队列"""
+
+    def __init__(self, path, max_attempts=3):
+        self.path = path
+        self.max_attempts = max_attempts
+        # isolation_level=None: 由transaction()手动控制事务
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        # 同一个工作者的多个线程共用这个连接，事务和查询需要串行
+        self.lock = threading.RLock()
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT UNIQUE NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                status TEXT,
+                worker TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_expires REAL,
+                updated_at REAL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_state ON tasks(state, id)")
+
+    @contextmanager
+    def transaction(self):
+        """写事务：BEGIN IMMEDIATE保证同一时间只有一个工作者在领取任务"""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, titles):
+        """按顺序添加标题，已在队列中的标题会被忽略，返回新增数量"""
+        now = time.time()
+        with self.transaction() as conn:
+            before = conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+            conn.executemany(
+                "INSERT OR IGNORE INTO tasks (title, updated_at) VALUES (?, ?)",
+                [(title, now) for title in titles]
+            )
+            after = conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+        return after - before
+
+    def _reclaim(self, conn, now):
+        """回收过期租约：次数未用完的放回队列，用完的标记为失败"""
+        expired = conn.execute(
+            "UPDATE tasks SET state = 'done', status = 'lease_expired', lease_expires = NULL, updated_at = ? "
+            "WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?",
+            (now, now, self.max_attempts)
+        ).rowcount
+        reclaimed = conn.execute(
+            "UPDATE tasks SET state = 'pending', worker = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE state = 'leased' AND lease_expires < ?",
+            (now, now)
+        ).rowcount
+        return reclaimed + expired
+
+    def reclaim_expired(self):
+        """回收已经过期的租约，返回回收数量"""
+        with self.transaction() as conn:
+            return self._reclaim(conn, time.time())
+
+    def lease(self, worker_id, lease_seconds):
+        """领取一个待处理标题，没有可领取的标题时返回None"""
+        now = time.time()
+        with self.transaction() as conn:
+            self._reclaim(conn, now)
+            row = conn.execute(
+                "SELECT id, title FROM tasks WHERE state = 'pending' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE tasks SET state = 'leased', worker = ?, attempts = attempts + 1, "
+                "lease_expires = ?, updated_at = ? WHERE id = ?",
+                (worker_id, now + lease_seconds, now, row[0])
+            )
+            return row[1]
+
+    def complete(self, title, worker_id, status):
+        """汇报处理结果；租约已转给其他工作者时返回False"""
+        with self.transaction() as conn:
+            updated = conn.execute(
+                "UPDATE tasks SET state = 'done', status = ?, worker = ?, lease_expires = NULL, updated_at = ? "
+                "WHERE title = ? AND state != 'done' AND (worker = ? OR worker IS NULL)",
+                (status, worker_id, time.time(), title, worker_id)
+            ).rowcount
+        return updated > 0
+
+    def stats(self):
+        """各状态的任务数量"""
+        counts = {'pending': 0, 'leased': 0, 'done': 0}
+        with self.lock:
+            rows = self.conn.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state").fetchall()
+        for state, count in rows:
+            counts[state] = count
+        counts['total'] = sum(counts.values())
+        return counts
+
+    def results(self):
+        """所有已完成任务的结果"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT title, status, worker, attempts FROM tasks WHERE state = 'done' ORDER BY id"
+            ).fetchall()
+        return [{'title': r[0], 'status': r[1], 'worker': r[2], 'attempts': r[3]} for r in rows]
+
+
+# 回收过期租约的Lua脚本片段，领取和回收共用
+# KEYS: pending, leases, owners, attempts, results  ARGV[1]: 当前时间  ARGV[2]: 最大尝试次数
+_REDIS_RECLAIM = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+for _, t in ipairs(expired) do
+    local owner = redis.call('HGET', KEYS[3], t)
+    redis.call('ZREM', KEYS[2], t)
+    redis.call('HDEL', KEYS[3], t)
+    if tonumber(redis.call('HGET', KEYS[4], t) or '0') >= tonumber(ARGV[2]) then
+        redis.call('HSET', KEYS[5], t, cjson.encode({status='lease_expired', worker=owner}))
+    else
+        redis.call('LPUSH', KEYS[1], t)
+    end
+end
+"""
+
+_REDIS_LEASE = _REDIS_RECLAIM + """
+local title = redis.call('LPOP', KEYS[1])
+if not title then return false end
+redis.call('ZADD', KEYS[2], ARGV[3], title)
+redis.call('HSET', KEYS[3], title, ARGV[4])
+redis.call('HINCRBY', KEYS[4], title, 1)
+return title
+"""
+
+# ARGV[1]: 标题  ARGV[2]: 工作者  ARGV[3]: 结果JSON
+_REDIS_COMPLETE = """
+if redis.call('HEXISTS', KEYS[5], ARGV[1]) == 1 then return 0 end
+local owner = redis.call('HGET', KEYS[3], ARGV[1])
+if owner and owner ~= ARGV[2] then return 0 end
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('HDEL', KEYS[3], ARGV[1])
+redis.call('LREM', KEYS[1], 0, ARGV[1])
+redis.call('HSET', KEYS[5], ARGV[1], ARGV[3])
+return 1
+"""
+
+
+class RedisWorkQueue:
+    """基于Redis（或兼容Redis协议的存储）的工作队列，接口与SQLiteWorkQueue相同"""
+
+    def __init__(self, url, prefix="acm_queue", max_attempts=3):
+        if not HAS_REDIS:
+            raise RuntimeError("使用Redis队列需要安装 redis: pip install redis")
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.max_attempts = max_attempts
+        self.all_key = f"{prefix}:all"
+        self.keys = [f"{prefix}:{name}" for name in ('pending', 'leases', 'owners', 'attempts', 'results')]
+        self._lease = self.client.register_script(_REDIS_LEASE)
+        self._reclaim = self.client.register_script(_REDIS_RECLAIM + "\nreturn #expired")
+        self._complete = self.client.register_script(_REDIS_COMPLETE)
+
+    def enqueue(self, titles):
+        """按顺序添加标题，已在队列中的标题会被忽略，返回新增数量"""
+        added = 0
+        for title in titles:
+            if self.client.sadd(self.all_key, title):
+                self.client.rpush(self.keys[0], title)
+                added += 1
+        return added
+
+    def reclaim_expired(self):
+        """回收已经过期的租约，返回回收数量"""
+        return self._reclaim(keys=self.keys, args=[time.time(), self.max_attempts])
+
+    def lease(self, worker_id, lease_seconds):
+        """领取一个待处理标题，没有可领取的标题时返回None"""
+        now = time.time()
+        return self._lease(keys=self.keys, args=[now, self.max_attempts, now + lease_seconds, worker_id])
+
+    def complete(self, title, worker_id, status):
+        """汇报处理结果；租约已转给其他工作者时返回False"""
+        result = json.dumps({'status': status, 'worker': worker_id}, ensure_ascii=False)
+        return bool(self._complete(keys=self.keys, args=[title, worker_id, result]))
+
+    def stats(self):
+        """各状态的任务数量"""
+        counts = {
+            'pending': self.client.llen(self.keys[0]),
+            'leased': self.client.zcard(self.keys[1]),
+            'done': self.client.hlen(self.keys[4]),
+        }
+        counts['total'] = self.client.scard(self.all_key)
+        return counts
+
+    def results(self):
+        """所有已完成任务的结果"""
+        attempts = self.client.hgetall(self.keys[3])
+        results = []
+        for title, value in self.client.hgetall(self.keys[4]).items():
+            record = json.loads(value)
+            results.append({'title': title, 'status': record.get('status'), 'worker': record.get('worker'),
+                            'attempts': int(attempts.get(title, 0))})
+        return results
+
+
+def open_work_queue(spec, max_attempts=3):
+    """根据参数打开工作队列：redis://开头使用Redis，否则视为SQLite文件路径"""
+    if spec.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisWorkQueue(spec, max_attempts=max_attempts)
+    return SQLiteWorkQueue(spec, max_attempts=max_attempts)
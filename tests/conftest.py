@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_pdf(padding=0):
+    """最小的结构完整的PDF（startxref指向xref表），padding为填充的注释字节数"""
+    header = b'%PDF-1.4\n' + (b'%' + b'x' * padding + b'\n' if padding else b'')
+    obj = b'1 0 obj\n<< /Type /Catalog >>\nendobj\n'
+    xref_offset = len(header) + len(obj)
+    xref = b'xref\n0 2\n0000000000 65535 f \n%010d 00000 n \n' % len(header)
+    trailer = b'trailer\n<< /Size 2 /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % xref_offset
+    return header + obj + xref + trailer
+
+
+class StubServer:
+    """本地HTTP桩服务：routes为 {路径: (延迟秒数, Content-Type, 内容[, 状态码])}，hits记录每个路径的请求次数"""
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.hits = {}
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                path = self.path.split('?')[0]
+                with stub.lock:
+                    stub.hits[path] = stub.hits.get(path, 0) + 1
+                if path not in stub.routes:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                delay, content_type, body, *status = stub.routes[path]
+                time.sleep(delay)
+                self.send_response(status[0] if status else 200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server.server_address[1]}{path}"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    servers = []
+
+    def start(routes):
+        server = StubServer(routes)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
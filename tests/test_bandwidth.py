@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+from acm_bandwidth import ByteBucket, TransferWindow, parse_rate
+
+
+def at(hour, minute=0):
+    """今天本地时间 hour:minute 的时间戳"""
+    return time.mktime(time.localtime()[:3] + (hour, minute, 0, 0, 0, -1))
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('500K', 500 * 1024),
+    ('2M', 2 * 1024 ** 2),
+    ('1.5MB/s', 1.5 * 1024 ** 2),
+    (' 300 kb ', 300 * 1024),
+    ('.5G', 0.5 * 1024 ** 3),
+    ('4096', 4096),
+    (None, None),
+])
+def test_parse_rate(text, expected):
+    assert parse_rate(text) == expected
+
+
+@pytest.mark.parametrize('text', ['', 'fast', '1.2.3M', '.', '5T', '-1M'])
+def test_parse_rate_rejects_garbage(text):
+    with pytest.raises(ValueError):
+        parse_rate(text)
+
+
+@pytest.mark.parametrize('spec', ['24:00-07:00', '22:00-24:30', '25:00-07:00', '22:60-07:00', '22-07', '22:00'])
+def test_transfer_window_rejects_invalid_times(spec):
+    with pytest.raises(ValueError):
+        TransferWindow(spec)
+
+
+def test_transfer_window_across_midnight():
+    window = TransferWindow('22:00-07:00, 12:00-13:30')
+    assert window.is_open(at(23, 30)) and window.is_open(at(6, 59)) and window.is_open(at(12, 0))
+    assert not window.is_open(at(7, 0)) and not window.is_open(at(13, 30))
+    assert window.seconds_until_open(at(23)) == 0
+    assert window.seconds_until_open(at(21)) == 3600
+    assert window.seconds_until_open(at(10)) == 2 * 3600
+
+
+def test_transfer_window_until_end_of_day():
+    window = TransferWindow('20:00-24:00')
+    assert window.is_open(at(23, 59))
+    assert not window.is_open(at(0, 0))
+    assert window.seconds_until_open(at(0, 0)) == 20 * 3600
+
+
+def test_byte_bucket_waits_for_debt(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(time, 'sleep', sleeps.append)
+    bucket = ByteBucket(1000)
+    assert bucket.consume(1000) == 0
+    waited = bucket.consume(500)
+    assert waited == pytest.approx(0.5, abs=0.01)
+    assert sleeps == [waited]
@@ -0,0 +1,104 @@
+import pytest
+
+import acm_circuit
+from acm_circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreakers, CircuitOpenError, endpoint_for
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(acm_circuit.time, 'monotonic', clock)
+    return clock
+
+
+@pytest.fixture
+def breakers(clock):
+    return CircuitBreakers(threshold=3, cooldown=60, max_cooldown=200)
+
+
+def test_opens_after_consecutive_failures(breakers):
+    search = breakers['search']
+    for _ in range(2):
+        search.record_failure('HTTP 429')
+    search.record_success()
+    for _ in range(2):
+        search.record_failure('HTTP 429')
+    assert search.state == CLOSED
+    search.record_failure('HTTP 429')
+    assert search.state == OPEN and search.trips == 1
+    assert search.blocked() and not search.allow()
+    with pytest.raises(CircuitOpenError):
+        breakers.before_request('https://dl.acm.org/search/advanced')
+
+
+def test_single_probe_after_cooldown_and_backoff(breakers, clock):
+    detail = breakers['detail']
+    for _ in range(3):
+        detail.record_failure('HTTP 403')
+    clock.now += 59
+    assert not detail.allow()
+    clock.now += 1
+    assert detail.allow() and detail.state == HALF_OPEN
+    # 探测进行中，其他请求仍被拒绝
+    assert not detail.allow() and detail.blocked()
+
+    detail.record_failure('HTTP 403')
+    assert detail.state == OPEN and detail.cooldown == 120
+    assert detail.seconds_until_probe() == 120
+    clock.now += 120
+    assert detail.allow()
+    detail.record_failure('HTTP 403')
+    assert detail.cooldown == 200
+    # 探测失败不算新的熔断次数
+    assert detail.trips == 1
+
+    clock.now += 200
+    assert detail.allow()
+    detail.record_success()
+    assert detail.state == CLOSED and detail.cooldown == 60 and detail.failures == 0
+    assert not detail.blocked()
+
+
+def test_after_response_classification(breakers):
+    pdf = breakers['pdf']
+    for _ in range(5):
+        breakers.after_response(pdf, 403)
+    assert pdf.state == CLOSED
+
+    search = breakers['search']
+    breakers.after_response(search, 403)
+    breakers.after_response(search, 503)
+    breakers.after_response(search, error=ConnectionError())
+    assert search.state == OPEN
+    breakers.after_response(None, 500)
+
+
+def test_seconds_until_any_and_all_blocked(breakers, clock):
+    for name in ('search', 'doSearch'):
+        for _ in range(3):
+            breakers[name].record_failure()
+        clock.now += 10
+    assert breakers.all_blocked(('search', 'doSearch'))
+    assert not breakers.all_blocked(('search', 'detail'))
+    assert breakers.seconds_until_any(('search', 'doSearch')) == 40
+
+
+@pytest.mark.parametrize('url, endpoint', [
+    ('https://dl.acm.org/action/doSearch?AllField=x', 'doSearch'),
+    ('https://dl.acm.org/search/advanced', 'search'),
+    ('https://dl.acm.org/doi/pdf/10.1145/1', 'pdf'),
+    ('https://dl.acm.org/doi/epdf/10.1145/1', 'pdf'),
+    ('https://dl.acm.org/doi/10.1145/1', 'detail'),
+    ('https://dl.acm.org/', None),
+    ('https://arxiv.org/pdf/1.pdf', None),
+])
+def test_endpoint_for(url, endpoint):
+    assert endpoint_for(url) == endpoint
@@ -0,0 +1,66 @@
+from bs4 import BeautifulSoup
+
+import acm_paper_downloader_ultimate as ultimate
+from acm_paper_downloader_ultimate import find_references
+
+
+def test_find_references_dedups_and_skips_own_doi():
+    soup = BeautifulSoup('''
+        <div class="header"><a href="/doi/10.1145/9999">Not a reference</a></div>
+        <ol class="references__list">
+          <li><a href="https://doi.org/10.1145/1111">Link</a> See also doi:10.1145/2222.</li>
+          <li><a href="/doi/10.1145%2F1111">Same paper</a></li>
+          <li>Cites itself 10.1145/0000</li>
+        </ol>''', 'html.parser')
+    assert find_references(soup, own_doi='10.1145/0000') == ['10.1145/1111', '10.1145/2222']
+
+
+REFERENCES = {
+    'Seed Paper': ['10.1/a', '10.1/b'],
+    'doi:10.1/a': ['10.1/c', '10.1/b'],
+    'doi:10.1/b': ['10.1/a', '10.1/d'],
+    'doi:10.1/c': ['10.1/e'],
+    'doi:10.1/d': [],
+}
+
+
+def make_downloader(server, expand_depth, expand_budget):
+    downloader = ultimate.ACMPaperDownloaderUltimate(
+        None, dns_cache_ttl=0, dashboard_interval=0, expand_depth=expand_depth, expand_budget=expand_budget)
+    downloader.paper_references['Seed Paper'] = REFERENCES['Seed Paper']
+    handled = []
+
+    def handle_title(index, total, title, wait_after=True, paper_url=None):
+        # 每篇论文一次ACM详情页请求和一次镜像源请求，只有前者计入预算
+        downloader.http_get(server.url('/detail')).close()
+        downloader.mirror_get(server.url('/mirror')).close()
+        downloader.paper_references[title] = REFERENCES[title]
+        handled.append(title)
+        return 'downloaded'
+
+    downloader.handle_title = handle_title
+    return downloader, handled
+
+
+def test_expand_citations_depth_and_dedup(stub_server, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    server = stub_server({'/detail': (0, 'text/html', b'ok'), '/mirror': (0, 'text/html', b'ok')})
+    downloader, handled = make_downloader(server, expand_depth=2, expand_budget=100)
+    try:
+        assert downloader.expand_citations(['Seed Paper']) == 4
+    finally:
+        downloader.close()
+    # 第1层 a、b，第2层 c、d（a、b互相引用不重复处理），第3层的 e 超出深度
+    assert handled == ['doi:10.1/a', 'doi:10.1/b', 'doi:10.1/c', 'doi:10.1/d']
+
+
+def test_expand_citations_stops_at_request_budget(stub_server, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    server = stub_server({'/detail': (0, 'text/html', b'ok'), '/mirror': (0, 'text/html', b'ok')})
+    downloader, handled = make_downloader(server, expand_depth=2, expand_budget=2)
+    try:
+        assert downloader.expand_citations(['Seed Paper']) == 2
+    finally:
+        downloader.close()
+    assert handled == ['doi:10.1/a', 'doi:10.1/b']
+    assert server.hits == {'/detail': 2, '/mirror': 2}
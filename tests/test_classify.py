@@ -0,0 +1,43 @@
+from acm_paper_downloader_ultimate import classify_missing_pdf, classify_empty_search
+
+HEADER = b'<header><a href="/subscribe">Subscribe</a> <a href="/purchase">Purchase</a> Get Access</header>'
+FOOTER = b'<footer>Subscribe to ACM newsletters</footer>'
+
+
+def page(body):
+    return b'<html><body>' + HEADER + body + FOOTER + b'</body></html>'
+
+
+def test_generic_header_and_footer_words_are_not_a_paywall():
+    content = page(b'<div class="article__body"><h1>A Paper</h1></div>')
+    assert classify_missing_pdf(content) == 'selector_miss'
+
+
+def test_paywall_text_inside_access_widget():
+    content = page(b'<div class="info-panel__access"><a>Get Access</a> <span>Purchase this article</span></div>')
+    assert classify_missing_pdf(content) == 'paywalled'
+
+
+def test_explicit_entitlement_message_anywhere():
+    content = page(b'<p>You do not have access to this content.</p>')
+    assert classify_missing_pdf(content) == 'paywalled'
+
+
+def test_access_widget_without_paywall_text():
+    content = page(b'<div class="info-panel__access"><a href="/doi/epdf/10.1145/1">eReader</a></div>')
+    assert classify_missing_pdf(content) == 'selector_miss'
+
+
+def test_empty_search_classification():
+    assert classify_empty_search(b'<html>Your search did not return any results</html>') == 'not_in_acm'
+    assert classify_empty_search(b'<html><div class="new-layout"></div></html>') == 'selector_miss'
+    assert classify_empty_search(b'<html><span class="hitsLength">0</span> Results for "x"</html>') == 'not_in_acm'
+    assert classify_empty_search(b'<html>0 Results for: "A Paper"</html>') == 'not_in_acm'
+    assert classify_empty_search(b'<html>No results found</html>') == 'not_in_acm'
+
+
+def test_nonzero_result_count_is_a_selector_miss():
+    for count in (b'10', b'120', b'1,230', b'2.0'):
+        content = b'<html><div class="new-layout">' + count + b' Results for: "A Paper"</div></html>'
+        assert classify_empty_search(content) == 'selector_miss'
+    assert classify_empty_search(b'<html>Show no results older than 2010. 35 Results</html>') == 'selector_miss'
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from acm_config import load_settings, parse_override, merge_settings, DEFAULT_SETTINGS
+
+
+def test_parse_override_values():
+    assert parse_override('timeouts.pdf=300') == {'timeouts': {'pdf': 300}}
+    assert parse_override('waits.politeness=5,10') == {'waits': {'politeness': [5, 10]}}
+    assert parse_override('waits.politeness=0.5,1.5') == {'waits': {'politeness': [0.5, 1.5]}}
+    assert parse_override('download.low_memory=true') == {'download': {'low_memory': True}}
+    assert parse_override('selectors.pdf_link=["a.x", "a.y"]') == {'selectors': {'pdf_link': ['a.x', 'a.y']}}
+    assert parse_override('selectors.pdf_link=a.x') == {'selectors': {'pdf_link': 'a.x'}}
+    with pytest.raises(ValueError):
+        parse_override('timeouts.pdf')
+
+
+def test_precedence_profile_file_override(tmp_path):
+    config = tmp_path / 'acm.json'
+    config.write_text(json.dumps({'profile': 'fast-campus', 'timeouts': {'pdf': 120}}))
+    settings = load_settings(str(config), overrides=['timeouts.pdf=200'])
+    assert settings['profile'] == 'fast-campus'
+    assert settings['timeouts']['search'] == 20
+    assert settings['timeouts']['pdf'] == 200
+    # 默认值不会被修改
+    assert DEFAULT_SETTINGS['timeouts']['pdf'] == 180
+
+
+@pytest.mark.parametrize('override', [
+    'timeouts.pdf=abc',
+    'timeouts.search=0',
+    'retries.http_total=1.5',
+    'retries.search_attempts=-1',
+    'waits.politeness=10,5',
+    'waits.politeness=a,b',
+    'selectors.pdf_link=[1]',
+])
+def test_invalid_values_are_rejected_at_load_time(override):
+    with pytest.raises(ValueError):
+        load_settings(overrides=[override])
+
+
+def test_single_selector_string_becomes_list():
+    assert load_settings(overrides=['selectors.pdf_link=a.x'])['selectors']['pdf_link'] == ['a.x']
+
+
+def test_unknown_keys_and_profiles():
+    with pytest.raises(ValueError):
+        merge_settings({'timeouts': {}}, {'timeout': {}})
+    with pytest.raises(ValueError):
+        load_settings(profile='no-such-profile')
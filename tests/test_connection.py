@@ -0,0 +1,103 @@
+import socket
+
+import pytest
+from requests.adapters import HTTPAdapter
+
+import acm_paper_downloader_ultimate as ultimate
+from acm_paper_downloader_ultimate import DNSCache, install_dns_cache, release_dns_cache
+
+
+@pytest.fixture
+def fake_resolver(monkeypatch):
+    calls = []
+
+    def resolve(host, port, *args, **kwargs):
+        calls.append(host)
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('127.0.0.1', port))]
+
+    monkeypatch.setattr(socket, 'getaddrinfo', resolve)
+    return resolve, calls
+
+
+def test_dns_cache_hits_and_bounded_entries(fake_resolver):
+    resolve, calls = fake_resolver
+    cache = DNSCache(ttl=60, max_entries=2)
+    cache.install()
+    try:
+        socket.getaddrinfo('a.example', 443)
+        socket.getaddrinfo('a.example', 443)
+        assert calls == ['a.example'] and cache.hits == 1
+        for host in ('b.example', 'c.example', 'd.example'):
+            socket.getaddrinfo(host, 443)
+        assert len(cache.entries) == 2
+    finally:
+        cache.uninstall()
+    assert socket.getaddrinfo is resolve
+    assert not cache.entries
+
+
+def test_dns_cache_expired_entries_are_resolved_again(fake_resolver):
+    resolve, calls = fake_resolver
+    cache = DNSCache(ttl=0)
+    cache.install()
+    try:
+        socket.getaddrinfo('a.example', 443)
+        socket.getaddrinfo('a.example', 443)
+    finally:
+        cache.uninstall()
+    assert calls == ['a.example', 'a.example']
+
+
+def test_dns_cache_call_after_uninstall_falls_through(fake_resolver):
+    # 其他线程取到替换函数后才uninstall()，这次调用直接交给恢复后的socket.getaddrinfo
+    resolve, calls = fake_resolver
+    cache = DNSCache(ttl=60)
+    cache.install()
+    stale = socket.getaddrinfo
+    cache.uninstall()
+    assert stale('a.example', 443)[0][4] == ('127.0.0.1', 443)
+    assert calls == ['a.example'] and not cache.entries
+
+
+def test_dns_cache_is_off_by_default(fake_resolver, tmp_path, monkeypatch):
+    resolve, _ = fake_resolver
+    monkeypatch.chdir(tmp_path)
+    downloader = ultimate.ACMPaperDownloaderUltimate(None, dashboard_interval=0)
+    try:
+        assert downloader.dns_cache is None and socket.getaddrinfo is resolve
+    finally:
+        downloader.close()
+
+
+def test_shared_dns_cache_is_removed_by_last_user(fake_resolver):
+    resolve, _ = fake_resolver
+    first = install_dns_cache(60)
+    second = install_dns_cache(60)
+    assert first is second and socket.getaddrinfo == first.getaddrinfo
+    release_dns_cache(first)
+    assert socket.getaddrinfo == first.getaddrinfo
+    release_dns_cache(second)
+    assert socket.getaddrinfo is resolve
+
+
+def test_downloader_mounts_sized_adapters_and_restores_dns(fake_resolver, tmp_path, monkeypatch):
+    resolve, _ = fake_resolver
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ultimate, 'HAS_CLOUDSCRAPER', False)
+    downloader = ultimate.ACMPaperDownloaderUltimate(
+        None, pool_maxsize=7, dns_cache_ttl=60, dashboard_interval=0)
+    adapter = downloader.session.get_adapter('https://dl.acm.org/')
+    assert isinstance(adapter, HTTPAdapter)
+    assert adapter._pool_maxsize == 7
+    assert adapter.poolmanager.connection_pool_kw['maxsize'] == 7
+
+    # 已有会话重新挂载时换成新的适配器，不改写旧适配器
+    downloader.pool_maxsize = 3
+    downloader.configure_connection_pool()
+    remounted = downloader.session.get_adapter('https://dl.acm.org/')
+    assert remounted is not adapter
+    assert remounted.poolmanager.connection_pool_kw['maxsize'] == 3
+    assert remounted.max_retries is adapter.max_retries
+
+    downloader.close()
+    assert socket.getaddrinfo is resolve
@@ -0,0 +1,44 @@
+import threading
+
+from acm_daemon import DownloadService
+from acm_singleflight import SingleFlight
+
+
+class FakeDownloader:
+    """只实现服务处理线程用到的接口"""
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.single_flight = SingleFlight()
+
+    def handle_title(self, index, total, title, wait_after=None):
+        status = self.statuses[title]
+        if isinstance(status, Exception):
+            raise status
+        return status
+
+
+def run_service(statuses):
+    service = DownloadService(FakeDownloader(statuses))
+    job = service.submit(list(statuses), 'test')
+    thread = threading.Thread(target=service.worker_loop, daemon=True)
+    thread.start()
+    joined = threading.Thread(target=service.tasks.join, daemon=True)
+    joined.start()
+    joined.join(5)
+    service.stopping.set()
+    thread.join(5)
+    return job, joined, thread
+
+
+def test_exception_marks_item_as_error_and_worker_keeps_going():
+    job, joined, thread = run_service({
+        'A': RuntimeError('database is locked'),
+        'B': 'downloaded',
+    })
+    assert not joined.is_alive()
+    assert not thread.is_alive()
+    assert job.finished
+    assert job.items[0] == {'title': 'A', 'status': 'error', 'error': 'database is locked'}
+    assert job.items[1]['status'] == 'downloaded'
+    assert job.events[-1]['status'] == 'downloaded'
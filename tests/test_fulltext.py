@@ -0,0 +1,71 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import acm_fulltext
+from acm_fulltext import FullTextIndex, update_fulltext_index
+
+
+@pytest.fixture
+def extracted(monkeypatch):
+    """在线程中"提取"文件内容本身作为文本，记录每次提取的文件名"""
+    calls = []
+
+    def extract(path):
+        calls.append(os.path.basename(path))
+        content = open(path, 'rb').read().decode()
+        if content.startswith('broken'):
+            return {'path': path, 'text': '', 'pages': None, 'error': 'cannot parse'}
+        return {'path': path, 'text': content, 'pages': 1, 'error': None}
+
+    monkeypatch.setattr(acm_fulltext, 'ProcessPoolExecutor', ThreadPoolExecutor)
+    monkeypatch.setattr(acm_fulltext, 'extract_pdf_text', extract)
+    return calls
+
+
+def write(directory, name, text):
+    path = directory / name
+    path.write_text(text)
+    return path
+
+
+def test_incremental_update(tmp_path, extracted):
+    papers = tmp_path / 'papers'
+    papers.mkdir()
+    db = str(tmp_path / 'fulltext.db')
+    write(papers, 'a.pdf', 'graph neural networks')
+    write(papers, 'copy of a.pdf', 'graph neural networks')
+    write(papers, 'b.pdf', 'residual learning')
+    write(papers, 'notes.txt', 'not a pdf')
+    write(papers, 'bad.pdf', 'broken file')
+
+    stats = update_fulltext_index(str(papers), db, workers=1)
+    # 相同内容的文件只提取一次
+    assert len(extracted) == 3 and {'b.pdf', 'bad.pdf'} < set(extracted)
+    assert (stats['added'], stats['reused'], stats['errors']) == (3, 1, 1)
+
+    # 没有变化时不读取任何文件；只改修改时间的文件按哈希判断为未变化
+    extracted.clear()
+    os.utime(papers / 'b.pdf', ns=(1, 1))
+    stats = update_fulltext_index(str(papers), db, workers=1)
+    assert extracted == [] and stats['unchanged'] == 4
+
+    # 内容变化的重新提取，删除的从索引中移除
+    write(papers, 'b.pdf', 'residual learning revisited with transformers')
+    os.remove(papers / 'copy of a.pdf')
+    stats = update_fulltext_index(str(papers), db, workers=1)
+    assert extracted == ['b.pdf']
+    assert (stats['updated'], stats['removed'], stats['unchanged']) == (1, 1, 2)
+
+    index = FullTextIndex(db)
+    try:
+        assert index.count() == 3
+        assert [os.path.basename(path) for path, _ in index.search('transformers')] == ['b.pdf']
+        assert [os.path.basename(path) for path, _ in index.search('neural')] == ['a.pdf']
+    finally:
+        index.conn.close()
+
+
+def test_missing_directory_returns_none(tmp_path):
+    assert update_fulltext_index(str(tmp_path / 'missing'), str(tmp_path / 'fulltext.db')) is None
@@ -0,0 +1,66 @@
+import pytest
+import requests
+
+pytest.importorskip('selenium')
+
+import acm_paper_downloader_hybrid as hybrid
+
+
+def make_response(url, status=200, content_type='text/html', body=b''):
+    response = requests.Response()
+    response.url = url
+    response.status_code = status
+    response.headers['Content-Type'] = content_type
+    response._content = body
+    return response
+
+
+@pytest.fixture
+def downloader(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return hybrid.ACMPaperDownloaderHybrid(None, dns_cache_ttl=0, dashboard_interval=0)
+
+
+PDF_URL = 'https://dl.acm.org/doi/pdf/10.1145/1'
+
+
+def test_paywalled_pdf_is_not_an_expired_session(downloader):
+    page = make_response(PDF_URL, body=b'<html><div class="get-access">Purchase this article</div></html>')
+    assert not downloader.is_session_expired(PDF_URL, page)
+    forbidden = make_response(PDF_URL, status=403, body=b'<html>Access denied</html>')
+    assert not downloader.is_session_expired(PDF_URL, forbidden)
+
+
+def test_login_page_for_pdf_is_an_expired_session(downloader):
+    page = make_response(PDF_URL, body=b'<html><form><input type="password" name="pw"></form></html>')
+    assert downloader.is_session_expired(PDF_URL, page)
+    redirected = make_response('https://idp.example.edu/idp/profile/SAML2', body=b'<html></html>')
+    assert downloader.is_session_expired(PDF_URL, redirected)
+
+
+def test_bootstraps_are_rate_limited_per_window(downloader, monkeypatch):
+    launches = []
+
+    def chrome(**kwargs):
+        launches.append(kwargs)
+        raise RuntimeError('no browser here')
+
+    monkeypatch.setattr(hybrid.webdriver, 'Chrome', chrome)
+    downloader.max_bootstraps = 2
+    for _ in range(4):
+        downloader.bootstrap_session()
+    assert len(launches) == 2
+
+    # 时间窗口过去后可以再次重建
+    downloader.bootstrap_times[0] -= downloader.bootstrap_window + 1
+    downloader.bootstrap_times[1] -= downloader.bootstrap_window + 1
+    downloader.bootstrap_session()
+    assert len(launches) == 3
+
+
+@pytest.mark.parametrize('title', ['Processor Design', 'Lasso Regression', 'Shibboleth Login Study'])
+def test_titles_in_search_urls_are_not_login_redirects(downloader, title):
+    for url in (f'https://dl.acm.org/action/doSearch?AllField={title.replace(" ", "+")}',
+                f'https://dl.acm.org/search/{title.replace(" ", "-").lower()}/idp/'):
+        response = make_response(url, body=b'<html>results</html>')
+        assert not downloader.is_session_expired(url, response)
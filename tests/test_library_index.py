@@ -0,0 +1,74 @@
+import pytest
+
+from acm_library_index import LibraryIndex, normalize_title
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = LibraryIndex(str(tmp_path / 'index' / 'library.db'))
+    yield index
+    index.conn.close()
+
+
+def write(tmp_path, name, content=b'%PDF-1.4 paper'):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_add_and_find_by_title_or_doi(tmp_path, index):
+    path = write(tmp_path, 'paper.pdf')
+    index.add('Graph Neural Networks: A Review', path, doi='10.1145/ABC.1',
+              authors=['Ada Lovelace', 'Alan Turing'], venue='KDD', references=['10.1145/x'])
+
+    # 标题按规范化后的形式匹配，DOI不区分大小写
+    entry = index.find_by_title('graph neural networks a review')
+    assert entry['doi'] == '10.1145/abc.1' and entry['authors'] == 'Ada Lovelace; Alan Turing'
+    assert entry['size'] == len(b'%PDF-1.4 paper') and entry['refs'] == '["10.1145/x"]'
+    assert index.find_by_doi('10.1145/abc.1')['title'] == 'Graph Neural Networks: A Review'
+    assert index.find_by_title('Unknown') is None and index.find_by_doi('10.1145/none') is None
+
+
+def test_re_adding_a_title_updates_without_losing_known_fields(tmp_path, index):
+    first = write(tmp_path, 'first.pdf')
+    second = write(tmp_path, 'second.pdf', b'%PDF-1.4 longer paper')
+    index.add('Paper', first, doi='10.1145/1', venue='SIGMOD', references=['10.1145/2'])
+    index.add('paper', second)
+
+    entry = index.find_by_title('Paper')
+    assert index.count() == 1
+    assert entry['file'] == second and entry['title'] == 'paper'
+    assert entry['doi'] == '10.1145/1' and entry['venue'] == 'SIGMOD' and entry['refs'] == '["10.1145/2"]'
+
+
+def test_titles_for_file_and_remove_file(tmp_path, index):
+    path = write(tmp_path, 'shared.pdf')
+    index.add('Preprint Title', path)
+    index.add('Published Title', path)
+    assert sorted(index.titles_for_file(path)) == ['Preprint Title', 'Published Title']
+
+    index.remove_file(path)
+    assert index.titles_for_file(path) == [] and index.count() == 0
+
+
+def test_search_by_words_and_doi(tmp_path, index):
+    index.add('Attention Is All You Need: Transformers', write(tmp_path, 'a.pdf'),
+              doi='10.1145/111', authors='Ashish Vaswani', venue='NeurIPS')
+    index.add('Deep Residual Learning', write(tmp_path, 'b.pdf'), doi='10.1145/222', venue='CVPR')
+
+    # 标题中的冒号等符号不会被当作查询语法
+    assert [row['doi'] for row in index.search('Need: Transformers')] == ['10.1145/111']
+    assert [row['doi'] for row in index.search('vaswani')] == ['10.1145/111']
+    assert [row['title'] for row in index.search(' 10.1145/222 ')] == ['Deep Residual Learning']
+    assert index.search('10.1145/333') == []
+
+
+def test_search_without_fts_uses_like(tmp_path, index):
+    index.has_fts = False
+    index.add('Deep Residual Learning', write(tmp_path, 'b.pdf'), venue='CVPR')
+    assert [row['title'] for row in index.search('Residual')] == ['Deep Residual Learning']
+    assert index.search('transformer') == []
+
+
+def test_normalize_title_ignores_case_and_punctuation():
+    assert normalize_title('  Graph-Neural  Networks: A Review. ') == normalize_title('graph neural networks a review')
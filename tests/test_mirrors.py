@@ -0,0 +1,129 @@
+import os
+import time
+import argparse
+
+import pytest
+import requests
+
+from acm_mirrors import MirrorFetcher, MirrorSource, RateBudget
+from acm_paper_downloader_ultimate import add_download_arguments, download_options, parse_download_args
+from conftest import make_pdf
+
+
+class StaticSource(MirrorSource):
+    """直接返回给定地址的镜像源"""
+
+    name = 'stub'
+    per_minute = 6000
+
+    def find_pdf_urls(self, http_get, doi=None, title=None):
+        return self.options['urls']
+
+
+@pytest.fixture
+def mirror(stub_server):
+    server = stub_server({
+        '/slow.pdf': (1.0, 'application/pdf', make_pdf(padding=20000)),
+        '/page.html': (0, 'text/html', b'<html><body>Sign in to download</body></html>'),
+        '/good.pdf': (0, 'application/pdf', make_pdf(padding=20000)),
+        # 文件头正确但被截断，只有下载完成后的检查能发现
+        '/broken.pdf': (0, 'application/pdf', make_pdf(padding=20000)[:-200]),
+    })
+    session = requests.Session()
+
+    def fetcher(paths, race):
+        source = StaticSource(urls=[server.url(p) for p in paths])
+        return MirrorFetcher([source], session.get, race=race)
+
+    yield server, fetcher
+    session.close()
+
+
+def test_race_picks_fastest_valid_pdf(mirror, tmp_path):
+    server, fetcher = mirror
+    target = str(tmp_path / 'paper.pdf')
+    start = time.monotonic()
+    found = fetcher(['/slow.pdf', '/good.pdf'], race=True).download(target, doi='10.1145/1')
+    assert found == ('stub', server.url('/good.pdf'))
+    assert time.monotonic() - start < 1.0
+    assert open(target, 'rb').read() == make_pdf(padding=20000)
+
+
+def test_race_rejects_html_response(mirror, tmp_path):
+    server, fetcher = mirror
+    target = str(tmp_path / 'paper.pdf')
+    found = fetcher(['/page.html', '/slow.pdf'], race=True).download(target, doi='10.1145/1')
+    assert found == ('stub', server.url('/slow.pdf'))
+    assert server.hits['/page.html'] == 1
+
+
+def test_race_reuses_open_responses_when_winner_is_invalid(mirror, tmp_path):
+    server, fetcher = mirror
+    target = str(tmp_path / 'paper.pdf')
+    found = fetcher(['/broken.pdf', '/slow.pdf'], race=True).download(target, doi='10.1145/1')
+    assert found == ('stub', server.url('/slow.pdf'))
+    # 截断的文件先返回并被检查拒绝，之后使用竞速中已经打开的响应，不重新请求
+    assert server.hits == {'/broken.pdf': 1, '/slow.pdf': 1}
+    assert not os.path.exists(target + '.part')
+
+
+def test_sequential_fallback_tries_candidates_in_order(mirror, tmp_path):
+    server, fetcher = mirror
+    target = str(tmp_path / 'paper.pdf')
+    found = fetcher(['/page.html', '/broken.pdf', '/good.pdf', '/slow.pdf'], race=False).download(target)
+    assert found == ('stub', server.url('/good.pdf'))
+    assert server.hits == {'/page.html': 1, '/broken.pdf': 1, '/good.pdf': 1}
+
+
+def test_no_valid_candidate_returns_none(mirror, tmp_path):
+    server, fetcher = mirror
+    target = str(tmp_path / 'paper.pdf')
+    assert fetcher(['/page.html', '/broken.pdf'], race=True).download(target) is None
+    assert not os.path.exists(target)
+    assert not os.path.exists(target + '.part')
+
+
+def test_mirror_source_is_abstract():
+    class Incomplete(MirrorSource):
+        name = 'incomplete'
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_rate_budget_rejects_non_positive_rates():
+    with pytest.raises(ValueError):
+        RateBudget(0)
+
+
+@pytest.fixture
+def download_parser():
+    parser = argparse.ArgumentParser()
+    add_download_arguments(parser)
+    return parser
+
+
+@pytest.mark.parametrize('argv', [
+    ['--mirror-rate', 'arxiv=x'],
+    ['--mirror-rate', 'arxiv=0'],
+    ['--mirror-rate', 'arxiv=-5'],
+    ['--mirror-rate', 'arxiv'],
+    ['--mirror-rate', 'nosuch=10'],
+    ['--mirror-url', 'arxiv=localhost:8000'],
+    ['--mirror-url', '=http://127.0.0.1'],
+    ['--mirrors', 'arxiv,nosuch'],
+])
+def test_invalid_mirror_arguments_are_usage_errors(download_parser, argv, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        parse_download_args(download_parser, ['papers.xlsx'] + argv)
+    assert exit_info.value.code == 2
+    assert 'error' in capsys.readouterr().err
+
+
+def test_valid_mirror_arguments(download_parser):
+    args = parse_download_args(download_parser, [
+        'papers.xlsx', '--mirrors', 'arxiv', '--mirror-rate', 'arxiv=1.5',
+        '--mirror-url', 'arxiv=http://127.0.0.1:8000/api'])
+    options = download_options(args)
+    assert options['mirror_rates'] == {'arxiv': 1.5}
+    assert options['mirror_urls'] == {'arxiv': 'http://127.0.0.1:8000/api'}
@@ -0,0 +1,87 @@
+import pytest
+
+import acm_paper_downloader_ultimate as ultimate
+from acm_library_index import LibraryIndex
+from acm_pdf_verify import check_pdf, is_xref_start, load_repair_queue, verify_directory
+from conftest import make_pdf
+
+
+def write(tmp_path, content, name='paper.pdf'):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_valid_pdf(tmp_path):
+    result = check_pdf(write(tmp_path, make_pdf(padding=5000)))
+    assert result['problem'] is None and result['size'] > 5000
+
+
+def test_junk_before_header_is_tolerated(tmp_path):
+    # startxref 相对 %PDF- 计算，文件头前多出的字节不影响判断
+    assert check_pdf(write(tmp_path, b'\r\n\r\n' + make_pdf()))['problem'] is None
+
+
+@pytest.mark.parametrize('content, problem', [
+    (b'', 'empty'),
+    (b'<!DOCTYPE html><html><body>Sign in</body></html>', 'html_not_pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'missing_header'),
+    (make_pdf(padding=5000)[:-200], 'truncated'),
+    (make_pdf().replace(b'startxref', b'startref'), 'missing_startxref'),
+    (make_pdf().replace(b'startxref\n', b'startxref\n99999'), 'bad_xref_offset'),
+    (make_pdf().replace(b'xref\n0 2', b'xxxx\n0 2'), 'bad_xref'),
+])
+def test_problems(tmp_path, content, problem):
+    assert check_pdf(write(tmp_path, content))['problem'] == problem
+
+
+def test_missing_file_is_reported(tmp_path):
+    assert check_pdf(str(tmp_path / 'missing.pdf'))['problem'].startswith('error:')
+
+
+def test_page_count(tmp_path):
+    # 在填充区写入同样长度的页面对象，xref偏移量不变
+    marker = b'/Type /Pages /Type /Page '
+    content = make_pdf(padding=100).replace(b'x' * len(marker), marker, 1)
+    assert check_pdf(write(tmp_path, content), count_pages=False)['pages'] is None
+    assert check_pdf(write(tmp_path, content), count_pages=True)['pages'] == 1
+
+
+def test_xref_stream_start():
+    assert is_xref_start(b'  xref\n0 1')
+    assert is_xref_start(b'12 0 obj\n<< /Type /XRef >>')
+    assert not is_xref_start(b'trailer\n<<')
+
+
+def test_quarantine_queues_indexed_title_and_doi(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    papers = tmp_path / 'papers'
+    papers.mkdir()
+    title = 'Title: With A Colon'
+    broken = write(papers, make_pdf(padding=5000)[:-200], 'Title_ With A Colon.pdf')
+    write(papers, b'<html>Sign in</html>', 'Unknown_ Stem.pdf')
+    index = LibraryIndex(str(tmp_path / 'index.db'))
+    index.add(title, broken, doi='10.1145/1234')
+    queue_file = str(tmp_path / '.acm_cache' / 'repair_queue.json')
+
+    verify_directory(str(papers), workers=1, quarantine_dir=str(papers / 'quarantine'),
+                     repair_queue_file=queue_file, index=index)
+    index.conn.close()
+
+    queue = load_repair_queue(queue_file)
+    assert queue[title]['doi'] == '10.1145/1234' and queue[title]['indexed']
+    assert not queue['Unknown_ Stem']['indexed']
+
+    downloader = ultimate.ACMPaperDownloaderUltimate(None, dns_cache_ttl=0, dashboard_interval=0)
+    try:
+        # 索引中的原始标题排在最前并按DOI直接访问；不在索引中的文件名只和输入中的标题对应，不单独搜索
+        assert downloader.prepend_repair_queue(['Other Paper', title]) == [title, 'Other Paper']
+        assert downloader.title_dois[title] == '10.1145/1234'
+        assert list(downloader.prepend_repair_queue(iter(['Other Paper', title]))) == [title, 'Other Paper']
+        assert downloader.prepend_repair_queue(['Unknown: Stem']) == [title, 'Unknown: Stem']
+
+        downloader.record_result(title, 'downloaded')
+        downloader.record_result('Unknown: Stem', 'downloaded')
+        assert downloader.repair_queue == {}
+    finally:
+        downloader.close()
@@ -0,0 +1,49 @@
+import pandas as pd
+import pytest
+
+import acm_paper_downloader_ultimate as ultimate
+from acm_plan import build_plan, read_input_dois
+from conftest import make_pdf
+
+
+@pytest.fixture
+def downloader(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    downloader = ultimate.ACMPaperDownloaderUltimate(None, dns_cache_ttl=0, dashboard_interval=0)
+    yield downloader
+    downloader.close()
+
+
+def test_plan_uses_doi_column(downloader, tmp_path):
+    pd.DataFrame({
+        'Title': ['With DOI', 'Without DOI', 'Indexed by DOI'],
+        'DOI': ['https://doi.org/10.1145/111', None, '10.1145/222'],
+    }).to_csv('list.csv', index=False)
+    dois = read_input_dois('list.csv')
+    assert dois == {'With DOI': '10.1145/111', 'Indexed by DOI': '10.1145/222'}
+
+    existing = tmp_path / 'elsewhere.pdf'
+    existing.write_bytes(make_pdf())
+    downloader.library_index.add('A Different Title', str(existing), doi='10.1145/222')
+
+    plan = build_plan(downloader, ['With DOI', 'Without DOI', 'Indexed by DOI', 'doi:10.1145/333'],
+                      input_path='list.csv', dois=dois)
+    actions = {item['title']: (item['action'], item['detail']) for item in plan['items']}
+    assert actions['With DOI'] == ('doi', '10.1145/111')
+    assert actions['Without DOI'] == ('search', None)
+    assert actions['Indexed by DOI'] == ('indexed', str(existing))
+    assert actions['doi:10.1145/333'] == ('doi', '10.1145/333')
+    assert plan['counts'] == {'doi': 2, 'search': 1, 'indexed': 1}
+    assert plan['estimate']['requests'] == 2 * 2 + 3
+
+
+def test_plan_run_goes_straight_to_detail_page(downloader, tmp_path, monkeypatch):
+    plan = build_plan(downloader, ['With DOI'], dois={'With DOI': '10.1145/111'})
+    ultimate.write_plan(plan, str(tmp_path / 'plan.json'))
+    assert downloader.read_plan(str(tmp_path / 'plan.json')) == ['With DOI']
+
+    visited = []
+    monkeypatch.setattr(downloader, 'process_title',
+                        lambda title, paper_url=None: visited.append(paper_url) or 'not_in_acm')
+    downloader.handle_title(1, 1, 'With DOI', wait_after=False)
+    assert visited == ['https://dl.acm.org/doi/10.1145/111']
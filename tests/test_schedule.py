@@ -0,0 +1,39 @@
+import pandas as pd
+
+import acm_paper_downloader_ultimate as ultimate
+
+
+def schedule(tmp_path, monkeypatch, df, failures=()):
+    monkeypatch.chdir(tmp_path)
+    downloader = ultimate.ACMPaperDownloaderUltimate(None, dns_cache_ttl=0, dashboard_interval=0)
+    try:
+        downloader.failures = {title: {} for title in failures}
+        return downloader.schedule_titles(df)
+    finally:
+        downloader.close()
+
+
+def test_deadline_then_priority_then_row(tmp_path, monkeypatch):
+    df = pd.DataFrame({
+        'Title': ['No deadline', 'Late', 'Early low', 'Early high', 'Early high again', None],
+        'Deadline': [None, '2026-12-01', '2026-11-01', '2026-11-01', '2026-11-01', '2026-10-01'],
+        'Priority': [9, 1, 1, 5, 5, 9],
+    })
+    # 截止日期相同按Priority从高到低，都相同时保持原始顺序；没有截止日期的排在最后，空标题去掉
+    assert schedule(tmp_path, monkeypatch, df) == [
+        'Early high', 'Early high again', 'Early low', 'Late', 'No deadline']
+
+
+def test_failed_titles_go_last_and_bad_values_are_ignored(tmp_path, monkeypatch):
+    df = pd.DataFrame({
+        'Title': ['Failed urgent', 'Bad date', 'Bad priority', 'Plain'],
+        'Deadline': ['2026-10-20', 'soon', '2026-10-21', None],
+        'Priority': [10, 3, 'high', 0],
+    })
+    assert schedule(tmp_path, monkeypatch, df, failures=['Failed urgent']) == [
+        'Bad priority', 'Bad date', 'Plain', 'Failed urgent']
+
+
+def test_without_schedule_columns_keeps_sheet_order(tmp_path, monkeypatch):
+    df = pd.DataFrame({'Title': ['C', 'A', 'B']})
+    assert schedule(tmp_path, monkeypatch, df, failures=['A']) == ['C', 'B', 'A']
@@ -0,0 +1,75 @@
+import threading
+
+import pytest
+
+from acm_progress import ProgressTracker
+from acm_singleflight import SingleFlight, normalize_url
+
+
+@pytest.mark.parametrize('url, expected', [
+    ('HTTPS://DL.ACM.org:443/doi/abs/10.1145/ABC/', 'https://dl.acm.org/doi/10.1145/abc'),
+    ('https://dl.acm.org/doi/full/10.1145/abc#sec1', 'https://dl.acm.org/doi/10.1145/abc'),
+    ('https://dl.acm.org/action/doSearch?b=2&a=1', 'https://dl.acm.org/action/doSearch?a=1&b=2'),
+    ('https://dl.acm.org/action/doSearch?AllField=a%20b', 'https://dl.acm.org/action/doSearch?AllField=a+b'),
+    ('http://example.org:8080/Paper.PDF', 'http://example.org:8080/Paper.PDF'),
+    ('https://example.org', 'https://example.org/'),
+])
+def test_normalize_url(url, expected):
+    assert normalize_url(url) == expected
+
+
+def test_concurrent_calls_are_coalesced():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+    sources = []
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return 'pdf'
+
+    def worker():
+        sources.append(flight.do('key', slow))
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    while flight.stats['coalesced'] < 2:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert sorted(sources, key=str) == [('pdf', 'coalesced'), ('pdf', 'coalesced'), ('pdf', None)]
+
+
+def test_memoize_and_ttl():
+    flight = SingleFlight(ttl=None)
+    assert flight.do('a', lambda: None, memoize=bool) == (None, None)
+    assert flight.do('a', lambda: 'x', memoize=bool) == ('x', None)
+    assert flight.do('a', lambda: 'y', memoize=bool) == ('x', 'memo')
+    flight.ttl = 0
+    assert flight.do('a', lambda: 'z', memoize=bool) == ('z', None)
+
+
+def test_errors_are_not_memoized():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError):
+        flight.do('a', fail, memoize=lambda value: True)
+    assert flight.do('a', lambda: 'ok') == ('ok', None)
+
+
+def test_single_flight_is_kept_out_of_cache_hit_ratio():
+    progress = ProgressTracker()
+    for _ in range(9):
+        progress.record_cache('single_flight', False)
+    progress.record_cache('library_index', True)
+    progress.record_cache('http_304', False)
+    snapshot = progress.snapshot()
+    assert snapshot['cache_hit_ratio'] == 0.5
+    assert snapshot['cache']['single_flight'] == {'hits': 0, 'misses': 9, 'ratio': 0.0}
@@ -0,0 +1,88 @@
+import json
+import sqlite3
+
+import pytest
+import requests
+
+import acm_paper_downloader_ultimate as ultimate
+from acm_library_index import LibraryIndex
+from conftest import make_pdf
+
+
+@pytest.fixture
+def downloader(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    downloader = ultimate.ACMPaperDownloaderUltimate(None, dns_cache_ttl=0, dashboard_interval=0)
+    yield downloader
+    downloader.close()
+
+
+def response_with_etag(url):
+    response = requests.Response()
+    response.url = url
+    response.status_code = 200
+    response.headers['ETag'] = '"v1"'
+    return response
+
+
+def test_state_files_are_written_in_batches(downloader, tmp_path):
+    url = 'https://dl.acm.org/doi/10.1145/1'
+    downloader.remember_validators(url, response_with_etag(url), pdf_url=url.replace('/doi/', '/doi/pdf/'),
+                                   metadata={'title': 'A'})
+    downloader.record_result('B', 'paywalled')
+    downloader.save_state()
+    assert not (tmp_path / '.acm_cache' / 'validators.json').exists()
+    assert not (tmp_path / '.acm_cache' / 'failures.json').exists()
+
+    downloader.save_state(force=True)
+    validators = json.loads((tmp_path / '.acm_cache' / 'validators.json').read_text(encoding='utf-8'))
+    assert validators[url]['etag'] == '"v1"'
+    failures = json.loads((tmp_path / '.acm_cache' / 'failures.json').read_text(encoding='utf-8'))
+    assert failures['B']['status'] == 'paywalled'
+
+
+def test_save_interval_elapsed_writes_without_force(downloader, tmp_path, monkeypatch):
+    downloader.record_result('B', 'paywalled')
+    monkeypatch.setattr(ultimate, 'STATE_SAVE_INTERVAL', 0)
+    downloader.save_state()
+    assert (tmp_path / '.acm_cache' / 'failures.json').exists()
+
+
+def test_references_live_in_the_index_not_in_validators(downloader, tmp_path):
+    pdf = tmp_path / 'a.pdf'
+    pdf.write_bytes(make_pdf())
+    downloader.index_download('A Paper', str(pdf), {'doi': '10.1145/1', 'references': ['10.1145/2', '10.1145/3']})
+    assert downloader.indexed_references('doi:10.1145/1') == ['10.1145/2', '10.1145/3']
+    assert downloader.cached_references('A Paper') == ['10.1145/2', '10.1145/3']
+    assert downloader.indexed_references('doi:10.1145/9') is None
+    assert downloader.cached_references('doi:10.1145/9') == []
+
+    # 再次登记时没有参考文献（如304）不会清掉已有的记录
+    downloader.index_download('A Paper', str(pdf), {'doi': '10.1145/1'})
+    assert downloader.indexed_references('A Paper') == ['10.1145/2', '10.1145/3']
+
+
+def test_old_validators_drop_reference_lists(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / '.acm_cache').mkdir()
+    (tmp_path / '.acm_cache' / 'validators.json').write_text(json.dumps({
+        'https://dl.acm.org/doi/10.1145/1': {'etag': '"v1"', 'metadata': {'title': 'A', 'references': ['10.1145/2']}},
+    }))
+    downloader = ultimate.ACMPaperDownloaderUltimate(None, dns_cache_ttl=0, dashboard_interval=0)
+    assert downloader.validators['https://dl.acm.org/doi/10.1145/1']['metadata'] == {'title': 'A'}
+    downloader.close()
+
+
+def test_index_without_refs_column_is_migrated(tmp_path):
+    path = str(tmp_path / 'library.db')
+    conn = sqlite3.connect(path)
+    conn.execute("""CREATE TABLE papers (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL,
+                    title_key TEXT UNIQUE NOT NULL, doi TEXT, authors TEXT, venue TEXT, file TEXT,
+                    sha256 TEXT, size INTEGER, downloaded_at TEXT)""")
+    conn.commit()
+    conn.close()
+    pdf = tmp_path / 'a.pdf'
+    pdf.write_bytes(make_pdf())
+    index = LibraryIndex(path)
+    index.add('A', str(pdf), doi='10.1145/1', references=['10.1145/2'])
+    assert json.loads(index.find_by_doi('10.1145/1')['refs']) == ['10.1145/2']
@@ -0,0 +1,106 @@
+import pandas as pd
+
+from acm_sync import SyncState, clean_doi, row_fingerprint, row_keys
+
+
+def table(rows):
+    return pd.DataFrame(rows)
+
+
+def test_fingerprint_ignores_column_order_and_missing_values():
+    a = pd.Series({'Title': 'A', 'Priority': float('nan')})
+    b = pd.Series({'Priority': None, 'Title': 'A'})
+    assert row_fingerprint(a) == row_fingerprint(b)
+    assert row_fingerprint(a) != row_fingerprint(pd.Series({'Title': 'A', 'Priority': 1}))
+
+
+def test_duplicate_titles_get_separate_keys():
+    df = table({'Title': ['Deep Learning', 'deep learning!', 'Other']})
+    assert row_keys(df) == ['deep learning', 'deep learning#1', 'other']
+
+
+def test_doi_column_is_preferred_over_title():
+    df = table({'Title': ['Same', 'Same'], 'DOI': ['https://doi.org/10.1145/ABC', None]})
+    assert row_keys(df) == ['doi:10.1145/abc', 'same']
+    assert clean_doi('doi:10.1145/3290605.3300233.') == '10.1145/3290605.3300233'
+    assert clean_doi(float('nan')) is None
+
+
+def test_duplicate_rows_do_not_show_as_changed(tmp_path):
+    path = str(tmp_path / 'state.json')
+    df = table({'Title': ['Paper', 'Paper'], 'Note': ['first', 'second']})
+    state = SyncState(path)
+    changed, removed, counts = state.diff(df)
+    assert counts['new'] == 2 and not removed
+    state.record('Paper', 'downloaded')
+    state.save(force=True)
+
+    changed, removed, counts = SyncState(path).diff(df)
+    assert counts == {'new': 0, 'changed': 0, 'retry': 0, 'unchanged': 2}
+    assert changed.empty
+
+
+def test_deferred_rows_are_retried(tmp_path):
+    path = str(tmp_path / 'state.json')
+    df = table({'Title': ['A', 'B']})
+    state = SyncState(path)
+    state.diff(df)
+    state.record('A', 'downloaded')
+    state.record('B', 'deferred')
+    state.save(force=True)
+
+    changed, _, counts = SyncState(path).diff(df)
+    assert counts['retry'] == 1
+    assert changed['Title'].tolist() == ['B']
+
+
+def test_removed_rows_and_forget(tmp_path):
+    path = str(tmp_path / 'state.json')
+    state = SyncState(path)
+    state.diff(table({'Title': ['A', 'A', 'B']}))
+    for title in ('A', 'B'):
+        state.record(title, 'downloaded')
+    state.save(force=True)
+
+    state = SyncState(path)
+    _, removed, counts = state.diff(table({'Title': ['A']}))
+    assert sorted(entry['key'] for entry in removed) == ['a#1', 'b']
+    assert state.current_titles == {'A'}
+    state.forget(removed)
+    assert set(SyncState(path).rows) == {'a'}
+
+
+def test_prune_keeps_files_still_used_by_other_rows(tmp_path, monkeypatch):
+    import acm_paper_downloader_ultimate as ultimate
+    from conftest import make_pdf
+
+    monkeypatch.chdir(tmp_path)
+    pd.DataFrame({'Title': ['Kept', 'Kept', 'Gone']}).to_csv('list.csv', index=False)
+    downloader = ultimate.ACMPaperDownloaderUltimate('list.csv', dns_cache_ttl=0, dashboard_interval=0,
+                                                     sync=True, sync_prune=True)
+    downloader.create_output_directory()
+    for title in ('Kept', 'Gone'):
+        path = tmp_path / downloader.output_dir / downloader.sanitize_filename(title)
+        path.write_bytes(make_pdf())
+    assert downloader.read_sync_titles() == ['Kept', 'Kept', 'Gone']
+    for title in ('Kept', 'Gone'):
+        downloader.sync_state.record(title, 'downloaded')
+    downloader.save_state(force=True)
+
+    # 删除一个重复行和 Gone：Kept 的文件仍被剩下的行使用
+    pd.DataFrame({'Title': ['Kept']}).to_csv('list.csv', index=False)
+    assert downloader.read_sync_titles() == []
+    assert (tmp_path / downloader.output_dir / 'Kept.pdf').exists()
+    assert not (tmp_path / downloader.output_dir / 'Gone.pdf').exists()
+    downloader.close()
+
+
+def test_records_are_batched_until_forced(tmp_path):
+    path = tmp_path / 'state.json'
+    state = SyncState(str(path))
+    state.diff(table({'Title': ['A', 'B']}))
+    state.record('A', 'downloaded')
+    state.record('B', 'downloaded')
+    assert not path.exists()
+    state.save(force=True)
+    assert set(SyncState(str(path)).rows) == {'a', 'b'}
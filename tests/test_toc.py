@@ -0,0 +1,51 @@
+import acm_paper_downloader_ultimate as ultimate
+from acm_paper_downloader_ultimate import extract_toc, toc_url_for
+
+
+def toc_page(title, dois, sections=()):
+    items = ''.join(f'<div class="issue-item"><h5 class="issue-item__title"><a href="/doi/{doi}">Paper</a></h5></div>'
+                    for doi in dois)
+    links = ''.join(f'<a href="{section}">Section</a>' for section in sections)
+    return f'<html><body><h1>{title}</h1>{items}{links}</body></html>'.encode()
+
+
+def test_extract_toc_dois_sections_and_title():
+    content = toc_page('KDD \'19:  Proceedings', ['10.1145/ABC', '10.1145/abc', '10.1145/2'],
+                       ['/toc/proc?tocHeading=heading2', '/toc/proc?tocHeading=heading2'])
+    title, dois, sections = extract_toc(content, 'https://dl.acm.org/doi/proceedings/10.1145/1')
+    assert title == "KDD '19: Proceedings"
+    assert dois == ['10.1145/abc', '10.1145/2']
+    assert sections == ['https://dl.acm.org/toc/proc?tocHeading=heading2']
+
+
+def test_extract_toc_falls_back_to_later_selectors():
+    content = b'''<html><head><title>Issue 38</title></head><body>
+        <div class="toc__item"><a href="/doi/10.1145%2F3">Encoded</a></div>
+        <a href="/doi/10.1145/not-in-toc">Sidebar</a></body></html>'''
+    assert extract_toc(content, 'https://dl.acm.org/toc/tocs/2020/38/1') == ('Issue 38', ['10.1145/3'], [])
+
+
+def test_toc_url_for_accepts_doi_or_url():
+    assert toc_url_for(' doi:10.1145/3292500 ') == 'https://dl.acm.org/doi/proceedings/10.1145/3292500'
+    assert toc_url_for('https://dl.acm.org/toc/tocs/2020/38/1') == 'https://dl.acm.org/toc/tocs/2020/38/1'
+
+
+def test_read_toc_pauses_between_section_pages(stub_server, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    server = stub_server({
+        '/toc': (0, 'text/html', toc_page('Proceedings', ['10.1145/1', '10.1145/2'],
+                                          ['/section-a?tocHeading=a', '/section-b?tocHeading=b'])),
+        '/section-a': (0, 'text/html', toc_page('Section A', ['10.1145/2', '10.1145/3'])),
+        '/section-b': (0, 'text/html', toc_page('Section B', ['10.1145/4'])),
+    })
+    downloader = ultimate.ACMPaperDownloaderUltimate(None, dns_cache_ttl=0, dashboard_interval=0)
+    pauses = []
+    monkeypatch.setattr(downloader, 'pause', lambda seconds, reason: pauses.append(reason))
+    try:
+        titles = downloader.read_toc(server.url('/toc'))
+    finally:
+        downloader.close()
+
+    assert titles == ['doi:10.1145/1', 'doi:10.1145/2', 'doi:10.1145/3', 'doi:10.1145/4']
+    # 第一个目录页之前不等待，之后每个分节页面之前等待一次
+    assert pauses == ['detail_page_load', 'detail_page_load']
@@ -0,0 +1,58 @@
+import threading
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+import acm_trace
+from acm_trace import SpanTracer, TracedRetry
+
+
+@pytest.fixture
+def tracer(monkeypatch):
+    tracer = SpanTracer()
+    monkeypatch.setattr(acm_trace, 'active_tracer', tracer)
+    return tracer
+
+
+def test_retry_spans_record_the_url(tracer, stub_server):
+    server = stub_server({'/flaky': (0, 'text/html', b'busy', 503)})
+    session = requests.Session()
+    session.mount('http://', HTTPAdapter(max_retries=TracedRetry(total=2, backoff_factor=0,
+                                                                 status_forcelist=[503])))
+    with pytest.raises(requests.exceptions.RetryError):
+        session.get(server.url('/flaky'), timeout=5)
+    retries = [r for r, _ in tracer.walk() if r['name'] == 'retry']
+    assert len(retries) == 3
+    assert all(r['args']['url'] == '/flaky' and r['args']['status'] == 503 for r in retries)
+
+
+def test_root_spans_are_capped_but_summarized():
+    tracer = SpanTracer(max_roots=5)
+    for i in range(20):
+        with tracer.span('title', index=i):
+            with tracer.span('search'):
+                pass
+    assert len(tracer.roots) == 5
+    assert tracer.evicted_roots == 15
+    totals = tracer.summary()
+    assert totals['title'][0] == 20
+    assert totals['search'][0] == 20
+    assert len(tracer.slowest_evicted) == acm_trace.KEEP_SLOWEST
+    assert len([e for e in tracer.chrome_events() if e.get('name') == 'title']) == 5
+
+
+def test_unfinished_roots_are_not_evicted():
+    tracer = SpanTracer(max_roots=2)
+
+    def other_titles():
+        for i in range(5):
+            with tracer.span('title', index=i):
+                pass
+
+    with tracer.span('title', index='outer'):
+        thread = threading.Thread(target=other_titles)
+        thread.start()
+        thread.join()
+        # 正在进行的顶层区间不会被移出，其余只保留最新完成的
+        assert [r['args']['index'] for r in tracer.roots] == ['outer', 4]
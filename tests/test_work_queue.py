@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+
+import acm_paper_downloader_ultimate as ultimate
+from acm_work_queue import SQLiteWorkQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return SQLiteWorkQueue(str(tmp_path / 'queue.db'), max_attempts=2)
+
+
+def test_lease_complete_and_reclaim(queue):
+    assert queue.enqueue(['A', 'B', 'A']) == 2
+    assert queue.lease('w1', 60) == 'A'
+    assert queue.lease('w2', -1) == 'B'
+    # w2 的租约已经过期，被放回队列后由 w1 领取，w2 的结果不再被采用
+    assert queue.lease('w1', 60) == 'B'
+    assert not queue.complete('B', 'w2', 'downloaded')
+    assert queue.complete('A', 'w1', 'downloaded')
+    assert queue.complete('B', 'w1', 'not_in_acm')
+    assert queue.stats() == {'pending': 0, 'leased': 0, 'done': 2, 'total': 2}
+
+
+def test_lease_expires_after_max_attempts(queue):
+    queue.enqueue(['A'])
+    assert queue.lease('w1', -1) == 'A'
+    assert queue.lease('w2', -1) == 'A'
+    assert queue.lease('w3', 60) is None
+    assert queue.results()[0]['status'] == 'lease_expired'
+
+
+def test_skipped_titles_are_not_reported_as_failures(queue, tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    statuses = {'A': 'downloaded', 'B': 'already_downloaded', 'C': 'skipped', 'D': 'deferred', 'E': 'paywalled'}
+    queue.enqueue(list(statuses))
+    while True:
+        title = queue.lease('w1', 60)
+        if title is None:
+            break
+        queue.complete(title, 'w1', statuses[title])
+
+    downloader = ultimate.ACMPaperDownloaderUltimate(None, dns_cache_ttl=0, dashboard_interval=0)
+    downloader.report_queue_results(queue, 'failed.xlsx')
+    downloader.close()
+    output = capsys.readouterr().out
+    assert '成功下载: 2 篇' in output
+    assert '跳过: 2 篇' in output
+    assert '下载失败: 1 篇' in output
+    assert pd.read_excel('failed.xlsx')['Title'].tolist() == ['E']